@@ -3,14 +3,89 @@ API REST para Otimização de Alocação de Pacientes em UPAEs
 Servidor Flask que expõe o algoritmo genético
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from otimizador_genetico import otimizar_alocacao_paciente, run_genetic_algorithm
+from otimizador_genetico import (
+    otimizar_alocacao_paciente, run_genetic_algorithm, compute_p_noshow_pairs,
+    EVALUATOR_BACKENDS, BASE_NO_SHOW
+)
+from fila_jobs import JobQueue, FilaCheiaError, make_job_store
+from modelo_ilhas import TOPOLOGIAS
+from cache_resultados import ResultCache, instance_key
+from registro_upaes import UpaeRegistry
 import json
+import os
+import queue
+import threading
+import time
 
 app = Flask(__name__)
 CORS(app)  # Permitir requisições do frontend
 
+# Fila de jobs assíncronos do /api/otimizar-lote. Configuração por ambiente:
+# UPAE_JOB_STORE ('memoria' ou 'sqlite'), UPAE_JOB_DB (arquivo do SQLite),
+# UPAE_JOB_TTL_S (retenção dos jobs terminados) e UPAE_JOB_WORKERS.
+_store_kwargs = {'ttl_s': float(os.environ.get('UPAE_JOB_TTL_S', 3600))}
+if os.environ.get('UPAE_JOB_STORE', 'memoria') == 'sqlite':
+    _store_kwargs['path'] = os.environ.get('UPAE_JOB_DB', 'jobs_otimizacao.db')
+fila_jobs = JobQueue(
+    make_job_store(os.environ.get('UPAE_JOB_STORE', 'memoria'), **_store_kwargs),
+    max_workers=int(os.environ.get('UPAE_JOB_WORKERS', 2))
+)
+
+# Cache de resultados (LRU + TTL, camada em disco opcional). Configuração por
+# ambiente: UPAE_CACHE_MAX, UPAE_CACHE_TTL_S e UPAE_CACHE_DIR.
+cache_resultados = ResultCache(
+    max_entries=int(os.environ.get('UPAE_CACHE_MAX', 256)),
+    ttl_s=float(os.environ.get('UPAE_CACHE_TTL_S', 3600)),
+    disk_dir=os.environ.get('UPAE_CACHE_DIR') or None
+)
+
+# Registro de UPAEs do servidor (arquivo JSON ou SQLite em UPAE_REGISTRY):
+# as requisições podem mandar "upaes_versao" em vez da lista "upaes"
+registro_upaes = UpaeRegistry(os.environ.get('UPAE_REGISTRY') or None)
+if registro_upaes.path:
+    print(f"[REGISTRO] UPAEs carregadas: {registro_upaes.load()}")
+
+def resolve_upaes(data):
+    """
+    UPAEs da requisição: a lista "upaes" enviada no corpo ou, se ausente, o
+    catálogo do registro indicado por "upaes_versao" ("atual" = versão atual).
+
+    Returns:
+        (upaes ou None, mensagem de erro ou None)
+    """
+    if 'upaes' in data:
+        return data['upaes'], None
+    if 'upaes_versao' in data:
+        try:
+            return registro_upaes.get(data['upaes_versao']), None
+        except KeyError:
+            return None, f"Versão do registro de UPAEs não encontrada: {data['upaes_versao']}"
+    return None, None
+
+# Parâmetros fixos do GA do /api/otimizar-lote
+LOTE_GA_PARAMS = {
+    'pop_size': 120,
+    'generations': 400,
+    'crossover_rate': 0.7,
+    'mutation_rate': 0.3,
+    'elitism': 0.15,
+}
+
+def nao_truncado(resultado):
+    """Resultados cortados pelo prazo (modo anytime) não vão para o cache."""
+    parada = resultado.get('parada') or {}
+    return not parada.get('truncado', False)
+
+def reprodutivel(data, modo):
+    """
+    O NSGA-II sem seed sorteia uma semente nova a cada execução: o resultado
+    não é reprodutível e não vai para o cache (o modo "exato" sempre vai).
+    """
+    ilhas = data.get('ilhas') or {}
+    return modo == 'exato' or data.get('seed') is not None or ilhas.get('seed') is not None
+
 def normalize_patient_data(raw_patient):
     """
     Normaliza dados do paciente garantindo backward compatibility.
@@ -49,6 +124,264 @@ def normalize_patient_data(raw_patient):
         'urgente': raw_patient.get('urgente', False)  # Deprecated, usar severity_level
     }
 
+def parse_time_budget(data):
+    """
+    Valida o campo opcional "time_budget_ms" (modo anytime). O prazo é
+    contado a partir da chegada da requisição (ou do início do job, no
+    modo assíncrono).
+
+    Returns:
+        (orçamento em segundos ou None, mensagem de erro ou None)
+    """
+    budget = data.get('time_budget_ms')
+    if budget is None:
+        return None, None
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+        return None, f'time_budget_ms inválido: {budget}. Use um número positivo de milissegundos.'
+    return budget / 1000.0, None
+
+def validate_k_vizinhos(data):
+    """Valida o campo opcional "k_vizinhos" (K do índice espacial de candidatas)."""
+    k = data.get('k_vizinhos')
+    if k is not None and (isinstance(k, bool) or not isinstance(k, int) or k < 1):
+        return f'k_vizinhos inválido: {k}. Use um inteiro positivo.'
+    return None
+
+def validate_seed(data):
+    """Valida o campo opcional "seed" (semente do gerador da execução)."""
+    seed = data.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+        return f'seed inválida: {seed}. Use um inteiro não negativo.'
+    return None
+
+def validate_modo_lote(data):
+    """Valida o campo opcional "modo" do lote: "nsga2" (padrão) ou "exato"."""
+    modo = data.get('modo', 'nsga2')
+    if modo not in ('nsga2', 'exato'):
+        return f'Modo inválido: {modo}. Use "nsga2" ou "exato".'
+    return None
+
+def validate_warm_start(data):
+    """Valida o campo opcional "warm_start": true ou lista de pesos de viagem em [0, 1]."""
+    ws = data.get('warm_start')
+    if ws is None or isinstance(ws, bool):
+        return None
+    if (not isinstance(ws, list) or not ws
+            or any(isinstance(w, bool) or not isinstance(w, (int, float)) or not 0 <= w <= 1
+                   for w in ws)):
+        return f'warm_start inválido: {ws}. Use true ou uma lista de pesos entre 0 e 1.'
+    return None
+
+# Campos aceitos em "parada" (StoppingCriteria): nome -> (tipo, mínimo, mínimo
+# exclusivo?); o prazo absoluto (deadline) só vem de time_budget_ms
+PARADA_CAMPOS = {
+    'hv_window': (int, 1, False),
+    'hv_tol': (float, 0, False),
+    'mean_window': (int, 1, False),
+    'mean_tol': (float, 0, False),
+    'time_limit_s': (float, 0, True),
+    'max_evaluations': (int, 1, False),
+}
+
+def validate_number_fields(campo, valores, regras, outros=()):
+    """
+    Valida um objeto de parâmetros numéricos (ex.: "parada") contra
+    regras nome -> (tipo, mínimo, mínimo exclusivo?). None desliga o
+    parâmetro; `outros` são campos aceitos mas validados por quem chama.
+    Retorna a mensagem de erro ou None.
+    """
+    if not isinstance(valores, dict):
+        return f'{campo} inválido: {valores}. Use um objeto.'
+    aceitos = set(regras) | set(outros)
+    desconhecidos = sorted(set(valores) - aceitos)
+    if desconhecidos:
+        return f'{campo}: campos desconhecidos {desconhecidos}. Use {sorted(aceitos)}.'
+    for nome, valor in valores.items():
+        if valor is None or nome not in regras:
+            continue
+        tipo, minimo, exclusivo = regras[nome]
+        tipos = (int,) if tipo is int else (int, float)
+        if (isinstance(valor, bool) or not isinstance(valor, tipos)
+                or valor < minimo or (exclusivo and valor == minimo)):
+            descricao = 'inteiro' if tipo is int else 'número'
+            limite = f'> {minimo}' if exclusivo else f'>= {minimo}'
+            return f'{campo}.{nome} inválido: {valor}. Use um {descricao} {limite}.'
+    return None
+
+# Campos numéricos aceitos em "ilhas" (run_island_nsga2), mesmas regras de
+# PARADA_CAMPOS; "topologia" é validada à parte
+ILHAS_CAMPOS = {
+    'n_islands': (int, 1, False),
+    'migration_interval': (int, 1, False),
+    'migration_rate': (float, 0, False),
+    'seed': (int, 0, False),
+}
+
+def validate_ilhas(data):
+    """
+    Valida o campo opcional "ilhas" (parâmetros do modelo de ilhas). O
+    modelo de ilhas tem os próprios processos e só respeita o prazo
+    (time_budget_ms): "parada" e avaliadores paralelos são recusados em
+    vez de ignorados.
+    """
+    ilhas = data.get('ilhas')
+    if ilhas is None:
+        return None
+    erro = validate_number_fields('ilhas', ilhas, ILHAS_CAMPOS, outros=('topologia',))
+    if erro:
+        return erro
+    if ilhas.get('migration_rate') is not None and ilhas['migration_rate'] > 1:
+        return f"ilhas.migration_rate inválido: {ilhas['migration_rate']}. Use um número entre 0 e 1."
+    if 'topologia' in ilhas and ilhas['topologia'] not in TOPOLOGIAS:
+        return f"ilhas.topologia inválida: {ilhas['topologia']}. Use um de {list(TOPOLOGIAS)}."
+    if ilhas and data.get('parada') is not None:
+        return 'O modelo de ilhas não aceita "parada"; use time_budget_ms para limitar o tempo.'
+    if ilhas and data.get('avaliador', 'serial') != 'serial':
+        return 'O modelo de ilhas já avalia em processos próprios; não informe "avaliador".'
+    return None
+
+def validate_prazo(data):
+    """
+    Recusa limites de tempo (time_budget_ms ou parada.time_limit_s) nos modos
+    que não podem ser interrompidos: o "exato" e o "warm_start" rodam solvers
+    exatos até o fim, então o prazo não seria respeitado.
+    """
+    parada = data.get('parada') or {}
+    if data.get('time_budget_ms') is None and parada.get('time_limit_s') is None:
+        return None
+    if data.get('modo', 'nsga2') == 'exato':
+        return 'O modo "exato" não respeita prazo; não informe time_budget_ms nem time_limit_s.'
+    if data.get('warm_start'):
+        return 'O "warm_start" não respeita prazo; não informe time_budget_ms nem time_limit_s.'
+    return None
+
+# Campos numéricos do próprio lote validados por validate_number_fields
+LOTE_CAMPOS = {
+    'n_workers': (int, 1, False),
+}
+
+def validate_n_workers(data):
+    """Valida o campo opcional "n_workers" (nº de workers dos backends paralelos)."""
+    if data.get('n_workers') is None:
+        return None
+    return validate_number_fields('lote', {'n_workers': data['n_workers']}, LOTE_CAMPOS)
+
+def validate_parada(data):
+    """Valida o campo opcional "parada" (critérios de StoppingCriteria)."""
+    parada = data.get('parada')
+    if parada is None:
+        return None
+    return validate_number_fields('parada', parada, PARADA_CAMPOS)
+
+def executar_lote(data, upaes, deadline=None, on_generation=None):
+    """
+    Executa o NSGA-II para um lote já validado e monta a resposta do
+    /api/otimizar-lote (usado direto pela rota e pelos jobs assíncronos).
+    """
+    pacientes = data['pacientes']
+
+    # O backend de avaliação e n_workers não mudam o resultado: ficam fora da chave
+    chave = instance_key('lote', pacientes, upaes, BASE_NO_SHOW, {
+        **LOTE_GA_PARAMS,
+        'ilhas': data.get('ilhas'),
+        'parada': data.get('parada'),
+        'time_budget_ms': data.get('time_budget_ms'),
+        'k_vizinhos': data.get('k_vizinhos'),
+        'warm_start': data.get('warm_start'),
+        'modo': data.get('modo', 'nsga2'),
+        'seed': data.get('seed')
+    })
+
+    # Executar algoritmo genético para todo o lote (ou reaproveitar do cache)
+    resultado_ga, acerto = cache_resultados.get_or_compute(
+        chave,
+        lambda: run_genetic_algorithm(
+            pacientes,
+            upaes,
+            **LOTE_GA_PARAMS,
+            evaluator=data.get('avaliador', 'serial'),
+            n_workers=data.get('n_workers'),
+            islands=data.get('ilhas'),
+            stop_criteria=data.get('parada'),
+            deadline=deadline,
+            on_generation=on_generation,
+            k_nearest=data.get('k_vizinhos'),
+            warm_start=data.get('warm_start'),
+            modo=data.get('modo', 'nsga2'),
+            seed=data.get('seed')
+        ),
+        cacheable=lambda r: reprodutivel(data, data.get('modo', 'nsga2')) and nao_truncado(r)
+    )
+
+    # Processar resultado
+    best_chromosome = resultado_ga['best_chromosome']
+    alocacoes = []
+
+    upae_map = {u['id']: u for u in upaes}
+
+    # Distância e no-show de todos os pares alocados numa única chamada vetorizada
+    alocados = [
+        i for i, upae_id in enumerate(best_chromosome)
+        if upae_id not in (-1, None) and upae_id in upae_map
+    ]
+    p_alocados, dist_alocados = compute_p_noshow_pairs(
+        [pacientes[i] for i in alocados],
+        [upae_map[best_chromosome[i]] for i in alocados],
+        [BASE_NO_SHOW.get(pacientes[i]['especialidade'].lower(), 0.3) for i in alocados]
+    )
+    metricas = {
+        i: (p, d) for i, p, d in zip(alocados, p_alocados.tolist(), dist_alocados.tolist())
+    }
+
+    for i, upae_id in enumerate(best_chromosome):
+        paciente = pacientes[i]
+
+        if upae_id == -1 or upae_id is None:
+            alocacoes.append({
+                'paciente_id': paciente.get('id', i),
+                'upae_id': None,
+                'status': 'nao_alocado',
+                'mensagem': 'Nenhuma UPAE compatível disponível'
+            })
+            continue
+
+        upae = upae_map.get(upae_id)
+
+        if not upae:
+            continue
+
+        p_noshow, dist = metricas[i]
+
+        alocacoes.append({
+            'paciente_id': paciente.get('id', i),
+            'paciente_nome': paciente.get('nome', 'N/A'),
+            'upae_id': upae['id'],
+            'upae_nome': upae['nome'],
+            'status': 'alocado',
+            'distancia_km': round(dist, 2),
+            'prob_noshow': round(p_noshow * 100, 1),
+            'tempo_espera_dias': upae.get('tempo_espera_dias', 0)
+        })
+
+    return {
+        'sucesso': True,
+        'alocacoes': alocacoes,
+        'estatisticas': {
+            'total_pacientes': len(pacientes),
+            'pacientes_alocados': sum(1 for a in alocacoes if a['status'] == 'alocado'),
+            'fitness': resultado_ga['best_fitness'],
+            'diagnosticos': resultado_ga['best_diag'],
+            'parada': resultado_ga['parada'],
+            'seed': resultado_ga.get('seed'),
+            'cache': 'acerto' if acerto else 'falta'
+        }
+    }
+
+def executar_lote_job(data, upaes, budget_s, on_generation=None):
+    """Job assíncrono do lote: o prazo anytime começa quando o job inicia."""
+    deadline = time.monotonic() + budget_s if budget_s is not None else None
+    return executar_lote(data, upaes, deadline=deadline, on_generation=on_generation)
+
 @app.route('/api/otimizar', methods=['POST'])
 def otimizar():
     """
@@ -78,7 +411,11 @@ def otimizar():
                 "transport_score": 0.8
             },
             ...
-        ]
+        ],
+        // ou, no lugar de "upaes": "upaes_versao": "atual" (registro do servidor)
+        "modo": "exato",   // opcional: "exato" (padrão) ou "nsga2"
+        "time_budget_ms": 500, // opcional: prazo do modo anytime ("nsga2")
+        "seed": 123        // opcional: semente do modo "nsga2" (devolvida em "seed")
     }
 
     Returns:
@@ -89,20 +426,43 @@ def otimizar():
         "prob_noshow": 8.3,
         "tempo_espera_dias": 5,
         "fitness": 0.85,
-        "diagnosticos": {...}
+        "diagnosticos": {...},
+        "parada": {"motivo": "solucao_exata", "truncado": false, "geracoes_executadas": 0, ...}
     }
     """
+    t_request = time.monotonic()
     try:
         data = request.get_json()
 
-        if not data or 'paciente' not in data or 'upaes' not in data:
+        if not data or 'paciente' not in data:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'Dados inválidos. Necessário enviar paciente e upaes.'
+            }), 400
+
+        upaes, erro = resolve_upaes(data)
+        if erro:
+            return jsonify({'sucesso': False, 'erro': erro}), 404
+        if upaes is None:
             return jsonify({
                 'sucesso': False,
                 'erro': 'Dados inválidos. Necessário enviar paciente e upaes.'
             }), 400
 
         paciente_raw = data['paciente']
-        upaes = data['upaes']
+        modo = data.get('modo', 'exato')
+
+        if modo not in ('exato', 'nsga2'):
+            return jsonify({
+                'sucesso': False,
+                'erro': f'Modo inválido: {modo}. Use "exato" ou "nsga2".'
+            }), 400
+
+        budget_s, erro = parse_time_budget(data)
+        erro = erro or validate_seed(data)
+        if erro:
+            return jsonify({'sucesso': False, 'erro': erro}), 400
+        deadline = t_request + budget_s if budget_s is not None else None
 
         # Validar campos obrigatórios
         campos_obrigatorios = ['especialidade', 'lat', 'lon']
@@ -117,9 +477,21 @@ def otimizar():
         paciente = normalize_patient_data(paciente_raw)
 
         # Executar otimização
-        resultado = otimizar_alocacao_paciente(paciente, upaes)
+        params = {'modo': modo}
+        if modo == 'nsga2':
+            params['time_budget_ms'] = data.get('time_budget_ms')
+            params['seed'] = data.get('seed')
+        chave = instance_key('paciente', [paciente], upaes, BASE_NO_SHOW, params)
+        resultado, acerto = cache_resultados.get_or_compute(
+            chave,
+            lambda: otimizar_alocacao_paciente(paciente, upaes, modo=modo, deadline=deadline,
+                                               seed=data.get('seed')),
+            cacheable=lambda r: reprodutivel(data, modo) and nao_truncado(r)
+        )
 
-        return jsonify(resultado)
+        response = jsonify(resultado)
+        response.headers['X-Cache'] = 'HIT' if acerto else 'MISS'
+        return response
 
     except Exception as e:
         import traceback
@@ -139,7 +511,37 @@ def otimizar_lote():
     Request Body:
     {
         "pacientes": [...],
-        "upaes": [...]
+        "upaes": [...],          // ou "upaes_versao": "atual" (registro do servidor);
+                                 // cada UPAE pode ter "vagas": N (compartilhadas)
+                                 // ou {"Cardiologia": N, ...} (padrão: 1 vaga)
+        "avaliador": "serial",   // opcional: "serial", "threads" ou "processos"
+        "n_workers": 8,          // opcional: nº de workers dos backends paralelos
+        "ilhas": {               // opcional: executa em modelo de ilhas (não
+                                 // combina com "parada" nem com "avaliador")
+            "n_islands": 8,
+            "migration_interval": 20,
+            "migration_rate": 0.1,
+            "topologia": "anel"  // "anel" ou "completa"
+        },
+        "parada": {              // opcional: critérios de parada antecipada
+            "hv_window": 30, "hv_tol": 0.0001,
+            "mean_window": 30, "mean_tol": 0.0001,
+            "time_limit_s": 20, "max_evaluations": 20000
+        },
+        "time_budget_ms": 5000,  // opcional: modo anytime; devolve a melhor
+                                 // frente encontrada até o prazo (recusado
+                                 // com "modo": "exato" e com "warm_start")
+        "k_vizinhos": 10,        // opcional: operadores sorteiam entre as K
+                                 // UPAEs compatíveis mais próximas
+        "warm_start": true,      // opcional: semeia a população com atribuições
+                                 // ótimas (ou lista de pesos de viagem, ex.
+                                 // [1, 0.5, 0])
+        "modo": "nsga2",         // opcional: "nsga2" (padrão) ou "exato"
+                                 // (referência exata por varredura de pesos)
+        "seed": 123,             // opcional: semente da execução; a usada
+                                 // volta em estatisticas.seed
+        "assincrono": true       // opcional: responde 202 com job_id na hora;
+                                 // acompanhe por GET /api/jobs/<job_id>
     }
 
     Returns:
@@ -154,91 +556,237 @@ def otimizar_lote():
             },
             ...
         ],
-        "estatisticas": {...}
+        "estatisticas": {
+            ...,
+            "parada": {"motivo": "tempo_esgotado", "truncado": true,
+                       "geracoes_executadas": 88, ...}
+        }
     }
     """
+    t_request = time.monotonic()
     try:
         data = request.get_json()
 
-        if not data or 'pacientes' not in data or 'upaes' not in data:
+        if not data or 'pacientes' not in data:
             return jsonify({
                 'sucesso': False,
                 'erro': 'Dados inválidos. Necessário enviar pacientes e upaes.'
             }), 400
 
-        pacientes = data['pacientes']
-        upaes = data['upaes']
+        upaes, erro = resolve_upaes(data)
+        if erro:
+            return jsonify({'sucesso': False, 'erro': erro}), 404
+        if upaes is None:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'Dados inválidos. Necessário enviar pacientes e upaes.'
+            }), 400
 
-        # Executar algoritmo genético para todo o lote
-        resultado_ga = run_genetic_algorithm(
-            pacientes,
-            upaes,
-            pop_size=120,
-            generations=400,
-            crossover_rate=0.7,
-            mutation_rate=0.3,
-            elitism=0.15
-        )
+        avaliador = data.get('avaliador', 'serial')
 
-        # Processar resultado
-        best_chromosome = resultado_ga['best_chromosome']
-        alocacoes = []
+        if avaliador not in EVALUATOR_BACKENDS:
+            return jsonify({
+                'sucesso': False,
+                'erro': f'Avaliador inválido: {avaliador}. Use um de {sorted(EVALUATOR_BACKENDS)}.'
+            }), 400
 
-        upae_map = {u['id']: u for u in upaes}
+        erro = (validate_k_vizinhos(data) or validate_warm_start(data)
+            or validate_modo_lote(data) or validate_seed(data) or validate_n_workers(data)
+            or validate_parada(data) or validate_ilhas(data) or validate_prazo(data))
+        if erro:
+            return jsonify({'sucesso': False, 'erro': erro}), 400
+
+        budget_s, erro = parse_time_budget(data)
+        if erro:
+            return jsonify({'sucesso': False, 'erro': erro}), 400
+
+        if data.get('assincrono'):
+            # O prazo do modo anytime conta a partir do início do job
+            try:
+                job_id = fila_jobs.submit(executar_lote_job, data, upaes, budget_s)
+            except FilaCheiaError as e:
+                return jsonify({'sucesso': False, 'erro': str(e)}), 503
+            return jsonify({
+                'sucesso': True,
+                'job_id': job_id,
+                'status': 'na_fila',
+                'url': f'/api/jobs/{job_id}'
+            }), 202
 
-        for i, upae_id in enumerate(best_chromosome):
-            paciente = pacientes[i]
+        deadline = t_request + budget_s if budget_s is not None else None
+        return jsonify(executar_lote(data, upaes, deadline=deadline))
 
-            if upae_id == -1 or upae_id is None:
-                alocacoes.append({
-                    'paciente_id': paciente.get('id', i),
-                    'upae_id': None,
-                    'status': 'nao_alocado',
-                    'mensagem': 'Nenhuma UPAE compatível disponível'
-                })
-                continue
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"\n[ERRO] ERRO NA OTIMIZACAO LOTE:\n{error_details}")
+        return jsonify({
+            'sucesso': False,
+            'erro': str(e),
+            'detalhes': error_details
+        }), 500
 
-            upae = upae_map.get(upae_id)
+class StreamCancelado(Exception):
+    """O cliente do stream SSE desconectou; interrompe a evolução."""
 
-            if not upae:
-                continue
+def sse_event(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados)}\n\n"
 
-            from otimizador_genetico import compute_p_noshow, BASE_NO_SHOW, haversine
+@app.route('/api/otimizar-lote/stream', methods=['POST'])
+def otimizar_lote_stream():
+    """
+    Mesmo que /api/otimizar-lote, mas responde em Server-Sent Events
+    (text/event-stream) enquanto o NSGA-II evolui:
+
+        event: geracao       -> {"geracao": 12, "geracoes": 400,
+                                 "media_front0": [...], "tamanho_front0": 9, ...}
+        event: compromisso   -> {"geracao": 12, "objetivos": [...],
+                                 "upae_ids": [...]}   // só quando a solução melhora
+        event: resultado     -> resposta completa do /api/otimizar-lote
+        event: erro          -> {"sucesso": false, "erro": "..."}
+
+    O primeiro "compromisso" sai logo após a avaliação da população
+    inicial (geracao = -1), para o cliente mostrar uma alocação provisória
+    e refiná-la. Aceita os mesmos campos do /api/otimizar-lote (exceto
+    "assincrono").
+    """
+    t_request = time.monotonic()
+    data = request.get_json()
 
-            base_ns = BASE_NO_SHOW.get(paciente['especialidade'].lower(), 0.3)
-            p_noshow, dist = compute_p_noshow(paciente, upae, base_ns)
+    if not data or 'pacientes' not in data:
+        return jsonify({
+            'sucesso': False,
+            'erro': 'Dados inválidos. Necessário enviar pacientes e upaes.'
+        }), 400
 
-            alocacoes.append({
-                'paciente_id': paciente.get('id', i),
-                'paciente_nome': paciente.get('nome', 'N/A'),
-                'upae_id': upae['id'],
-                'upae_nome': upae['nome'],
-                'status': 'alocado',
-                'distancia_km': round(dist, 2),
-                'prob_noshow': round(p_noshow * 100, 1),
-                'tempo_espera_dias': upae.get('tempo_espera_dias', 0)
-            })
+    upaes, erro = resolve_upaes(data)
+    if erro:
+        return jsonify({'sucesso': False, 'erro': erro}), 404
+    if upaes is None:
+        return jsonify({
+            'sucesso': False,
+            'erro': 'Dados inválidos. Necessário enviar pacientes e upaes.'
+        }), 400
 
+    avaliador = data.get('avaliador', 'serial')
+    if avaliador not in EVALUATOR_BACKENDS:
         return jsonify({
-            'sucesso': True,
-            'alocacoes': alocacoes,
-            'estatisticas': {
-                'total_pacientes': len(pacientes),
-                'pacientes_alocados': sum(1 for a in alocacoes if a['status'] == 'alocado'),
-                'fitness': resultado_ga['best_fitness'],
-                'diagnosticos': resultado_ga['best_diag']
-            }
-        })
+            'sucesso': False,
+            'erro': f'Avaliador inválido: {avaliador}. Use um de {sorted(EVALUATOR_BACKENDS)}.'
+        }), 400
+
+    erro = (validate_k_vizinhos(data) or validate_warm_start(data)
+            or validate_modo_lote(data) or validate_seed(data) or validate_n_workers(data)
+            or validate_parada(data) or validate_ilhas(data) or validate_prazo(data))
+    if erro:
+        return jsonify({'sucesso': False, 'erro': erro}), 400
+
+    budget_s, erro = parse_time_budget(data)
+    if erro:
+        return jsonify({'sucesso': False, 'erro': erro}), 400
+    deadline = t_request + budget_s if budget_s is not None else None
+
+    eventos = queue.Queue()
+    cancelado = threading.Event()
+
+    def on_generation(progresso):
+        if cancelado.is_set():
+            raise StreamCancelado()
+        eventos.put(('progresso', progresso))
+
+    def worker():
+        try:
+            eventos.put(('resultado', executar_lote(data, upaes, deadline, on_generation)))
+        except StreamCancelado:
+            pass
+        except Exception as e:
+            eventos.put(('erro', {'sucesso': False, 'erro': str(e)}))
+
+    def stream():
+        threading.Thread(target=worker, daemon=True).start()
+        ultimo = None
+        try:
+            while True:
+                evento, dados = eventos.get()
+                if evento != 'progresso':
+                    yield sse_event(evento, dados)
+                    return
+                compromisso = dados.pop('compromisso')
+                yield sse_event('geracao', dados)
+                if ultimo is None or compromisso['objetivos'] != ultimo:
+                    ultimo = compromisso['objetivos']
+                    yield sse_event('compromisso', {'geracao': dados['geracao'], **compromisso})
+        finally:
+            # Cliente desconectou (ou stream terminou): para o worker
+            cancelado.set()
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def consultar_job(job_id):
+    """
+    Estado de um job assíncrono do /api/otimizar-lote
 
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"\n[ERRO] ERRO NA OTIMIZACAO LOTE:\n{error_details}")
+    Returns:
+    {
+        "job_id": "...",
+        "status": "executando",   // "na_fila", "executando", "concluido" ou "erro"
+        "progresso": {"geracao": 87, "geracoes": 400,
+                      "media_front0": [12.3, 4.5], ...},
+        "resultado": null,        // resposta do /api/otimizar-lote ao concluir
+        "erro": null,
+        "criado_em": ..., "iniciado_em": ..., "concluido_em": ..., "expira_em": ...
+    }
+    """
+    job = fila_jobs.get(job_id)
+    if job is None:
         return jsonify({
             'sucesso': False,
-            'erro': str(e),
-            'detalhes': error_details
-        }), 500
+            'erro': f'Job não encontrado (ou expirado): {job_id}'
+        }), 404
+    return jsonify(job)
+
+@app.route('/api/upaes', methods=['GET'])
+def upaes_registro():
+    """
+    Versões do registro de UPAEs do servidor
+
+    Query: ?versao=<versao> (ou "atual") inclui a lista de UPAEs da versão.
+    """
+    info = registro_upaes.info()
+    versao = request.args.get('versao')
+    if versao:
+        try:
+            info['upaes'] = list(registro_upaes.get(versao))
+        except KeyError:
+            return jsonify({
+                'sucesso': False,
+                'erro': f'Versão do registro de UPAEs não encontrada: {versao}'
+            }), 404
+    return jsonify(info)
+
+@app.route('/api/upaes/recarregar', methods=['POST'])
+def recarregar_upaes():
+    """Relê o arquivo do registro; conteúdo novo vira uma nova versão"""
+    if not registro_upaes.path:
+        return jsonify({
+            'sucesso': False,
+            'erro': 'Nenhum arquivo de registro configurado (UPAE_REGISTRY).'
+        }), 400
+    try:
+        info = registro_upaes.reload()
+    except Exception as e:
+        # A versão anterior continua valendo
+        return jsonify({'sucesso': False, 'erro': f'Falha ao recarregar o registro: {e}'}), 500
+    return jsonify({'sucesso': True, 'versao': info['versao'], **registro_upaes.info()})
+
+@app.route('/api/cache', methods=['GET', 'DELETE'])
+def cache_stats():
+    """Contadores do cache de resultados (GET) ou limpeza do cache (DELETE)"""
+    if request.method == 'DELETE':
+        cache_resultados.clear()
+    return jsonify(cache_resultados.stats())
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -335,10 +883,31 @@ def docs():
             <h4>Request Body:</h4>
             <pre><code>{
   "pacientes": [...],  // Array de pacientes
-  "upaes": [...]       // Array de UPAEs
+  "upaes": [...],      // Array de UPAEs
+  "assincrono": true   // Opcional: responde 202 com job_id
 }</code></pre>
         </div>
 
+        <div class="endpoint">
+            <h3><span class="method post">POST</span> /api/otimizar-lote/stream</h3>
+            <p>Mesmo corpo do /api/otimizar-lote; responde em Server-Sent Events com o resumo da frente 0 a cada geração, a solução de compromisso sempre que melhora e o resultado final</p>
+        </div>
+
+        <div class="endpoint">
+            <h3><span class="method get">GET</span> /api/jobs/&lt;job_id&gt;</h3>
+            <p>Status, progresso (geração atual e médias da frente 0) e resultado de um job assíncrono</p>
+        </div>
+
+        <div class="endpoint">
+            <h3><span class="method get">GET</span> /api/upaes</h3>
+            <p>Versões do registro de UPAEs do servidor (<code>?versao=atual</code> inclui a lista). As requisições podem enviar <code>"upaes_versao": "atual"</code> (ou uma versão) no lugar de <code>"upaes"</code>. <code>POST /api/upaes/recarregar</code> relê o arquivo do registro.</p>
+        </div>
+
+        <div class="endpoint">
+            <h3><span class="method get">GET</span> /api/cache</h3>
+            <p>Contadores do cache de resultados (acertos, faltas, entradas); DELETE limpa o cache</p>
+        </div>
+
         <div class="endpoint">
             <h3><span class="method get">GET</span> /health</h3>
             <p>Health check do servidor</p>
@@ -409,6 +978,11 @@ if __name__ == '__main__':
     print("\nEndpoints disponiveis:")
     print("  POST /api/otimizar - Otimizar alocacao de um paciente")
     print("  POST /api/otimizar-lote - Otimizar alocacao de multiplos pacientes")
+    print("  POST /api/otimizar-lote/stream - Lote com progresso via SSE")
+    print("  GET  /api/jobs/<id> - Status de um job assincrono do lote")
+    print("  GET  /api/cache - Estatisticas do cache de resultados")
+    print("  GET  /api/upaes - Versoes do registro de UPAEs")
+    print("  POST /api/upaes/recarregar - Recarregar o registro de UPAEs")
     print("  GET  /health - Health check")
     print("=" * 60)
 
@@ -0,0 +1,285 @@
+"""
+Atribuição Ótima por Soma Ponderada
+Resolve EXATAMENTE a atribuição paciente -> UPAE que minimiza
+w * viagem + (1 - w) * espera, sobre as mesmas tabelas da ProblemInstance,
+respeitando a compatibilidade de especialidade e a capacidade de cada grupo
+de vagas (ver upae_slots). Usado para semear a população inicial do NSGA-II
+(warm start) e como referência exata (varredura de pesos) para medir a
+qualidade da frente do NSGA-II.
+
+Solver: scipy.optimize.linear_sum_assignment se o SciPy estiver instalado
+(cada grupo de vagas vira uma coluna por vaga); senão, ou se a matriz
+expandida ficar grande demais, caminhos aumentantes mínimos com potenciais
+(Hungarian com capacidades) em NumPy.
+"""
+
+import time
+
+import numpy as np
+
+from otimizador_genetico import (
+    BASE_NO_SHOW,
+    ProblemInstance,
+    can_fully_allocate,
+    fast_nondominated_sort,
+    pareto_result,
+)
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy é opcional
+    linear_sum_assignment = None
+
+# Pesos de viagem padrão do warm start: só distância, misturas e só espera
+WARM_START_WEIGHTS = (1.0, 0.75, 0.5, 0.25, 0.0)
+
+# Número padrão de pesos da varredura exata (solve_weighted_sum_sweep)
+SWEEP_WEIGHTS = 11
+
+# Folga nos pesos extremos da varredura: desempata o outro objetivo, para
+# os extremos não saírem fracamente dominados
+SWEEP_EPS = 1e-6
+
+# Máximo de células da matriz expandida (vagas em colunas) para usar o SciPy
+SCIPY_MAX_ENTRIES = 20_000_000
+
+# ==========================================
+# MATRIZ DE CUSTOS POR GRUPO DE VAGAS
+# ==========================================
+
+def pool_upaes(indice):
+    """UPAE (índice de coluna) de cada grupo de vagas do SpecialtyIndex."""
+    return np.array(indice.pool_upae, dtype=np.int32)
+
+def pool_cost_matrix(instancia, w_trav):
+    """
+    Custo w * viagem + (1 - w) * espera de cada par (paciente, grupo de
+    vagas), matriz n_pacientes x n_grupos; inf onde o grupo não atende a
+    especialidade do paciente.
+    """
+    indice = instancia.specialties
+    cost = np.full((instancia.n_patients, indice.n_pools), np.inf)
+    rows_by_spec = {}
+    for i, spec in enumerate(indice.patient_spec):
+        rows_by_spec.setdefault(spec, []).append(i)
+
+    for spec, rows in rows_by_spec.items():
+        compat = indice.compatible_by_spec.get(spec)
+        if compat is None or len(compat) == 0:
+            continue
+        pools = [indice.pool_of[j][spec] for j in compat.tolist()]
+        cost[np.ix_(rows, pools)] = (
+            w_trav * instancia.travel_cost[np.ix_(rows, compat)]
+            + (1.0 - w_trav) * instancia.wait_cost[compat]
+        )
+    return cost
+
+# ==========================================
+# SOLVERS
+# ==========================================
+
+def solve_capacitated_assignment(cost, capacity):
+    """
+    Atribuição de custo mínimo com capacidades.
+
+    cost: matriz (linhas x colunas), inf = par proibido
+    capacity: máximo de linhas por coluna
+
+    Primeiro maximiza o número de linhas atribuídas e, entre essas
+    soluções, minimiza o custo total (linhas sem par possível ficam de
+    fora). Retorna a coluna de cada linha (-1 = sem vaga).
+    """
+    cost = np.asarray(cost, dtype=float)
+    capacity = np.asarray(capacity, dtype=np.int64)
+    n_rows, n_cols = cost.shape
+    if n_rows == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Coluna "sem vaga" com custo maior que qualquer diferença entre duas
+    # atribuições: uma linha a mais atribuída sempre compensa
+    finite = cost[np.isfinite(cost)]
+    if finite.size:
+        big = n_rows * (finite.max() - finite.min()) + abs(finite.max()) + 1.0
+    else:
+        big = 1.0
+    cost = np.hstack((cost, np.full((n_rows, 1), big)))
+    capacity = np.append(np.minimum(capacity, n_rows), n_rows)
+
+    if linear_sum_assignment is not None and n_rows * capacity.sum() <= SCIPY_MAX_ENTRIES:
+        cols = _solve_scipy(cost, capacity)
+    else:
+        cols = _solve_shortest_paths(cost, capacity)
+    cols[cols == n_cols] = -1
+    return cols
+
+def _solve_scipy(cost, capacity):
+    """Expande cada coluna em `capacity` cópias e usa linear_sum_assignment."""
+    col_of = np.repeat(np.arange(cost.shape[1]), capacity)
+    rows, cols = linear_sum_assignment(cost[:, col_of])
+    result = np.empty(cost.shape[0], dtype=np.int64)
+    result[rows] = col_of[cols]
+    return result
+
+def _solve_shortest_paths(cost, capacity):
+    """
+    Caminhos aumentantes mínimos (Dijkstra com potenciais), uma linha por
+    vez, sem expandir as colunas: uma coluna lotada é atravessada pelas
+    linhas já atribuídas a ela. Custos reduzidos cost - u - v ficam >= 0 e
+    são zero nos pares atribuídos.
+    """
+    n_rows, n_cols = cost.shape
+    # Coluna sem capacidade nunca recebe linhas (e não tem membros para atravessar)
+    cost = np.where(capacity > 0, cost, np.inf)
+    u = np.zeros(n_rows)
+    v = np.zeros(n_cols)
+    load = np.zeros(n_cols, dtype=np.int64)
+    members = [[] for _ in range(n_cols)]
+    row_col = np.full(n_rows, -1, dtype=np.int64)
+    cols_idx = np.arange(n_cols)
+
+    for r in range(n_rows):
+        reduced = cost[r] - v
+        u[r] = reduced.min()
+        dist = reduced - u[r]
+        pred_row = np.full(n_cols, r, dtype=np.int64)
+        pred_col = np.full(n_cols, -1, dtype=np.int64)
+        visited = np.zeros(n_cols, dtype=bool)
+        row_dist = {r: 0.0}
+
+        while True:
+            g = int(np.argmin(np.where(visited, np.inf, dist)))
+            d_g = dist[g]
+            if load[g] < capacity[g]:
+                break
+            # Coluna lotada: segue pelas linhas atribuídas a ela (custo reduzido zero)
+            visited[g] = True
+            rows = np.array(members[g], dtype=np.int64)
+            for i in members[g]:
+                row_dist[i] = d_g
+            cand = d_g + cost[rows] - u[rows, None] - v
+            best = cand.argmin(axis=0)
+            cand_min = cand[best, cols_idx]
+            improve = (cand_min < dist) & ~visited
+            dist[improve] = cand_min[improve]
+            pred_row[improve] = rows[best[improve]]
+            pred_col[improve] = g
+
+        # Atualiza os potenciais com a distância até a coluna livre encontrada
+        for i, d_i in row_dist.items():
+            u[i] += d_g - d_i
+        v[visited] -= d_g - dist[visited]
+
+        # Aumenta: cada linha do caminho passa para a coluna seguinte
+        while True:
+            i = pred_row[g]
+            g_from = pred_col[g]
+            members[g].append(i)
+            load[g] += 1
+            row_col[i] = g
+            if g_from == -1:
+                break
+            members[g_from].remove(i)
+            load[g_from] -= 1
+            g = g_from
+
+    return row_col
+
+# ==========================================
+# ATRIBUIÇÕES ÓTIMAS E WARM START
+# ==========================================
+
+def optimal_assignment(instancia, w_trav):
+    """
+    Cromossomo (índices de coluna, -1 = sem vaga) que minimiza
+    w_trav * viagem + (1 - w_trav) * espera, atendendo o máximo possível de
+    pacientes. Com todos atendidos o número de atendidos é constante e essa
+    é a soma ponderada ótima dos dois objetivos (sem a soft constraint de
+    no-show, que não é linear).
+    """
+    indice = instancia.specialties
+    cols = solve_capacitated_assignment(
+        pool_cost_matrix(instancia, w_trav), indice.pool_capacity
+    )
+    # Sentinela no fim: a coluna -1 ("sem vaga") vira o gene -1, mesmo sem grupos
+    upae_of = np.append(pool_upaes(indice), -1).astype(np.int32)
+    return upae_of[cols]
+
+def distinct_assignments(instancia, weights):
+    """
+    Atribuições ótimas para cada peso de viagem em `weights`, sem
+    repetições. Retorna (cromossomos em índices de coluna, peso de cada um).
+    """
+    population = []
+    pesos = []
+    seen = set()
+    for w in weights:
+        genes = optimal_assignment(instancia, float(w)).tolist()
+        key = tuple(genes)
+        if key not in seen:
+            seen.add(key)
+            population.append(genes)
+            pesos.append(float(w))
+    return population, pesos
+
+def warm_start_population(instancia, weights=WARM_START_WEIGHTS):
+    """
+    Cromossomos (índices de coluna) das atribuições ótimas distintas para a
+    população inicial do NSGA-II.
+    """
+    return distinct_assignments(instancia, weights)[0]
+
+# ==========================================
+# REFERÊNCIA EXATA (VARREDURA DE PESOS)
+# ==========================================
+
+def sweep_weights(n_weights=SWEEP_WEIGHTS):
+    """n_weights pesos de viagem igualmente espaçados em [SWEEP_EPS, 1 - SWEEP_EPS]."""
+    if n_weights < 2:
+        return [0.5]
+    return np.linspace(SWEEP_EPS, 1.0 - SWEEP_EPS, n_weights).tolist()
+
+def solve_weighted_sum_sweep(pacientes, upaes, base_ns=None, weights=None,
+                             n_weights=SWEEP_WEIGHTS):
+    """
+    Frente de referência exata por soma ponderada: resolve a atribuição
+    ótima (optimal_assignment) para cada peso de viagem em `weights` (padrão:
+    sweep_weights(n_weights)) e avalia os cromossomos com os objetivos do
+    NSGA-II.
+
+    Cada ponto é o ótimo exato da sua soma ponderada quando todos os
+    pacientes podem ser atendidos e a soft constraint de no-show não está
+    ativa; a frente obtida é formada pelos pontos suportados da frente de
+    Pareto (os que ficam em regiões não convexas só o NSGA-II encontra).
+
+    Retorna o mesmo formato de run_nsga2, com parada['motivo'] =
+    'soma_ponderada_exata' e a chave extra 'pesos' (peso de viagem de cada
+    cromossomo da população).
+    """
+    if base_ns is None:
+        base_ns = BASE_NO_SHOW
+    if weights is None:
+        weights = sweep_weights(n_weights)
+
+    t0 = time.monotonic()
+    instancia = ProblemInstance(pacientes, upaes, base_ns)
+    force_allocation = can_fully_allocate(pacientes, upaes, instancia.specialties)
+
+    population, pesos = distinct_assignments(instancia, weights)
+    population = np.array(population, dtype=np.int32).reshape(-1, instancia.n_patients)
+    objectives_list = [
+        tuple(o) for o in
+        instancia.evaluate_population(population, not force_allocation).tolist()
+    ]
+    fronts = fast_nondominated_sort(population, objectives_list)
+
+    result = pareto_result(instancia, population, objectives_list, fronts, [])
+    result['pesos'] = pesos
+    result['parada'] = {
+        'motivo': 'soma_ponderada_exata',
+        'truncado': False,
+        'geracao': -1,
+        'geracoes_executadas': 0,
+        'avaliacoes': len(population),
+        'tempo_s': time.monotonic() - t0
+    }
+    return result
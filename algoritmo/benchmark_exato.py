@@ -0,0 +1,125 @@
+"""
+Benchmark: NSGA-II x Referência Exata por Soma Ponderada
+Para instâncias sintéticas de tamanhos crescentes, compara a frente do
+NSGA-II (run_nsga2) com a frente exata de solve_weighted_sum_sweep:
+hipervolume relativo, distância da solução de compromisso até o ótimo da
+soma dos objetivos e tempo de execução.
+
+Uso:
+    python benchmark_exato.py --tamanhos 50 200 500 --geracoes 200
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from atribuicao_otima import linear_sum_assignment, solve_weighted_sum_sweep
+from otimizador_genetico import hypervolume_2d, run_nsga2
+
+CIDADES = {
+    'Recife':   (-8.0543, -34.8813),
+    'Jaboatão': (-8.1765, -35.0326),
+    'Olinda':   (-8.0089, -34.8553),
+    'Cabo':     (-8.2839, -35.0321),
+    'Igarassu': (-7.8306, -34.9085),
+    'Caruaru':  (-8.2760, -35.9819),
+}
+
+ESPECIALIDADES = ('Cardiologia', 'Endocrinologia', 'Ortopedia', 'Dermatologia', 'Neurologia')
+
+def gerar_instancia(n_pacientes, n_upaes, seed=0):
+    """Pacientes e UPAEs sintéticos ao redor das cidades de CIDADES."""
+    rng = random.Random(seed)
+    cidades = list(CIDADES.values())
+
+    upaes = []
+    for j in range(n_upaes):
+        lat, lon = rng.choice(cidades)
+        upaes.append({
+            'id': f'upae-{j}',
+            'nome': f'UPAE {j}',
+            'especialidades': rng.sample(ESPECIALIDADES, rng.randint(1, 3)),
+            'lat': lat + rng.uniform(-0.05, 0.05),
+            'lon': lon + rng.uniform(-0.05, 0.05),
+            'tempo_espera_dias': rng.randint(1, 45),
+            'transport_score': rng.uniform(0.2, 1.0),
+        })
+
+    pacientes = []
+    for i in range(n_pacientes):
+        lat, lon = rng.choice(cidades)
+        pacientes.append({
+            'id': f'pac-{i}',
+            'especialidade': rng.choice(ESPECIALIDADES),
+            'lat': lat + rng.uniform(-0.1, 0.1),
+            'lon': lon + rng.uniform(-0.1, 0.1),
+            'severity_level': rng.choice(('verde', 'amarelo', 'vermelho')),
+            'vulnerability_level': rng.choice(('baixa', 'media', 'alta')),
+            'tfd_eligible': rng.random() < 0.2,
+        })
+    return pacientes, upaes
+
+def frente(resultado):
+    return [tuple(s['objectives']) for s in resultado['pareto_solutions']]
+
+def comparar(n_pacientes, n_upaes, pop_size, geracoes, n_pesos, seed):
+    pacientes, upaes = gerar_instancia(n_pacientes, n_upaes, seed)
+
+    t0 = time.perf_counter()
+    exato = solve_weighted_sum_sweep(pacientes, upaes, n_weights=n_pesos)
+    t_exato = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ga = run_nsga2(pacientes, upaes, pop_size=pop_size, generations=geracoes, seed=seed)
+    t_ga = time.perf_counter() - t0
+
+    frente_exata = frente(exato)
+    frente_ga = frente(ga)
+
+    # Ponto de referência comum: pior valor de cada objetivo nas duas frentes + 10%
+    pontos = frente_exata + frente_ga
+    ref = tuple(1.1 * max(p[k] for p in pontos) for k in range(2))
+    hv_exato = hypervolume_2d(frente_exata, ref)
+    hv_ga = hypervolume_2d(frente_ga, ref)
+
+    # Compromisso = menor soma dos objetivos (critério de run_genetic_algorithm)
+    comp_exato = min(sum(p) for p in frente_exata)
+    comp_ga = min(sum(p) for p in frente_ga)
+
+    return {
+        'pacientes': n_pacientes,
+        'upaes': n_upaes,
+        'pontos_exato': len(frente_exata),
+        'pontos_ga': len(frente_ga),
+        'hv_relativo': hv_ga / hv_exato if hv_exato > 0 else float('nan'),
+        'gap_compromisso': (comp_ga - comp_exato) / comp_exato if comp_exato > 0 else float('nan'),
+        'tempo_exato_s': t_exato,
+        'tempo_ga_s': t_ga,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[50, 200, 500],
+                        help='números de pacientes (UPAEs = 1,5x pacientes)')
+    parser.add_argument('--pop', type=int, default=120, help='tamanho da população do NSGA-II')
+    parser.add_argument('--geracoes', type=int, default=200, help='gerações do NSGA-II')
+    parser.add_argument('--pesos', type=int, default=11, help='pesos da varredura exata')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    solver = 'scipy' if linear_sum_assignment is not None else 'interno'
+    print(f"Referência exata: {args.pesos} pesos (solver {solver}); "
+          f"NSGA-II: pop {args.pop}, {args.geracoes} gerações\n")
+    print(f"{'pacientes':>9} {'upaes':>6} {'pts exato':>9} {'pts GA':>6} "
+          f"{'HV GA/exato':>11} {'gap comp.':>9} {'t exato':>8} {'t GA':>8}")
+    for n in args.tamanhos:
+        r = comparar(n, int(1.5 * n), args.pop, args.geracoes, args.pesos, args.seed)
+        print(f"{r['pacientes']:>9} {r['upaes']:>6} {r['pontos_exato']:>9} {r['pontos_ga']:>6} "
+              f"{r['hv_relativo']:>11.3f} {r['gap_compromisso']:>9.1%} "
+              f"{r['tempo_exato_s']:>7.2f}s {r['tempo_ga_s']:>7.2f}s")
+
+if __name__ == '__main__':
+    main()
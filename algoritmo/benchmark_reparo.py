@@ -0,0 +1,134 @@
+"""
+Benchmark: Reparo pela UPAE Livre Mais Próxima x Primeira Livre
+Compara as duas estratégias de preenchimento de repair_chromosome (cenário
+force_allocation) nas instâncias sintéticas de benchmark_exato:
+
+  - reparo isolado: filhos de crossover + mutação de uma população viável,
+    reparados pelas duas estratégias (tempo por filho, distância média dos
+    genes preenchidos e média dos objetivos)
+  - NSGA-II completo (evolve_nsga2, mesma seed): solução de compromisso,
+    hipervolume relativo e tempo
+
+A estratégia "primeira livre" é o reparo com um SpecialtyIndex sem
+distâncias (sem set_fill_costs); no NSGA-II o mesmo índice também tira do
+crossover (capacity_crossover_batch) a realocação de conflitos para a UPAE
+livre mais próxima.
+
+Uso:
+    python benchmark_reparo.py --tamanhos 200 500 --geracoes 100
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import (
+    ProblemInstance,
+    SerialEvaluator,
+    SpecialtyIndex,
+    can_fully_allocate,
+    evolve_nsga2,
+    hypervolume_2d,
+    init_feasible_population,
+    mutation_batch,
+    repair_chromosome,
+    uniform_crossover_batch,
+)
+
+ESTRATEGIAS = ('mais_proxima', 'primeira_livre')
+
+def indices(pacientes, instancia):
+    """SpecialtyIndex de cada estratégia (o da instância já tem as distâncias)."""
+    return {
+        'mais_proxima': instancia.specialties,
+        'primeira_livre': SpecialtyIndex(pacientes, instancia.upaes),
+    }
+
+def filhos_sem_reparo(instancia, n_filhos, seed):
+    """Filhos de crossover uniforme + mutação de uma população viável, antes do reparo."""
+    rng = random.Random(seed)
+    gen = np.random.default_rng(seed)
+    indice = instancia.specialties
+    pop = np.array(init_feasible_population(n_filhos, indice, rng), dtype=np.int32)
+    pop = pop.reshape(n_filhos, instancia.n_patients)
+    c1, _ = uniform_crossover_batch(pop, pop[gen.permutation(n_filhos)], 1.0, gen)
+    return mutation_batch(c1, indice, 1.0, gen)
+
+def medir_reparo(pacientes, instancia, n_filhos, seed):
+    filhos = filhos_sem_reparo(instancia, n_filhos, seed)
+    rows = np.arange(instancia.n_patients)
+    resultado = {}
+    for nome, indice in indices(pacientes, instancia).items():
+        t0 = time.perf_counter()
+        reparados = [repair_chromosome(c, indice, True) for c in filhos.tolist()]
+        dt = time.perf_counter() - t0
+
+        reparados = np.array(reparados, dtype=np.int32)
+        # Genes que o reparo mudou (preenchidos ou realocados)
+        mudou = reparados != filhos
+        dist = instancia.dist_km[np.broadcast_to(rows, reparados.shape), reparados]
+        resultado[nome] = {
+            'us_por_filho': 1e6 * dt / n_filhos,
+            'genes_reparados': mudou.sum() / n_filhos,
+            'dist_preenchidos_km': dist[mudou].mean() if mudou.any() else 0.0,
+            'objetivos': instancia.evaluate_population(reparados, False).mean(axis=0),
+        }
+    return resultado
+
+def medir_nsga2(pacientes, upaes, pop_size, geracoes, seed):
+    force_allocation = can_fully_allocate(pacientes, upaes)
+    resultado = {}
+    for nome in ESTRATEGIAS:
+        instancia = ProblemInstance(pacientes, upaes)
+        instancia.specialties = indices(pacientes, instancia)[nome]
+        t0 = time.perf_counter()
+        estado = evolve_nsga2(
+            instancia, SerialEvaluator(instancia), pop_size, geracoes, 0.9, 0.3,
+            force_allocation, rng=random.Random(seed)
+        )
+        dt = time.perf_counter() - t0
+        resultado[nome] = {
+            'frente': [estado['objectives'][i] for i in estado['fronts'][0]],
+            'tempo_s': dt,
+        }
+
+    # Ponto de referência comum: pior valor de cada objetivo nas frentes + 10%
+    pontos = [p for r in resultado.values() for p in r['frente']]
+    ref = tuple(1.1 * max(p[k] for p in pontos) for k in range(2))
+    for r in resultado.values():
+        r['hv'] = hypervolume_2d(r['frente'], ref)
+        r['compromisso'] = min(sum(p) for p in r['frente'])
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[200, 500],
+                        help='números de pacientes (UPAEs = 1,5x pacientes)')
+    parser.add_argument('--filhos', type=int, default=200, help='filhos reparados por tamanho')
+    parser.add_argument('--pop', type=int, default=100, help='tamanho da população do NSGA-II')
+    parser.add_argument('--geracoes', type=int, default=100, help='gerações do NSGA-II')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'pacientes':>9} {'estratégia':>15} {'us/filho':>9} {'genes':>6} "
+          f"{'km preench.':>11} {'obj. médios':>17} {'compromisso':>11} "
+          f"{'HV rel.':>7} {'t NSGA-II':>9}")
+    for n in args.tamanhos:
+        pacientes, upaes = gerar_instancia(n, int(1.5 * n), args.seed)
+        instancia = ProblemInstance(pacientes, upaes)
+        reparo = medir_reparo(pacientes, instancia, args.filhos, args.seed)
+        ga = medir_nsga2(pacientes, upaes, args.pop, args.geracoes, args.seed)
+        hv_ref = ga['primeira_livre']['hv']
+        for nome in ESTRATEGIAS:
+            r, g = reparo[nome], ga[nome]
+            objs = ' '.join(f'{o:.3f}' for o in r['objetivos'])
+            print(f"{n:>9} {nome:>15} {r['us_por_filho']:>9.0f} {r['genes_reparados']:>6.1f} "
+                  f"{r['dist_preenchidos_km']:>11.1f} {objs:>17} {g['compromisso']:>11.3f} "
+                  f"{g['hv'] / hv_ref if hv_ref > 0 else float('nan'):>7.3f} "
+                  f"{g['tempo_s']:>8.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Cache de Resultados da Otimização
+Cache endereçado por conteúdo na frente de otimizar_alocacao_paciente e
+run_genetic_algorithm: a chave é um hash canônico dos pacientes, das UPAEs,
+do BASE_NO_SHOW e dos parâmetros do GA, então requisições repetidas (ou que
+só diferem por ruído nas coordenadas) não rodam a otimização de novo.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Campos do paciente que influenciam a otimização (com os mesmos defaults
+# usados por compute_p_noshow); nome, cpf etc. não entram na chave
+PATIENT_KEY_FIELDS = {
+    'especialidade': None,
+    'lat': None,
+    'lon': None,
+    'severity_level': 'amarelo',
+    'vulnerability_level': 'media',
+    'tfd_eligible': False,
+}
+
+# Casas decimais das coordenadas na chave (4 casas ~ 11 m)
+COORD_DECIMALS = 4
+
+# ==========================================
+# CHAVE CANÔNICA
+# ==========================================
+
+def _round_coords(d, coord_decimals):
+    for campo in ('lat', 'lon'):
+        if isinstance(d.get(campo), (int, float)):
+            d[campo] = round(float(d[campo]), coord_decimals)
+    return d
+
+def canonical_patient(paciente, coord_decimals=COORD_DECIMALS):
+    return _round_coords(
+        {campo: paciente.get(campo, default) for campo, default in PATIENT_KEY_FIELDS.items()},
+        coord_decimals
+    )
+
+def canonical_upae(upae, coord_decimals=COORD_DECIMALS):
+    # A UPAE inteira entra na chave: as respostas devolvem o objeto UPAE
+    return _round_coords(dict(upae), coord_decimals)
+
+def instance_key(tipo, pacientes, upaes, base_ns, params, coord_decimals=COORD_DECIMALS):
+    """
+    Hash SHA-256 canônico de uma instância do problema.
+
+    tipo: 'paciente' ou 'lote' (namespaces separados)
+    params: dict com os parâmetros que mudam o resultado (modo, tamanho da
+            população, gerações, ilhas, critérios de parada, ...)
+
+    Um catálogo do registro de UPAEs entra na chave só pela sua versão
+    (que já é um hash do conteúdo), sem re-serializar a lista.
+    """
+    versao = getattr(upaes, 'versao', None)
+    payload = {
+        'tipo': tipo,
+        'pacientes': [canonical_patient(p, coord_decimals) for p in pacientes],
+        'upaes': {'versao': versao} if versao else [canonical_upae(u, coord_decimals) for u in upaes],
+        'base_ns': base_ns,
+        'params': params,
+    }
+    texto = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+# ==========================================
+# CACHE LRU + TTL (COM CAMADA OPCIONAL EM DISCO)
+# ==========================================
+
+class ResultCache:
+    """
+    Cache LRU em memória com expiração por TTL e contadores de acertos.
+
+    max_entries: máximo de resultados em memória (o menos usado sai primeiro)
+    ttl_s: validade de cada resultado, em segundos
+    disk_dir: diretório opcional da camada em disco (um pickle por chave);
+              um acerto em disco é promovido para a memória
+    """
+
+    def __init__(self, max_entries=256, ttl_s=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict()   # key -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Resultado em cache para a chave, ou None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self.disk_dir:
+            entry = self._read_disk(key, now)
+            if entry is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, entry)
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        entry = (time.time() + self.ttl_s, value)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk_dir:
+            tmp = self._disk_path(key) + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(tmp, self._disk_path(key))
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if entry[0] <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Devolve (valor, acerto). Em caso de falta executa compute() e guarda
+        o resultado se cacheable(valor) (padrão: sempre).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir:
+            for nome in os.listdir(self.disk_dir):
+                if nome.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, nome))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                'entradas': len(self._entries),
+                'max_entradas': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'acertos': self.hits,
+                'acertos_disco': self.disk_hits,
+                'faltas': self.misses,
+                'remocoes_lru': self.evictions,
+                'taxa_acerto': (self.hits + self.disk_hits) / total if total else 0.0,
+                'disco': self.disk_dir
+            }
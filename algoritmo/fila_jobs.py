@@ -0,0 +1,238 @@
+"""
+Fila de Jobs Assíncronos da API
+Executa otimizações longas (ex.: /api/otimizar-lote) fora da thread da
+requisição: o POST devolve um job_id na hora, um pool limitado de workers
+roda o algoritmo e o cliente acompanha o progresso por GET /api/jobs/<id>.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados de um job
+JOB_STATUS = ('na_fila', 'executando', 'concluido', 'erro')
+
+class FilaCheiaError(RuntimeError):
+    """A fila já tem o máximo de jobs pendentes."""
+
+# ==========================================
+# ARMAZENAMENTO DOS JOBS
+# ==========================================
+
+def new_job_record(job_id):
+    return {
+        'job_id': job_id,
+        'status': 'na_fila',
+        'criado_em': time.time(),
+        'iniciado_em': None,
+        'concluido_em': None,
+        'expira_em': None,
+        'progresso': None,
+        'resultado': None,
+        'erro': None
+    }
+
+class MemoryJobStore:
+    """
+    Jobs num dicionário em memória (perdidos ao reiniciar o servidor).
+    Jobs terminados expiram ttl_s segundos após a conclusão; os expirados
+    são descartados a cada job novo e a cada consulta, então jobs que
+    ninguém consulta não ficam na memória para sempre.
+    """
+
+    def __init__(self, ttl_s=3600):
+        self.ttl_s = ttl_s
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        self.purge_expired()
+        with self._lock:
+            self._jobs[job_id] = new_job_record(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def get(self, job_id):
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def count_pending(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values()
+                       if j['status'] in ('na_fila', 'executando'))
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [k for k, j in self._jobs.items()
+                       if j['expira_em'] is not None and j['expira_em'] <= now]
+            for k in expired:
+                del self._jobs[k]
+        return len(expired)
+
+    def close(self):
+        pass
+
+class SQLiteJobStore:
+    """
+    Jobs persistidos num arquivo SQLite (sobrevivem a reinícios do servidor).
+    Cada job é uma linha com o registro completo em JSON; status e expira_em
+    ficam em colunas próprias para as consultas de fila e de expiração.
+    """
+
+    def __init__(self, path='jobs_otimizacao.db', ttl_s=3600):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " expira_em REAL,"
+                " dados TEXT NOT NULL)"
+            )
+            # Jobs interrompidos por um reinício não vão mais terminar
+            rows = self._conn.execute(
+                "SELECT job_id, dados FROM jobs WHERE status IN ('na_fila', 'executando')"
+            ).fetchall()
+            for job_id, dados in rows:
+                job = json.loads(dados)
+                job.update(status='erro', erro='Servidor reiniciado antes do fim do job.',
+                           concluido_em=time.time(), expira_em=time.time() + ttl_s)
+                self._write(job)
+
+    def _write(self, job):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, expira_em, dados) VALUES (?, ?, ?, ?)",
+            (job['job_id'], job['status'], job['expira_em'], json.dumps(job))
+        )
+
+    def _read(self, job_id):
+        row = self._conn.execute(
+            "SELECT dados FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, job_id):
+        self.purge_expired()
+        with self._lock, self._conn:
+            self._write(new_job_record(job_id))
+
+    def update(self, job_id, **fields):
+        with self._lock, self._conn:
+            job = self._read(job_id)
+            if job is not None:
+                job.update(fields)
+                self._write(job)
+
+    def get(self, job_id):
+        self.purge_expired()
+        with self._lock:
+            return self._read(job_id)
+
+    def count_pending(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('na_fila', 'executando')"
+            ).fetchone()[0]
+
+    def purge_expired(self):
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE expira_em IS NOT NULL AND expira_em <= ?",
+                (time.time(),)
+            )
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+JOB_STORES = {
+    'memoria': MemoryJobStore,
+    'sqlite': SQLiteJobStore,
+}
+
+def make_job_store(tipo='memoria', **kwargs):
+    """Cria o armazenamento de jobs pelo nome ('memoria' ou 'sqlite')."""
+    if tipo not in JOB_STORES:
+        raise ValueError(f"Armazenamento desconhecido: {tipo}. Use um de {sorted(JOB_STORES)}.")
+    return JOB_STORES[tipo](**kwargs)
+
+# ==========================================
+# FILA E POOL DE WORKERS
+# ==========================================
+
+class JobQueue:
+    """
+    Pool limitado de workers (threads) que executa jobs e registra estado,
+    progresso e resultado no store.
+
+    max_workers: jobs executando ao mesmo tempo.
+    max_pending: máximo de jobs na fila + executando; acima disso submit()
+                 levanta FilaCheiaError.
+    progress_interval_s: intervalo mínimo entre gravações de progresso (evita
+                 uma escrita por geração no SQLite).
+    """
+
+    def __init__(self, store, max_workers=2, max_pending=32, progress_interval_s=0.25):
+        self.store = store
+        self.max_pending = max_pending
+        self.progress_interval_s = progress_interval_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='job-otimizacao')
+        self._submit_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Enfileira fn(*args, on_generation=..., **kwargs) e devolve o job_id.
+        fn deve retornar um resultado serializável em JSON.
+        """
+        with self._submit_lock:
+            if self.store.count_pending() >= self.max_pending:
+                raise FilaCheiaError(
+                    f"Fila cheia: {self.max_pending} jobs pendentes. Tente novamente mais tarde."
+                )
+            job_id = uuid.uuid4().hex
+            self.store.create(job_id)
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id, fn, args, kwargs):
+        self.store.update(job_id, status='executando', iniciado_em=time.time())
+        last_write = [0.0]
+        latest = {}
+
+        def on_generation(progresso):
+            latest['progresso'] = progresso
+            now = time.monotonic()
+            if now - last_write[0] >= self.progress_interval_s:
+                last_write[0] = now
+                self.store.update(job_id, progresso=progresso)
+
+        try:
+            resultado = fn(*args, on_generation=on_generation, **kwargs)
+            fields = {'status': 'concluido', 'resultado': resultado}
+        except Exception as e:
+            fields = {'status': 'erro', 'erro': str(e)}
+        fields.update(latest)
+        now = time.time()
+        self.store.update(job_id, concluido_em=now,
+                          expira_em=now + self.store.ttl_s, **fields)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self.store.close()
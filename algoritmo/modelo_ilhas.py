@@ -0,0 +1,259 @@
+"""
+Modelo de Ilhas para o NSGA-II
+K subpopulações evoluem em processos separados (evolve_nsga2) e trocam
+seus melhores indivíduos não-dominados a cada M gerações.
+"""
+
+import random
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from otimizador_genetico import (
+    BASE_NO_SHOW,
+    ProblemInstance,
+    new_seed,
+    SerialEvaluator,
+    StoppingCriteria,
+    can_fully_allocate,
+    crowding_distances,
+    environmental_selection,
+    evolve_nsga2,
+    fast_nondominated_sort,
+    warm_start_individuals,
+    compromise_index,
+    front_mean,
+    pareto_result,
+)
+
+# Topologias de migração suportadas
+TOPOLOGIAS = ('anel', 'completa')
+
+# ==========================================
+# WORKER (PROCESSO DE CADA ILHA)
+# ==========================================
+
+# Estado do processo worker, enviado UMA vez pelo initializer
+_worker_state = {}
+
+def _init_island_worker(instancia, force_allocation):
+    _worker_state['instancia'] = instancia
+    _worker_state['force_allocation'] = force_allocation
+
+def _evolve_island(population, seed, pop_size, generations, crossover_rate, mutation_rate,
+                   deadline=None):
+    """
+    Evolui uma ilha por até `generations` gerações a partir de `population`;
+    com `deadline` (time.monotonic()), a época para antes de estourá-lo.
+    """
+    instancia = _worker_state['instancia']
+    stop_criteria = StoppingCriteria(deadline=deadline) if deadline is not None else None
+    # Gerador por (ilha, época): o resultado não depende de qual processo executa a tarefa
+    state = evolve_nsga2(
+        instancia, SerialEvaluator(instancia), pop_size, generations,
+        crossover_rate, mutation_rate, _worker_state['force_allocation'],
+        initial_population=population, rng=random.Random(seed),
+        stop_criteria=stop_criteria
+    )
+    return (state['population'], state['objectives'], state['fronts'],
+            state['history'], state['parada'])
+
+# ==========================================
+# MIGRAÇÃO
+# ==========================================
+
+def select_emigrants(objectives_list, fronts, n_migrants):
+    """
+    Escolhe os melhores indivíduos não-dominados para migrar: frente 0
+    ordenada por crowding distance (mais isolados primeiro), completando
+    com as frentes seguintes se a frente 0 for pequena.
+    """
+    emigrants = []
+    cd = crowding_distances(objectives_list, fronts)
+    for front in fronts:
+        emigrants.extend(sorted(front, key=lambda i: cd[i], reverse=True))
+        if len(emigrants) >= n_migrants:
+            break
+    return emigrants[:n_migrants]
+
+def migration_sources(topologia, n_islands, k):
+    """Ilhas que enviam migrantes para a ilha k."""
+    if topologia == 'anel':
+        return [(k - 1) % n_islands]
+    return [s for s in range(n_islands) if s != k]
+
+def merge_archive(populations, objectives, pop_size):
+    """
+    Junta populações (com seus objetivos) e reduz a pop_size pela seleção
+    elitista do NSGA-II (fast_nondominated_sort + crowding_distance).
+    """
+    merged = np.vstack(populations)
+    merged_objs = [obj for objs in objectives for obj in objs]
+    selected, fronts = environmental_selection(merged_objs, pop_size)
+    return merged[selected], [merged_objs[i] for i in selected], fronts
+
+# ==========================================
+# LAÇO PRINCIPAL DO MODELO DE ILHAS
+# ==========================================
+
+def run_island_nsga2(pacientes, upaes, base_ns=None,
+                     n_islands=4, pop_size=120, generations=200,
+                     crossover_rate=0.9, mutation_rate=0.3,
+                     migration_interval=20, migration_rate=0.1,
+                     topologia='anel', n_workers=None, seed=None, deadline=None,
+                     on_generation=None, k_nearest=None, warm_start=None):
+    """
+    Executa o NSGA-II em modelo de ilhas.
+
+    - n_islands ilhas de pop_size indivíduos cada, uma tarefa por ilha em um
+      ProcessPoolExecutor (a instância do problema vai para cada processo uma
+      única vez, pelo initializer)
+    - a cada migration_interval gerações, cada ilha recebe
+      round(migration_rate * pop_size) dos melhores não-dominados das ilhas
+      vizinhas (topologia 'anel' ou 'completa') e volta a pop_size pela
+      seleção elitista
+    - ao final, as ilhas são unidas num arquivo e a frente 0 vira o resultado
+
+    Cada (ilha, época) usa um gerador próprio com seed derivada de `seed`
+    (None sorteia uma; volta em result['seed']), então o resultado não
+    depende de n_workers. Com `deadline` (instante de time.monotonic()),
+    cada ilha o verifica a cada geração, inclusive na população inicial,
+    nenhuma época nova é iniciada se não couber no tempo restante (estimado
+    pela duração média das anteriores) e o resultado sai com truncado=True.
+    O warm_start não pode ser interrompido, então não aceita deadline.
+    on_generation, se informado, recebe o progresso ao fim de cada época
+    (média entre ilhas da média da frente 0). k_nearest ativa o índice
+    espacial de candidatas em todas as ilhas (ver run_nsga2) e warm_start
+    semeia a população inicial de todas as ilhas com as mesmas atribuições
+    ótimas (o restante de cada ilha é aleatório).
+    Retorna o mesmo formato de run_nsga2, com a chave extra 'ilhas'
+    (parâmetros e histórico de cada ilha).
+    """
+    if topologia not in TOPOLOGIAS:
+        raise ValueError(f"Topologia desconhecida: {topologia}. Use um de {TOPOLOGIAS}.")
+    if base_ns is None:
+        base_ns = BASE_NO_SHOW
+    if seed is None:
+        seed = new_seed()
+    if deadline is not None and warm_start:
+        raise ValueError("O warm_start não respeita prazo; não informe deadline.")
+
+    t0 = time.monotonic()
+    instancia = ProblemInstance(pacientes, upaes, base_ns, k_nearest=k_nearest)
+    force_allocation = can_fully_allocate(pacientes, upaes, instancia.specialties)
+
+    n_migrants = max(1, int(round(migration_rate * pop_size)))
+    n_workers = n_workers or min(n_islands, os.cpu_count() or 1)
+
+    populations = [warm_start_individuals(instancia, warm_start)] * n_islands
+    objectives = [None] * n_islands
+    fronts = [None] * n_islands
+    histories = [[] for _ in range(n_islands)]
+
+    with ProcessPoolExecutor(max_workers=n_workers,
+                             initializer=_init_island_worker,
+                             initargs=(instancia, force_allocation)) as executor:
+        done = 0
+        epoch = 0
+        stop_reason = 'geracoes_completas'
+        t_epochs = time.monotonic()
+        while True:
+            gens = min(migration_interval, generations - done)
+            futures = [
+                executor.submit(
+                    _evolve_island, populations[k], seed * 1000003 + epoch * 1009 + k,
+                    pop_size, gens, crossover_rate, mutation_rate, deadline
+                )
+                for k in range(n_islands)
+            ]
+            # Uma ilha interrompida pelo prazo pode ter rodado menos gerações
+            # (com menos processos que ilhas, a última pode nem começar); a
+            # época conta as gerações da ilha que mais avançou
+            executed = 0
+            for k, future in enumerate(futures):
+                populations[k], objectives[k], fronts[k], history, parada = future.result()
+                histories[k].extend((done + g,) + tuple(entry) for g, *entry in history)
+                executed = max(executed, parada['geracoes_executadas'])
+                if parada['motivo'] == 'tempo_esgotado':
+                    stop_reason = 'tempo_esgotado'
+
+            done += executed
+            epoch += 1
+            if on_generation is not None:
+                means = [front_mean(objectives[k], fronts[k][0]) for k in range(n_islands)]
+                best = [(k, compromise_index(objectives[k], fronts[k][0])) for k in range(n_islands)]
+                k_best, i_best = min(best, key=lambda b: sum(objectives[b[0]][b[1]]))
+                on_generation({
+                    'geracao': done - 1,
+                    'geracoes': generations,
+                    'media_front0': tuple(sum(m[j] for m in means) / n_islands
+                                          for j in range(len(means[0]))),
+                    'tamanho_front0': sum(len(fronts[k][0]) for k in range(n_islands)),
+                    'avaliacoes': n_islands * pop_size * (done + epoch),
+                    'compromisso': {
+                        'objetivos': objectives[k_best][i_best],
+                        'upae_ids': instancia.decode(populations[k_best][i_best].tolist())
+                    }
+                })
+            if done >= generations or stop_reason == 'tempo_esgotado':
+                break
+            if deadline is not None:
+                mean_epoch = (time.monotonic() - t_epochs) / epoch
+                if deadline - time.monotonic() < mean_epoch:
+                    stop_reason = 'tempo_esgotado'
+                    break
+
+            # Migração: todos os emigrantes são escolhidos antes de qualquer
+            # ilha receber, para a ordem das ilhas não influenciar
+            emigrants = [
+                select_emigrants(objectives[k], fronts[k], n_migrants)
+                for k in range(n_islands)
+            ]
+            new_state = []
+            for k in range(n_islands):
+                sources = migration_sources(topologia, n_islands, k)
+                incoming = [populations[s][emigrants[s]] for s in sources]
+                incoming_objs = [[objectives[s][i] for i in emigrants[s]] for s in sources]
+                new_state.append(merge_archive(
+                    [populations[k]] + incoming, [objectives[k]] + incoming_objs, pop_size
+                ))
+            for k, (pop, objs, frs) in enumerate(new_state):
+                populations[k], objectives[k], fronts[k] = pop, objs, frs
+
+    # Arquivo final: união de todas as ilhas
+    archive = np.vstack(populations)
+    archive_objs = [obj for objs in objectives for obj in objs]
+    archive_fronts = fast_nondominated_sort(archive, archive_objs)
+
+    # Histórico agregado: média entre ilhas da média da frente 0 e soma das
+    # estatísticas de filhos em cada geração (após um corte pelo prazo, só
+    # entram as ilhas que chegaram àquela geração)
+    history = []
+    for g in range(max(len(h) for h in histories)):
+        means = [h[g][1] for h in histories if g < len(h)]
+        stats = [h[g][2] for h in histories if g < len(h)]
+        history.append((g, tuple(sum(m[j] for m in means) / len(means)
+                                 for j in range(len(means[0]))),
+                        {key: sum(st[key] for st in stats) for key in stats[0]}))
+
+    result = pareto_result(instancia, archive, archive_objs, archive_fronts, history)
+    result['parada'] = {
+        'motivo': stop_reason,
+        'truncado': stop_reason == 'tempo_esgotado',
+        'geracao': done - 1,
+        'geracoes_executadas': done,
+        'avaliacoes': n_islands * pop_size * (done + epoch),
+        'tempo_s': time.monotonic() - t0
+    }
+    result['seed'] = seed
+    result['ilhas'] = {
+        'n_ilhas': n_islands,
+        'individuos_por_ilha': pop_size,
+        'topologia': topologia,
+        'intervalo_migracao': migration_interval,
+        'migrantes_por_ilha': n_migrants,
+        'historicos': histories
+    }
+    return result
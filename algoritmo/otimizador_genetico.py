@@ -4,13 +4,18 @@ Algoritmo Multi-Objetivo baseado em Non-dominated Sorting Genetic Algorithm II
 Adaptado para uso via API REST
 """
 
-import random
 import math
+import random
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+import os
+import secrets
+import time
 
-# Seed para reprodutibilidade (opcional em produção, bom para debug)
-random.seed(42)
+import numpy as np
 
 # ==========================================
 # CONFIGURAÇÃO DE PESOS E PARÂMETROS
@@ -54,6 +59,14 @@ PEN_NS = 10.0     # penalidade multiplicada pela violação do limite
 # Penalização por paciente sem vaga
 W_UNALLOC = 2.0
 
+# Reparo: UPAEs compatíveis mais próximas guardadas por paciente para
+# preencher genes sem vaga (além delas, busca em todas as compatíveis)
+FILL_CANDIDATES = 8
+
+# Avaliação incremental: filhos com até esta fração dos genes diferente do
+# pai mais parecido são avaliados a partir das somas do pai
+DELTA_MAX_CHANGED = 0.25
+
 # Probabilidades base de no-show por especialidade
 BASE_NO_SHOW = {
     # --- Especialidades Médicas ---
@@ -103,8 +116,32 @@ BASE_NO_SHOW = {
 # FUNÇÕES AUXILIARES
 # ==========================================
 
+def haversine_array(lat1, lon1, lat2, lon2):
+    """
+    Haversine vetorizado (km): aceita escalares ou arrays NumPy e segue as
+    regras de broadcasting, ex.: lat1[:, None] x lat2[None, :] -> matriz.
+    """
+    R = 6371.0  # Raio da Terra em km
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dl = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi/2)**2 + np.cos(phi1) * np.cos(phi2) * (np.sin(dl/2)**2)
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """Matriz de distâncias (km) entre os pontos 1 (linhas) e os pontos 2 (colunas)."""
+    return haversine_array(
+        np.asarray(lat1, dtype=float)[:, None], np.asarray(lon1, dtype=float)[:, None],
+        np.asarray(lat2, dtype=float)[None, :], np.asarray(lon2, dtype=float)[None, :]
+    )
+
 def haversine(lat1, lon1, lat2, lon2):
-    """Calcula distância em km entre dois pontos geográficos usando fórmula de Haversine"""
+    """
+    Calcula distância em km entre dois pontos geográficos usando fórmula de
+    Haversine. Versão escalar (math), para as chamadas de um par só; os
+    caminhos em lote usam haversine_array.
+    """
     R = 6371.0  # Raio da Terra em km
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
@@ -117,34 +154,144 @@ def clamp(x, a=0.0, b=0.95):
     """Limita valor entre a e b"""
     return max(a, min(b, x))
 
-def can_fully_allocate(pacientes, upaes):
+def upae_slots(upae):
+    """
+    Vagas de uma UPAE por especialidade, a partir do campo opcional 'vagas':
+      - ausente: 1 vaga compartilhada entre as especialidades (1 paciente por UPAE)
+      - inteiro N: N vagas compartilhadas entre as especialidades
+      - dict {especialidade: N}: N vagas próprias de cada especialidade
+        (especialidades fora do dict ficam sem vaga)
+
+    Retorna dict especialidade normalizada -> (grupo, vagas); especialidades
+    do mesmo grupo disputam as mesmas vagas.
     """
-    Verifica se, POR ESPECIALIDADE, há vagas suficientes para todos os pacientes.
+    vagas = upae.get('vagas', 1)
+    if isinstance(vagas, dict):
+        vagas = {esp.lower(): n for esp, n in vagas.items()}
+    slots = {}
+    for esp in upae['especialidades']:
+        spec = esp.lower()
+        if spec in slots:
+            continue
+        if isinstance(vagas, dict):
+            slots[spec] = (spec, int(vagas.get(spec, 0)))
+        else:
+            slots[spec] = ('*', int(vagas))
+    return slots
+
+def can_fully_allocate(pacientes, upaes, indice=None):
+    """
+    Verifica se há vagas suficientes para alocar TODOS os pacientes.
     Retorna True se há capacidade suficiente, False se há escassez.
 
     Esta função é usada para determinar se devemos aplicar penalização forte
     em pacientes sem vaga (cenário de escassez).
+
+    indice: SpecialtyIndex da execução (ex.: instancia.specialties), para
+    não reconstruir o catálogo; sem ele, um índice é criado a partir de
+    `upaes`.
+
+    Primeiro conta as vagas por especialidade (grupos de vagas de
+    upae_slots). Se nenhum grupo é disputado por duas especialidades dos
+    pacientes, a contagem já é a resposta; senão ela só descarta os casos
+    óbvios e a resposta vem de uma alocação de cardinalidade máxima (reparo
+    guloso + caminhos aumentantes).
     """
-    from collections import defaultdict
+    if indice is None:
+        indice = SpecialtyIndex(pacientes, upaes)
+    capacity = indice.pool_capacity
     pats_per_spec = defaultdict(int)
-    vagas_per_spec = defaultdict(int)
-
-    # Conta pacientes por especialidade
-    for p in pacientes:
-        spec = p['especialidade'].lower()
+    for spec in indice.patient_spec:
         pats_per_spec[spec] += 1
 
-    # Conta vagas por especialidade
-    for u in upaes:
-        for esp in u['especialidades']:
-            esp_lower = esp.lower()
-            vagas_per_spec[esp_lower] += 1
-
     # Verifica se há capacidade suficiente para cada especialidade
+    owner = {}       # grupo de vagas -> especialidade que o usa
+    shared = False   # algum grupo disputado por duas especialidades?
     for spec, n_pat in pats_per_spec.items():
-        if vagas_per_spec.get(spec, 0) < n_pat:
+        pools = indice.compatible_pools.get(spec)
+        if pools is None:
             return False
-    return True
+        pools = pools.tolist()
+        if sum(capacity[g] for g in pools) < n_pat:
+            return False
+        if indice.shared_pools and not shared:
+            for g in pools:
+                if owner.setdefault(g, spec) != spec:
+                    shared = True
+                    break
+    if not shared:
+        return True
+
+    # Verificação exata: vagas compartilhadas só servem a um paciente
+    chromosome = repair_chromosome([-1] * indice.n_patients, indice, force_allocation=True)
+    return -1 not in chromosome
+
+def patient_noshow_arrays(pacientes, base_ns):
+    """
+    Fatores de no-show que só dependem do paciente, como arrays (um valor
+    por paciente), para o modelo vetorizado (p_noshow_array):
+    lat, lon, base ajustada pela severidade, TFD e interação
+    vulnerabilidade x severidade.
+
+    base_ns: probabilidade base de cada paciente (lista ou array).
+    """
+    lat = np.array([p['lat'] for p in pacientes], dtype=float)
+    lon = np.array([p['lon'] for p in pacientes], dtype=float)
+    severity = [p.get('severity_level', 'amarelo') for p in pacientes]
+    adjusted_base = np.asarray(base_ns, dtype=float) * np.array(
+        [SEVERITY_MULTIPLIERS.get(sev, 1.0) for sev in severity], dtype=float
+    )
+    tfd = np.array([bool(p.get('tfd_eligible', False)) for p in pacientes], dtype=bool)
+    vuln_sev = np.array([
+        VULN_SEV_INTERACTION.get((p.get('vulnerability_level', 'media'), sev), 1.0)
+        for p, sev in zip(pacientes, severity)
+    ], dtype=float)
+    return lat, lon, adjusted_base, tfd, vuln_sev
+
+def p_noshow_array(adjusted_base, tfd, vuln_sev, transport_score, dist):
+    """
+    Modelo de no-show de 5 fatores (ver compute_p_noshow) sobre arrays com
+    broadcasting: fatores do paciente (patient_noshow_arrays), score de
+    transporte da UPAE e distância do par.
+    """
+    # TFD ajusta transporte e distância
+    effective_transport_score = np.where(
+        tfd, np.minimum(1.0, transport_score + LAMBDA_TFD), transport_score
+    )
+    effective_lambda_d = np.where(tfd, LAMBDA_D * (1 - LAMBDA_TFD), LAMBDA_D)
+
+    p_intermediate = adjusted_base * (1 + effective_lambda_d * (dist / DIST_REF)) * \
+                     (1 - LAMBDA_T * effective_transport_score)
+    p_final = p_intermediate * vuln_sev
+    return np.clip(p_final, 0.0, 0.95)
+
+def compute_p_noshow_pairs(pacientes, upaes, base_ns):
+    """
+    Versão vetorizada de compute_p_noshow para pares (pacientes[k], upaes[k]).
+    Retorna (p_noshow, dist) como arrays.
+    """
+    lat, lon, adjusted_base, tfd, vuln_sev = patient_noshow_arrays(pacientes, base_ns)
+    dist = haversine_array(
+        lat, lon,
+        np.array([u['lat'] for u in upaes], dtype=float),
+        np.array([u['lon'] for u in upaes], dtype=float)
+    )
+    transport = np.array([u.get('transport_score', 0.5) for u in upaes], dtype=float)
+    return p_noshow_array(adjusted_base, tfd, vuln_sev, transport, dist), dist
+
+def compute_p_noshow_matrix(pacientes, upaes, base_ns):
+    """
+    Versão vetorizada de compute_p_noshow para todos os pares paciente x
+    UPAE. Retorna (p_noshow, dist) como matrizes n_pacientes x n_upaes.
+    """
+    catalogo = UpaeCatalog.of(upaes)
+    lat, lon, adjusted_base, tfd, vuln_sev = patient_noshow_arrays(pacientes, base_ns)
+    dist = haversine_matrix(lat, lon, catalogo.lat, catalogo.lon)
+    p = p_noshow_array(
+        adjusted_base[:, None], tfd[:, None], vuln_sev[:, None],
+        catalogo.transport_score[None, :], dist
+    )
+    return p, dist
 
 def compute_p_noshow(paciente, upae, base_no_show):
     """
@@ -159,6 +306,10 @@ def compute_p_noshow(paciente, upae, base_no_show):
     - Casos VERDES (não urgentes) + vulnerabilidade alta = ALTA chance de falta
     - Casos VERMELHOS (urgentes) = BAIXA chance de falta mesmo com barreiras
     - TFD reduz drasticamente o impacto da distância
+
+    Versão escalar, para um par (paciente, UPAE); a vetorizada
+    (compute_p_noshow_pairs / p_noshow_array) aplica as mesmas fórmulas nos
+    caminhos em lote. Retorna (p_noshow, distancia_km).
     """
     # 1. Calcular distância
     dist = haversine(
@@ -196,24 +347,331 @@ def compute_p_noshow(paciente, upae, base_no_show):
     # 7. Clamping final (0% a 95% máximo)
     return clamp(p_final, 0.0, 0.95), dist
 
+# ==========================================
+# CATÁLOGO DE UPAEs (ÍNDICES DERIVADOS POR VERSÃO)
+# ==========================================
+
+class UpaeCatalog(list):
+    """
+    Lista de UPAEs com os índices derivados que só dependem das UPAEs,
+    calculados UMA vez por catálogo (ex.: por versão do registro do servidor)
+    em vez de a cada requisição.
+
+    Como é uma list, pode ser passado onde quer que se espere `upaes`;
+    SpecialtyIndex e ProblemInstance reaproveitam os índices. Não deve ser
+    modificado depois de criado.
+
+    - upae_ids / upae_index: id da UPAE <-> índice de coluna (último id
+      repetido vence, como no upae_map original)
+    - spec_codes, upae_bits, compatible_by_spec, compatible_lists: índice de
+      especialidades (ver SpecialtyIndex); uma especialidade sem vagas na
+      UPAE não conta como atendida
+    - pool_of, pool_capacity, pool_upae: grupos de vagas (ver upae_slots);
+      pool_of[j] mapeia especialidade -> grupo da UPAE j, pool_capacity[g] é
+      o número de pacientes que o grupo g comporta e pool_upae[g] a sua UPAE
+    - shared_pools: True se algum grupo atende mais de uma especialidade
+      (só então a alocação gulosa pode ficar abaixo da máxima)
+    - lat, lon, transport_score: arrays por UPAE
+    - wait_days, wait_cost: espera por UPAE + coluna "sem vaga" (custo zero)
+    """
+
+    def __init__(self, upaes, versao=None):
+        super().__init__(upaes)
+        self.versao = versao
+        self.n_upaes = len(self)
+
+        self.upae_ids = [u['id'] for u in self]
+        self.upae_index = {uid: j for j, uid in enumerate(self.upae_ids)}
+
+        self.spec_codes = {}
+        by_spec = defaultdict(list)
+        self.upae_bits = [0] * self.n_upaes
+        self.pool_of = [{} for _ in range(self.n_upaes)]
+        self.pool_capacity = []
+        self.pool_upae = []
+        self.shared_pools = False
+        for j, u in enumerate(self):
+            if self.upae_index[u['id']] != j:
+                continue
+            pools = {}
+            for spec, (grupo, n) in upae_slots(u).items():
+                if n <= 0:
+                    continue
+                if grupo not in pools:
+                    pools[grupo] = len(self.pool_capacity)
+                    self.pool_capacity.append(n)
+                    self.pool_upae.append(j)
+                else:
+                    self.shared_pools = True
+                self.pool_of[j][spec] = pools[grupo]
+                code = self.spec_codes.setdefault(spec, len(self.spec_codes))
+                self.upae_bits[j] |= 1 << code
+                by_spec[spec].append(j)
+        self.n_pools = len(self.pool_capacity)
+
+        self.compatible_by_spec = {
+            spec: np.array(ids, dtype=np.int32) for spec, ids in by_spec.items()
+        }
+        # Versão em lista, para os sorteios com random.choice
+        self.compatible_lists = dict(by_spec)
+
+        self.lat = np.array([u.get('lat', np.nan) for u in self], dtype=float)
+        self.lon = np.array([u.get('lon', np.nan) for u in self], dtype=float)
+        self.transport_score = np.array(
+            [u.get('transport_score', 0.5) for u in self], dtype=float
+        )
+        self.wait_days = np.array(
+            [u.get('tempo_espera_dias', 0) for u in self] + [0], dtype=float
+        )
+        self.wait_cost = self.wait_days / WREF
+
+    @classmethod
+    def of(cls, upaes):
+        """O próprio catálogo, ou um catálogo novo construído a partir da lista."""
+        return upaes if isinstance(upaes, cls) else cls(upaes)
+
+# ==========================================
+# ÍNDICE DE COMPATIBILIDADE DE ESPECIALIDADES
+# ==========================================
+
+class SpecialtyIndex:
+    """
+    Índice de compatibilidade paciente-UPAE, construído UMA vez por execução
+    e consultado por todos os operadores (viabilidade, população inicial,
+    mutação e reparo), sem manipulação de strings no laço interno.
+
+    Trabalha no espaço de índices: a UPAE é identificada pela sua posição na
+    lista de upaes e o gene -1 significa "sem vaga".
+
+    - compatible_by_spec: especialidade normalizada -> array int32 com os
+      índices das UPAEs que a atendem (em ordem de índice)
+    - upae_bits: bitset de especialidades de cada UPAE (int Python)
+    - patient_bit / patient_compat: bit da especialidade e UPAEs compatíveis
+      de cada paciente
+    - pool_of / pool_capacity / pool_upae / shared_pools: grupos de vagas
+      das UPAEs (ver UpaeCatalog); pool(i, j) é o grupo que o paciente i
+      ocupa na UPAE j
+
+    A parte que só depende das UPAEs vem do UpaeCatalog (reaproveitado se
+    `upaes` já for um catálogo).
+
+    Opcionalmente (set_nearest) guarda, por paciente, as K UPAEs compatíveis
+    mais próximas: população inicial e mutação passam a sortear primeiro
+    entre elas (ver candidates).
+
+    candidate_table() dá as mesmas candidatas (mais o -1) em matriz, para a
+    mutação em lote.
+
+    set_fill_costs guarda as distâncias paciente x UPAE para o reparo
+    preencher cada gene sem vaga com a UPAE compatível livre mais próxima
+    (ver repair_chromosome); sem elas o reparo usa a primeira livre.
+
+    pool_table() e spec_groups() são as tabelas dos operadores em lote que
+    preservam a viabilidade (grupo de vagas de cada par e pacientes de cada
+    especialidade).
+    """
+
+    def __init__(self, pacientes, upaes):
+        catalogo = UpaeCatalog.of(upaes)
+        self.n_patients = len(pacientes)
+        self.n_upaes = catalogo.n_upaes
+
+        self.spec_codes = catalogo.spec_codes
+        self.upae_bits = catalogo.upae_bits
+        self.compatible_by_spec = catalogo.compatible_by_spec
+        self.compatible_lists = catalogo.compatible_lists
+        self.pool_of = catalogo.pool_of
+        self.pool_capacity = catalogo.pool_capacity
+        self.pool_upae = catalogo.pool_upae
+        self.shared_pools = catalogo.shared_pools
+        self.n_pools = catalogo.n_pools
+
+        empty = np.zeros(0, dtype=np.int32)
+        self.patient_spec = [p['especialidade'].lower() for p in pacientes]
+        self.patient_bit = [
+            1 << self.spec_codes[spec] if spec in self.spec_codes else 0
+            for spec in self.patient_spec
+        ]
+        self.patient_compat = [
+            self.compatible_by_spec.get(spec, empty) for spec in self.patient_spec
+        ]
+        self.k_nearest = None
+        self.nearest = None
+        self._candidate_table = None
+        self.fill_dist = None
+        self._fill_k = None
+        self._fill_order = None
+        # Grupo de vagas de cada UPAE compatível, alinhado com compatible_by_spec
+        self.compatible_pools = {
+            spec: np.array([self.pool_of[j][spec] for j in compat.tolist()], dtype=np.intp)
+            for spec, compat in self.compatible_by_spec.items()
+        }
+        self._pool_table = None
+        self._spec_groups = None
+
+    def set_nearest(self, dist_km, k):
+        """
+        Pré-computa as k UPAEs compatíveis mais próximas de cada paciente
+        (ordenadas por distância) a partir da matriz de distâncias
+        n_pacientes x n_upaes. Pacientes da mesma especialidade são tratados
+        em bloco, com argpartition sobre as colunas compatíveis.
+        """
+        self.k_nearest = k
+        self.nearest = self.nearest_compatible(dist_km, k)
+        self._candidate_table = None
+
+    def nearest_compatible(self, dist_km, k):
+        """Lista, por paciente, das k UPAEs compatíveis mais próximas (ordenadas)."""
+        nearest = [[] for _ in range(self.n_patients)]
+        rows_by_spec = defaultdict(list)
+        for i, spec in enumerate(self.patient_spec):
+            rows_by_spec[spec].append(i)
+
+        for spec, rows in rows_by_spec.items():
+            compat = self.compatible_by_spec.get(spec)
+            if compat is None or len(compat) == 0:
+                continue
+            dist = dist_km[np.ix_(rows, compat)]
+            if len(compat) > k:
+                part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                part_dist = np.take_along_axis(dist, part, axis=1)
+                order = np.take_along_axis(part, np.argsort(part_dist, axis=1, kind='stable'), axis=1)
+            else:
+                order = np.argsort(dist, axis=1, kind='stable')
+            for i, cols in zip(rows, compat[order].tolist()):
+                nearest[i] = cols
+        return nearest
+
+    def set_fill_costs(self, dist_km, k=FILL_CANDIDATES):
+        """
+        Prepara o reparo por proximidade: guarda a matriz de distâncias
+        n_pacientes x n_upaes (colunas além de n_upaes, como a "sem vaga" da
+        ProblemInstance, são ignoradas) e as k compatíveis mais próximas de
+        cada paciente (fill_order, em ordem de distância; calculadas no
+        primeiro uso, já que o caminho exato de um paciente não repara).
+        """
+        self.fill_dist = dist_km
+        self._fill_k = k
+        self._fill_order = None
+
+    @property
+    def fill_order(self):
+        """K compatíveis mais próximas de cada paciente (None sem set_fill_costs)."""
+        if self._fill_order is None and self.fill_dist is not None:
+            self._fill_order = self.nearest_compatible(self.fill_dist, self._fill_k)
+        return self._fill_order
+
+    def candidates(self, i):
+        """
+        UPAEs candidatas do paciente i: as K compatíveis mais próximas se o
+        índice espacial estiver ativo, senão todas as compatíveis (não modificar).
+        """
+        if self.nearest is not None:
+            return self.nearest[i]
+        return self.compatible_list(i)
+
+    def candidate_table(self):
+        """
+        Candidatas de todos os pacientes em matriz, para sorteios vetorizados:
+        (table, counts, row) com table[row[i], :counts[row[i]]] = candidates(i)
+        seguidas de -1 ("sem vaga"). Sem o índice espacial as linhas são por
+        especialidade (todos os pacientes da especialidade compartilham a
+        linha); com ele, uma linha por paciente. Calculada uma vez.
+        """
+        if self._candidate_table is None:
+            if self.nearest is not None:
+                lists = self.nearest
+                row = np.arange(self.n_patients)
+            else:
+                specs = sorted(set(self.patient_spec))
+                spec_row = {spec: r for r, spec in enumerate(specs)}
+                lists = [self.compatible_lists.get(spec, []) for spec in specs]
+                row = np.array([spec_row[spec] for spec in self.patient_spec], dtype=np.intp)
+            width = max((len(c) for c in lists), default=0) + 1
+            table = np.full((len(lists), width), -1, dtype=np.int32)
+            counts = np.empty(len(lists), dtype=np.int64)
+            for r, cands in enumerate(lists):
+                table[r, :len(cands)] = cands
+                counts[r] = len(cands) + 1
+            self._candidate_table = (table, counts, row.astype(np.intp))
+        return self._candidate_table
+
+    def pool_table(self):
+        """
+        Grupo de vagas de cada par (paciente, UPAE) em matriz int32
+        n_pacientes x (n_upaes + 1); -1 nos pares incompatíveis e na última
+        coluna, que é a do gene -1 ("sem vaga"). Calculada uma vez.
+        """
+        if self._pool_table is None:
+            table = np.full((self.n_patients, self.n_upaes + 1), -1, dtype=np.int32)
+            rows_by_spec = defaultdict(list)
+            for i, spec in enumerate(self.patient_spec):
+                rows_by_spec[spec].append(i)
+            for spec, rows in rows_by_spec.items():
+                compat = self.compatible_by_spec.get(spec)
+                if compat is not None and len(compat):
+                    table[np.ix_(rows, compat)] = self.compatible_pools[spec]
+            self._pool_table = table
+        return self._pool_table
+
+    def spec_groups(self):
+        """
+        Pacientes agrupados por especialidade, para sortear em lote outro
+        paciente da mesma especialidade: (order, start, size, pos) com
+        order[start[i]:start[i] + size[i]] = pacientes da especialidade de i
+        e order[start[i] + pos[i]] = i. Calculada uma vez.
+        """
+        if self._spec_groups is None:
+            codes = {}
+            group = np.array([codes.setdefault(spec, len(codes)) for spec in self.patient_spec],
+                             dtype=np.int64).reshape(-1)
+            order = np.argsort(group, kind='stable')
+            counts = np.bincount(group, minlength=len(codes))
+            group_start = np.cumsum(counts) - counts
+            start = group_start[group]
+            pos = np.empty(self.n_patients, dtype=np.int64)
+            pos[order] = np.arange(self.n_patients) - start[order]
+            self._spec_groups = (order, start, counts[group], pos)
+        return self._spec_groups
+
+    def is_compatible(self, i, j):
+        """True se a UPAE j atende a especialidade do paciente i."""
+        return 0 <= j < self.n_upaes and bool(self.upae_bits[j] & self.patient_bit[i])
+
+    def compatible_list(self, i):
+        """UPAEs compatíveis com o paciente i (lista; não modificar)."""
+        return self.compatible_lists.get(self.patient_spec[i], [])
+
+    def pool(self, i, j):
+        """Grupo de vagas que o paciente i ocupa na UPAE j (compatível)."""
+        return self.pool_of[j][self.patient_spec[i]]
+
 # ==========================================
 # RESTRIÇÕES E VIABILIDADE
 # ==========================================
 
-def is_feasible(chromosome, pacientes, upaes, force_allocation=False):
+def is_feasible(chromosome, indice, force_allocation=False):
     """
     Restrição dura:
-    - Proibido: dois pacientes na mesma UPAE (sem sobrecarga)
+    - Proibido: mais pacientes num grupo de vagas da UPAE do que a sua
+      capacidade (sem sobrecarga; ver upae_slots)
     - Proibido: especialidade incompatível paciente-UPAE
-    - Paciente sem vaga (upae_id = -1 ou None):
+    - Paciente sem vaga (gene -1 ou None):
         * se force_allocation == True  -> proibido (cenário com capacidade suficiente)
         * se force_allocation == False -> permitido (cenário de escassez)
-    """
-    upae_map = {u['id']: u for u in upaes}
-    used_upaes = set()
 
-    for i, upae_id in enumerate(chromosome):
-        if upae_id in (-1, None):
+    indice: SpecialtyIndex da execução (genes são índices de UPAE).
+    """
+    upae_bits = indice.upae_bits
+    patient_bit = indice.patient_bit
+    patient_spec = indice.patient_spec
+    pool_of = indice.pool_of
+    pool_capacity = indice.pool_capacity
+    n_upaes = indice.n_upaes
+    used = {}  # grupo de vagas -> pacientes alocados
+
+    for i, j in enumerate(chromosome):
+        if j in (-1, None):
             if force_allocation:
                 # Cenário com capacidade suficiente, não aceitamos paciente sem vaga
                 return False
@@ -221,22 +679,17 @@ def is_feasible(chromosome, pacientes, upaes, force_allocation=False):
                 # Cenário de escassez, permitimos paciente sem vaga
                 continue
 
-        upae = upae_map.get(upae_id)
-        if upae is None:
-            return False
-
-        # Verifica especialidade compatível
-        pac_esp = pacientes[i]['especialidade'].lower()
-        upae_esps = [e.lower() for e in upae['especialidades']]
-
-        if pac_esp not in upae_esps:
+        # Verifica se a UPAE existe e se a especialidade é compatível
+        if not (0 <= j < n_upaes) or not (upae_bits[j] & patient_bit[i]):
             return False
 
-        # Verifica conflito de vaga (simplificado: 1 paciente por UPAE)
-        if upae_id in used_upaes:
+        # Verifica conflito de vaga (capacidade do grupo de vagas)
+        pool = pool_of[j][patient_spec[i]]
+        count = used.get(pool, 0)
+        if count >= pool_capacity[pool]:
             return False
 
-        used_upaes.add(upae_id)
+        used[pool] = count + 1
 
     return True
 
@@ -244,46 +697,75 @@ def is_feasible(chromosome, pacientes, upaes, force_allocation=False):
 # POPULAÇÃO INICIAL
 # ==========================================
 
-def init_feasible_population(pop_size, pacientes, upaes):
+def init_feasible_population(pop_size, indice, rng=random, deadline=None):
     """
     Gera população inicial VIÁVEL:
-    - Sem conflito de vaga
+    - Sem conflito de vaga (respeita a capacidade de cada grupo de vagas)
     - Especialidade compatível
     - Pacientes sem vaga quando não há UPAE disponível na especialidade
-    """
-    upaes_by_spec = defaultdict(list)
-    for u in upaes:
-        for spec in u['especialidades']:
-            upaes_by_spec[spec.lower()].append(u['id'])
 
+    Com o índice espacial ativo (indice.nearest), cada paciente sorteia
+    entre as suas K UPAEs mais próximas ainda com vaga e só recorre às
+    demais compatíveis se todas estiverem lotadas. Ao final, os pacientes
+    que o sorteio deixou sem vaga são alocados por caminhos aumentantes
+    (augment_allocation): cada indivíduo atende o máximo possível.
+
+    rng: gerador de números aleatórios da execução (random.Random); o
+    padrão é o módulo random, como nos demais operadores.
+    deadline: prazo opcional (time.monotonic()); passado o prazo, para de
+    gerar indivíduos (sempre gera pelo menos um) e a população sai menor.
+    """
     population = []
-    n_patients = len(pacientes)
+    n_patients = indice.n_patients
+    nearest = indice.nearest
+    pool_of = indice.pool_of
 
     for _ in range(pop_size):
         chrom = [-1] * n_patients
         free_upaes_by_spec = {
-            spec: upaes_by_spec[spec].copy()
-            for spec in upaes_by_spec
+            spec: ids.copy()
+            for spec, ids in indice.compatible_lists.items()
         }
+        remaining = list(indice.pool_capacity)
         idxs = list(range(n_patients))
-        random.shuffle(idxs)
+        rng.shuffle(idxs)
 
         for i in idxs:
-            pat = pacientes[i]
-            spec = pat['especialidade'].lower()
+            spec = indice.patient_spec[i]
             free = free_upaes_by_spec.get(spec, [])
-            if not free:
-                chrom[i] = -1
+            if nearest is not None:
+                free_now = ([k for k in nearest[i] if remaining[pool_of[k][spec]] > 0]
+                            or [k for k in free if remaining[pool_of[k][spec]] > 0])
+                j = rng.choice(free_now) if free_now else -1
             else:
-                uid = random.choice(free)
-                chrom[i] = uid
-                free.remove(uid)
+                # Vagas compartilhadas entre especialidades podem ter lotado
+                # pela lista livre de outra especialidade: descarta e sorteia de novo
+                j = -1
+                while free:
+                    k = rng.choice(free)
+                    if remaining[pool_of[k][spec]] > 0:
+                        j = k
+                        break
+                    free.remove(k)
+            chrom[i] = j
+            if j != -1:
+                pool = pool_of[j][spec]
+                remaining[pool] -= 1
+                if remaining[pool] == 0:
+                    free.remove(j)
 
         # Validação extra de segurança
-        if not is_feasible(chrom, pacientes, upaes):
-            chrom = [-1 if not is_feasible([uid], [pacientes[i]], upaes) else uid
-                     for i, uid in enumerate(chrom)]
+        if not is_feasible(chrom, indice):
+            chrom = [j if j == -1 or indice.is_compatible(i, j) else -1
+                     for i, j in enumerate(chrom)]
+        # Com grupos de vagas compartilhados entre especialidades, o sorteio
+        # guloso pode deixar pacientes sem vaga que uma realocação atenderia:
+        # completa por caminhos aumentantes
+        if indice.shared_pools and -1 in chrom:
+            augment_allocation(chrom, indice)
         population.append(chrom)
+        if deadline is not None and time.monotonic() >= deadline:
+            break
 
     return population
 
@@ -291,14 +773,14 @@ def init_feasible_population(pop_size, pacientes, upaes):
 # OPERADORES GENÉTICOS
 # ==========================================
 
-def uniform_crossover(parent1, parent2, crossover_rate=0.9):
-    if random.random() > crossover_rate:
+def uniform_crossover(parent1, parent2, crossover_rate=0.9, rng=random):
+    if rng.random() > crossover_rate:
         return parent1.copy(), parent2.copy()
     n = len(parent1)
     child1 = [None]*n
     child2 = [None]*n
     for i in range(n):
-        if random.random() < 0.5:
+        if rng.random() < 0.5:
             child1[i] = parent1[i]
             child2[i] = parent2[i]
         else:
@@ -306,86 +788,394 @@ def uniform_crossover(parent1, parent2, crossover_rate=0.9):
             child2[i] = parent1[i]
     return child1, child2
 
-def mutation(chromosome, pacientes, upaes, mutation_rate=0.3):
-    if random.random() >= mutation_rate:
+def mutation(chromosome, indice, mutation_rate=0.3, rng=random):
+    if rng.random() >= mutation_rate:
         return chromosome
     n = len(chromosome)
-    op = random.random()
+    op = rng.random()
     if op < 0.4 and n > 1:
         # swap (apenas se houver pelo menos 2 pacientes)
-        i, j = random.sample(range(n), 2)
+        i, j = rng.sample(range(n), 2)
         chromosome[i], chromosome[j] = chromosome[j], chromosome[i]
     elif op < 0.8:
-        # reatribui um paciente para outra UPAE compatível ou sem vaga
-        i = random.randrange(n)
-        spec = pacientes[i]['especialidade'].lower()
-        compat_upaes = [
-            u['id'] for u in upaes
-            if spec in [e.lower() for e in u['especialidades']]
-        ]
+        # reatribui um paciente para outra UPAE candidata (compatível, entre
+        # as K mais próximas se o índice espacial estiver ativo) ou sem vaga
+        i = rng.randrange(n)
+        compat_upaes = indice.candidates(i)
         if compat_upaes:
-            chromosome[i] = random.choice(compat_upaes + [-1])
+            chromosome[i] = rng.choice(compat_upaes + [-1])
         else:
             chromosome[i] = -1
     else:
         # shuffle em bloco
         if n >= 3:
-            start = random.randint(0, n-3)
-            end = min(n, start + random.randint(2, 5))
+            start = rng.randint(0, n-3)
+            end = min(n, start + rng.randint(2, 5))
             subset = chromosome[start:end]
-            random.shuffle(subset)
+            rng.shuffle(subset)
             chromosome[start:end] = subset
     return chromosome
 
-def repair_chromosome(chromosome, pacientes, upaes, force_allocation=False):
+# Operadores em lote: a geração inteira de filhos em poucas operações sobre
+# a matriz int32 da população, com um numpy.random.Generator da execução.
+# capacity_crossover_batch e mutation_batch preservam a viabilidade: filhos
+# de pais viáveis já saem viáveis, sem reparo nem descarte.
+
+def front_ranks(fronts, size):
+    """Nível da frente de cada indivíduo, como array (para o torneio em lote)."""
+    rank = np.empty(size, dtype=np.int64)
+    for r, front in enumerate(fronts):
+        rank[front] = r
+    return rank
+
+def tournament_batch(rank, crowding, n_winners, gen):
+    """
+    n_winners torneios binários de uma vez (como mo_tournament_index com
+    k=2): menor frente vence, empate decidido pelo maior crowding, e
+    empate total fica com o primeiro sorteado. Retorna os índices dos vencedores.
+    """
+    size = len(rank)
+    first = gen.integers(0, size, n_winners)
+    if size < 2:
+        return first
+    # Segundo candidato distinto do primeiro
+    second = (first + gen.integers(1, size, n_winners)) % size
+    second_wins = (rank[second] < rank[first]) | (
+        (rank[second] == rank[first]) & (crowding[second] > crowding[first])
+    )
+    return np.where(second_wins, second, first)
+
+def uniform_crossover_batch(parents1, parents2, crossover_rate, gen):
+    """
+    Crossover uniforme por máscara para todos os pares (linhas) de uma vez;
+    pares sorteados para não cruzar saem como cópias dos pais.
+    """
+    n_pairs, n = parents1.shape
+    cross = gen.random(n_pairs) <= crossover_rate
+    swap = (gen.random((n_pairs, n)) >= 0.5) & cross[:, None]
+    return np.where(swap, parents2, parents1), np.where(swap, parents1, parents2)
+
+def capacity_crossover_batch(parents1, parents2, crossover_rate, indice, gen,
+                             force_allocation=False):
+    """
+    Crossover uniforme que preserva a viabilidade: cada filho parte de um
+    dos pais (c1 de parents1, c2 de parents2) e recebe, nas posições
+    sorteadas pela máscara, o gene do outro pai somente se o grupo de vagas
+    dele ainda tiver vaga no filho. No conflito o paciente vai para a UPAE
+    com vaga mais próxima entre as suas indice.fill_order, ou fica com o
+    próprio gene (cuja vaga acabou de ser liberada) se ele vier antes ou se
+    o índice não tiver distâncias, como no reparo. Com force_allocation um
+    -1 do outro pai nunca é herdado. Genes iguais ou do mesmo grupo de vagas
+    são trocados direto, sem mexer na ocupação. Pares sorteados para não
+    cruzar saem como cópias.
+    """
+    n_pairs, n = parents1.shape
+    cross = gen.random(n_pairs) <= crossover_rate
+    swap = (gen.random((n_pairs, n)) >= 0.5) & cross[:, None]
+    if n_pairs == 0 or n == 0:
+        return parents1.copy(), parents2.copy()
+
+    table = indice.pool_table()
+    capacity = indice.pool_capacity
+    pool_of = indice.pool_of
+    patient_spec = indice.patient_spec
+    fill_order = indice.fill_order
+    cols = np.arange(n)
+    pools1 = table[cols, parents1]
+    pools2 = table[cols, parents2]
+    children = []
+    for base, other, base_pools, other_pools in ((parents1, parents2, pools1, pools2),
+                                                 (parents2, parents1, pools2, pools1)):
+        child = np.where(swap & (base_pools == other_pools), other, base)
+        # Posições em que a troca muda a ocupação dos grupos de vagas
+        contested = swap & (base_pools != other_pools)
+        if force_allocation:
+            contested &= other != -1
+        for r in np.nonzero(contested.any(axis=1))[0].tolist():
+            row_pools = base_pools[r]
+            load = np.bincount(row_pools[row_pools >= 0], minlength=len(capacity)).tolist()
+            idx = np.nonzero(contested[r])[0]
+            for i, a, b in zip(idx.tolist(), row_pools[idx].tolist(),
+                               other_pools[r, idx].tolist()):
+                if a >= 0:
+                    load[a] -= 1
+                if b < 0:
+                    child[r, i] = -1
+                elif load[b] < capacity[b]:
+                    child[r, i] = other[r, i]
+                    load[b] += 1
+                elif a >= 0:
+                    # Conflito: UPAE com vaga mais próxima (a própria tem vaga)
+                    j, pool = int(base[r, i]), a
+                    if fill_order is not None:
+                        spec = patient_spec[i]
+                        for k in fill_order[i]:
+                            p = pool_of[k][spec]
+                            if load[p] < capacity[p]:
+                                j, pool = k, p
+                                break
+                    child[r, i] = j
+                    load[pool] += 1
+        children.append(child)
+    return children[0], children[1]
+
+def feasible_rows(population, indice, force_allocation=False):
+    """is_feasible de todas as linhas de uma vez (vetor booleano)."""
+    m, n = population.shape
+    pools = indice.pool_table()[np.arange(n), population]
+    ok = ((pools >= 0) | (population == -1)).all(axis=1)
+    if force_allocation:
+        ok &= (population != -1).all(axis=1)
+    n_pools = indice.n_pools
+    assigned = pools >= 0
+    flat = (np.arange(m)[:, None] * n_pools + pools)[assigned]
+    load = np.bincount(flat, minlength=m * n_pools).reshape(m, n_pools)
+    ok &= (load <= np.asarray(indice.pool_capacity)).all(axis=1)
+    return ok
+
+# Tamanho máximo do grupo embaralhado pela mutação (randint(2, 5))
+MUTATION_BLOCK = 5
+
+def mutation_batch(children, indice, mutation_rate, gen, force_allocation=False):
+    """
+    Mutação em lote sobre a matriz de filhos (modificada no lugar e
+    devolvida), com as três operações de mutation adaptadas para preservar
+    a viabilidade:
+      - swap (40%): troca os genes de dois pacientes da MESMA especialidade
+        (a ocupação dos grupos de vagas não muda)
+      - reatribuição (40%): um paciente vai para uma candidata de
+        indice.candidate_table() cujo grupo tenha vaga no filho, ou para -1
+        se não houver force_allocation
+      - embaralhamento (20%): permuta os genes de 2 a 5 pacientes
+        consecutivos da mesma especialidade (em spec_groups())
+    """
+    m, n = children.shape
+    if m == 0 or n == 0:
+        return children
+    mutate = gen.random(m) < mutation_rate
+    op = gen.random(m)
+    order, start, size, pos = indice.spec_groups()
+
+    # swap com outro paciente da mesma especialidade (se houver)
+    rows = np.nonzero(mutate & (op < 0.4))[0]
+    if rows.size:
+        i = gen.integers(0, n, rows.size)
+        shift = (gen.random(rows.size) * (size[i] - 1)).astype(np.int64) + 1
+        j = order[start[i] + (pos[i] + shift) % size[i]]
+        children[rows, i], children[rows, j] = children[rows, j], children[rows, i]
+
+    # reatribui um paciente para outra UPAE candidata com vaga (ou sem vaga)
+    rows = np.nonzero(mutate & (op >= 0.4) & (op < 0.8))[0]
+    if rows.size:
+        table, counts, table_row = indice.candidate_table()
+        pool_table = indice.pool_table()
+        capacity = np.asarray(indice.pool_capacity)
+        cols = np.arange(n)
+        patients = gen.integers(0, n, rows.size)
+        draws = gen.random(rows.size)
+        for r, i, u in zip(rows.tolist(), patients.tolist(), draws.tolist()):
+            row_pools = pool_table[cols, children[r]]
+            load = np.bincount(row_pools[row_pools >= 0], minlength=len(capacity))
+            own = row_pools[i]
+            if own >= 0:
+                load[own] -= 1
+            # Candidatas com vaga no filho (o -1 do fim da linha só volta
+            # sem force_allocation)
+            cands = table[table_row[i], :counts[table_row[i]]]
+            cand_pools = pool_table[i, cands]
+            # O -1 ("sem vaga", grupo -1) fica fora da indexação: sem
+            # nenhum grupo de vagas, load e capacity são vazios
+            has_room = cand_pools >= 0
+            has_room[has_room] = load[cand_pools[has_room]] < capacity[cand_pools[has_room]]
+            allowed = cands[has_room]
+            if not force_allocation:
+                allowed = np.append(allowed, -1)
+            if allowed.size:
+                children[r, i] = allowed[int(u * allowed.size)]
+
+    # embaralhamento de pacientes consecutivos da mesma especialidade
+    rows = np.nonzero(mutate & (op >= 0.8))[0]
+    if rows.size:
+        i = gen.integers(0, n, rows.size)
+        length = np.minimum(gen.integers(2, MUTATION_BLOCK + 1, rows.size), size[i])
+        offsets = np.arange(MUTATION_BLOCK)
+        valid = offsets < length[:, None]
+        cols = order[start[i][:, None] + (pos[i][:, None] + offsets) % size[i][:, None]]
+        keys = np.where(valid, gen.random((rows.size, MUTATION_BLOCK)), np.inf)
+        perm = np.argsort(keys, axis=1)
+        shuffled = np.take_along_axis(children[rows[:, None], cols], perm, axis=1)
+        r, c = np.nonzero(valid)
+        children[rows[r], cols[r, c]] = shuffled[r, c]
+    return children
+
+def augment_allocation(chromosome, indice):
+    """
+    Completa uma alocação viável até o máximo de pacientes atendidos, por
+    caminhos aumentantes (emparelhamento máximo com capacidades): para cada
+    paciente sem vaga, uma busca em largura pelos grupos de vagas
+    compatíveis procura uma sequência de pacientes que podem trocar de
+    grupo até liberar uma vaga para ele. Modifica `chromosome` (lista de
+    índices de UPAE, sem conflitos) e o retorna.
+
+    A busca avança por especialidade (qualquer paciente da especialidade
+    num grupo serve para ocupar outro grupo compatível), então custa da
+    ordem de grupos x especialidades por paciente. Se a busca falha para um
+    paciente, falha para todos da mesma especialidade (a alocação não pode
+    ser aumentada a partir dela) e eles ficam com -1.
+    """
+    pool_of = indice.pool_of
+    pool_upae = indice.pool_upae
+    patient_spec = indice.patient_spec
+    compatible_pools = indice.compatible_pools
+    remaining = list(indice.pool_capacity)
+    members = [defaultdict(set) for _ in range(indice.n_pools)]  # grupo -> especialidade -> pacientes
+    pending = []
+    for i, j in enumerate(chromosome):
+        if j in (-1, None):
+            pending.append(i)
+            continue
+        pool = pool_of[j][patient_spec[i]]
+        remaining[pool] -= 1
+        members[pool][patient_spec[i]].add(i)
+
+    dead = set()  # especialidades sem caminho aumentante
+    for i in pending:
+        spec = patient_spec[i]
+        if spec in dead or spec not in compatible_pools:
+            continue
+        # parent[g] = (paciente que entra em g, grupo de onde ele sai ou None)
+        parent = {}
+        queue = deque()
+        for g in compatible_pools[spec].tolist():
+            if g not in parent:
+                parent[g] = (i, None)
+                queue.append(g)
+        expanded = {spec}
+        end = next((g for g in parent if remaining[g] > 0), None)
+        while end is None and queue:
+            g = queue.popleft()
+            for other, pats in members[g].items():
+                if other in expanded or not pats:
+                    continue
+                expanded.add(other)
+                q = next(iter(pats))
+                for g2 in compatible_pools[other].tolist():
+                    if g2 not in parent:
+                        parent[g2] = (q, g)
+                        if remaining[g2] > 0:
+                            end = g2
+                            break
+                        queue.append(g2)
+                if end is not None:
+                    break
+        if end is None:
+            dead.add(spec)
+            continue
+
+        # Desloca os pacientes ao longo do caminho, do fim para o início
+        remaining[end] -= 1
+        g = end
+        while g is not None:
+            q, g_from = parent[g]
+            if g_from is not None:
+                members[g_from][patient_spec[q]].discard(q)
+            members[g][patient_spec[q]].add(q)
+            chromosome[q] = pool_upae[g]
+            g = g_from
+    return chromosome
+
+def repair_chromosome(chromosome, indice, force_allocation=False):
     """
     Reparo em duas etapas:
-    1ª passada: Limpa UPAEs inexistentes, conflitos de vaga e especialidade errada -> vira -1
-    2ª passada: Se force_allocation == True, tenta preencher pacientes com -1
-                usando QUALQUER UPAE livre compatível (sem otimizar distância)
+    1ª passada: Limpa UPAEs inexistentes, especialidade errada e pacientes
+                além da capacidade do grupo de vagas -> vira -1
+    2ª passada: Se force_allocation == True, preenche cada paciente com -1
+                com a UPAE compatível com vaga MAIS PRÓXIMA dele: primeiro
+                entre as suas FILL_CANDIDATES mais próximas (indice.fill_order),
+                senão pela menor distância entre todas as compatíveis com vaga.
+                Sem distâncias no índice (set_fill_costs) usa a primeira
+                compatível com vaga. Uma passada pelos pendentes; especialidades
+                sem vaga nenhuma são descartadas de uma vez. Quem ficar sem
+                vaga no preenchimento guloso é alocado por caminhos
+                aumentantes (augment_allocation), então o reparo aloca todos
+                sempre que há uma alocação completa.
     """
-    upae_map = {u['id']: u for u in upaes}
-    used_upaes = set()
+    pool_of = indice.pool_of
+    remaining = list(indice.pool_capacity)
 
     # 1ª passada: limpar inconsistências
-    for i, uid in enumerate(chromosome):
-        if uid in (-1, None):
+    for i, j in enumerate(chromosome):
+        if j in (-1, None):
             continue
 
-        upae = upae_map.get(uid)
-        pac_esp = pacientes[i]['especialidade'].lower()
-
-        # Verifica se UPAE existe, se especialidade é compatível e se não há conflito
-        if upae is None:
+        # Verifica se UPAE existe, se especialidade é compatível e se ainda há vaga
+        if not indice.is_compatible(i, j):
             chromosome[i] = -1
-        elif pac_esp not in [e.lower() for e in upae['especialidades']]:
-            chromosome[i] = -1
-        elif uid in used_upaes:
+            continue
+        pool = pool_of[j][indice.patient_spec[i]]
+        if remaining[pool] <= 0:
             chromosome[i] = -1
         else:
-            used_upaes.add(uid)
+            remaining[pool] -= 1
 
     if not force_allocation:
         # Cenário de escassez: podemos deixar -1
         return chromosome
 
     # 2ª passada (somente se force_allocation == True):
-    # preenche -1 com UPAEs livres compatíveis (sem otimizar distância)
-    free_upaes_by_spec = defaultdict(list)
-    for u in upaes:
-        if u['id'] not in used_upaes:
-            for esp in u['especialidades']:
-                free_upaes_by_spec[esp.lower()].append(u['id'])
+    # preenche -1 com a UPAE compatível com vaga mais próxima
+    pending = [i for i, j in enumerate(chromosome) if j in (-1, None)]
+    if not pending:
+        return chromosome
 
-    for i, uid in enumerate(chromosome):
-        if uid in (-1, None):
-            spec = pacientes[i]['especialidade'].lower()
-            free_list = free_upaes_by_spec.get(spec)
-            if free_list:
-                new_uid = free_list.pop(0)  # escolhe qualquer um disponível
-                chromosome[i] = new_uid
-                used_upaes.add(new_uid)
+    fill_order = indice.fill_order
+    remaining_arr = None   # cópia NumPy de remaining, criada na 1ª busca completa
+    exhausted = set()      # especialidades sem nenhuma vaga livre
+    heads = {}             # sem distâncias: posição da 1ª candidata livre por especialidade
 
+    for i in pending:
+        spec = indice.patient_spec[i]
+        if spec in exhausted:
+            continue
+        new_j = None
+        if fill_order is not None:
+            # Candidatas mais próximas primeiro (quase sempre resolve aqui)
+            new_j = next((k for k in fill_order[i] if remaining[pool_of[k][spec]] > 0), None)
+            if new_j is None:
+                compat = indice.compatible_by_spec.get(spec)
+                if compat is None or len(compat) == 0:
+                    exhausted.add(spec)
+                    continue
+                if remaining_arr is None:
+                    remaining_arr = np.array(remaining)
+                free = remaining_arr[indice.compatible_pools[spec]] > 0
+                if not free.any():
+                    exhausted.add(spec)
+                    continue
+                dist = np.where(free, indice.fill_dist[i, compat], np.inf)
+                new_j = int(compat[int(np.argmin(dist))])
+        else:
+            # Grupos lotados (inclusive por outra especialidade, nas vagas
+            # compartilhadas) nunca voltam a ter vaga: o ponteiro só avança
+            free_list = indice.compatible_lists.get(spec, [])
+            h = heads.get(spec, 0)
+            while h < len(free_list) and remaining[pool_of[free_list[h]][spec]] <= 0:
+                h += 1
+            heads[spec] = h
+            if h == len(free_list):
+                exhausted.add(spec)
+                continue
+            new_j = free_list[h]
+        pool = pool_of[new_j][spec]
+        chromosome[i] = new_j
+        remaining[pool] -= 1
+        if remaining_arr is not None:
+            remaining_arr[pool] -= 1
+
+    # Quem sobrou (vagas compartilhadas tomadas por outra especialidade no
+    # preenchimento guloso) entra por caminhos aumentantes
+    if indice.shared_pools and any(chromosome[i] in (-1, None) for i in pending):
+        augment_allocation(chromosome, indice)
     return chromosome
 
 # ==========================================
@@ -403,6 +1193,57 @@ def dominates(obj_a, obj_b):
     return not_worse and strictly_better
 
 def fast_nondominated_sort(population, objectives_list):
+    """
+    Ordenação não-dominada do NSGA-II.
+
+    Com dois objetivos (caso de evaluate_objectives) usa a varredura
+    O(N log N) de _nondominated_sort_2d; para outros números de objetivos
+    cai no algoritmo clássico de Deb, O(M*N^2).
+    Em ambos os casos cada frente é devolvida em ordem crescente de índice.
+    """
+    if objectives_list and all(len(obj) == 2 for obj in objectives_list):
+        return _nondominated_sort_2d(objectives_list)
+    return _nondominated_sort_deb(population, objectives_list)
+
+def _nondominated_sort_2d(objectives_list):
+    """
+    Ordenação não-dominada bi-objetivo por ordenação + varredura.
+
+    Percorre os pontos em ordem lexicográfica (f1, f2). Dentro de uma frente,
+    nessa ordem, f2 é estritamente decrescente (a menos de pontos repetidos),
+    então basta comparar o ponto com o ÚLTIMO membro de cada frente para saber
+    se ela o domina. Como "a frente k domina p" implica "a frente k-1 domina p",
+    a frente de p é achada por busca binária.
+    """
+    order = sorted(range(len(objectives_list)),
+                   key=lambda i: (objectives_list[i][0], objectives_list[i][1]))
+    fronts = []
+    last = []  # último ponto (menor f2) de cada frente
+
+    for p in order:
+        f1, f2 = objectives_list[p]
+        lo, hi = 0, len(fronts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            l1, l2 = last[mid]
+            # l1 <= f1 pela ordem lexicográfica: domina se não for pior em f2
+            # e não for o mesmo ponto
+            if l2 < f2 or (l2 == f2 and l1 < f1):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(fronts):
+            fronts.append([p])
+            last.append((f1, f2))
+        else:
+            fronts[lo].append(p)
+            last[lo] = (f1, f2)
+
+    for front in fronts:
+        front.sort()
+    return fronts
+
+def _nondominated_sort_deb(population, objectives_list):
     S = [[] for _ in population]
     n = [0 for _ in population]
     fronts = [[]]
@@ -431,38 +1272,81 @@ def fast_nondominated_sort(population, objectives_list):
 
     if not fronts[-1]:
         fronts.pop()
+    for front in fronts:
+        front.sort()
     return fronts
 
 def crowding_distance(front, objectives_list):
-    distance = {i: 0.0 for i in front}
-    if len(front) == 0:
-        return distance
-    num_obj = len(objectives_list[0])
-
-    for m in range(num_obj):
-        front_sorted = sorted(front, key=lambda i: objectives_list[i][m])
-        f_min = objectives_list[front_sorted[0]][m]
-        f_max = objectives_list[front_sorted[-1]][m]
-        if f_max == f_min:
-            continue
-        distance[front_sorted[0]]  = float('inf')
-        distance[front_sorted[-1]] = float('inf')
-        for k in range(1, len(front_sorted)-1):
-            prev_idx = front_sorted[k-1]
-            next_idx = front_sorted[k+1]
-            dist = (objectives_list[next_idx][m] - objectives_list[prev_idx][m]) / (f_max - f_min)
-            distance[front_sorted[k]] += dist
+    """Crowding distance de uma frente, como dict índice -> distância."""
+    cd = crowding_distances(objectives_list, [front])
+    return {i: float(cd[i]) for i in front}
 
+def crowding_distances(objectives_list, fronts):
+    """
+    Crowding distance de todas as frentes de uma vez, como array indexado
+    pela população (0 para quem não está em nenhuma frente).
+
+    Para cada objetivo, um único argsort (lexsort por frente, valor e
+    posição na frente) deixa cada frente contígua e ordenada; extremos de
+    cada frente recebem inf e os internos somam (próximo - anterior) /
+    (max - min) da frente. Mesma ordem de desempate e mesmas operações de
+    ponto flutuante do cálculo frente a frente.
+    """
+    distance = np.zeros(len(objectives_list))
+    members, dist = _fronts_crowding(objectives_list, fronts)
+    distance[members] = dist
     return distance
 
-def mo_tournament_selection(population, fronts, crowding, k=2):
+def _fronts_crowding(objectives_list, fronts):
+    """(membros das frentes concatenados, crowding de cada um) de crowding_distances."""
+    fronts = [front for front in fronts if len(front)]
+    if not fronts:
+        return np.zeros(0, dtype=np.intp), np.zeros(0)
+    lengths = np.array([len(front) for front in fronts])
+    members = np.concatenate([np.asarray(front, dtype=np.intp) for front in fronts])
+    # Só os objetivos dos membros (na truncagem, só a última frente)
+    objs = np.array([objectives_list[i] for i in members.tolist()], dtype=float)
+    objs = objs.reshape(len(members), -1)
+    front_id = np.repeat(np.arange(len(fronts)), lengths)
+    position = np.arange(len(members)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    # Início e fim de cada frente no vetor ordenado (frentes contíguas)
+    ends = np.cumsum(lengths) - 1
+    starts = ends - lengths + 1
+    interior = np.ones(len(members), dtype=bool)
+    interior[starts] = False
+    interior[ends] = False
+    interior_idx = np.nonzero(interior)[0]
+
+    dist = np.zeros(len(members))
+    for m in range(objs.shape[1]):
+        values = objs[:, m]
+        order = np.lexsort((position, values, front_id))
+        v = values[order]
+        span = v[ends] - v[starts]
+        active = span != 0
+        # Extremos de cada frente com objetivo não constante
+        dist[order[starts[active]]] = np.inf
+        dist[order[ends[active]]] = np.inf
+        # Internos: vizinhos na ordenação, normalizados pela amplitude da frente
+        span_of = span[front_id[interior_idx]]
+        ok = span_of != 0
+        k = interior_idx[ok]
+        dist[order[k]] += (v[k + 1] - v[k - 1]) / span_of[ok]
+    return members, dist
+
+def mo_tournament_selection(population, fronts, crowding, k=2, rng=random):
+    return population[mo_tournament_index(population, fronts, crowding, k, rng)]
+
+def mo_tournament_index(population, fronts, crowding, k=2, rng=random):
+    """Torneio da mo_tournament_selection, devolvendo o índice do vencedor."""
     # mapa idx -> rank (nível da frente)
     rank = {}
     for r, front in enumerate(fronts):
         for idx in front:
             rank[idx] = r
 
-    candidates = random.sample(range(len(population)), k)
+    candidates = rng.sample(range(len(population)), k)
     best = candidates[0]
     for idx in candidates[1:]:
         if rank[idx] < rank[best]:
@@ -470,7 +1354,7 @@ def mo_tournament_selection(population, fronts, crowding, k=2):
         elif rank[idx] == rank[best]:
             if crowding.get(idx, 0.0) > crowding.get(best, 0.0):
                 best = idx
-    return population[best]
+    return best
 
 # ==========================================
 # AVALIAÇÃO DE OBJETIVOS (MULTI-OBJETIVO)
@@ -552,6 +1436,416 @@ def evaluate_objectives(chromosome, pacientes, upaes, base_no_show_dict, high_pe
 
     return (adj_trav, adj_wait)
 
+# ==========================================
+# INSTÂNCIA DO PROBLEMA (CUSTOS PRÉ-COMPUTADOS)
+# ==========================================
+
+class ProblemInstance:
+    """
+    Instância do problema para uma execução do NSGA-II.
+
+    Pré-computa UMA vez por execução, em matrizes NumPy (n_pacientes x n_upaes),
+    a distância, o custo de viagem relativo, o custo de espera relativo e a
+    probabilidade de no-show de cada par (paciente, UPAE) compatível.
+    Com isso a avaliação de um cromossomo vira consulta em tabela + soma,
+    sem haversine nem compute_p_noshow no laço interno. Os pares são
+    calculados em bloco pelo modelo vetorizado (haversine_array,
+    p_noshow_array).
+
+    Pares incompatíveis só são calculados sob demanda (não ocorrem em
+    cromossomos viáveis, mas evaluate_objectives aceita qualquer cromossomo).
+
+    Internamente os genes são índices de coluna (int32), com -1 = sem vaga.
+    As matrizes têm uma coluna extra no final, de custo zero, que é
+    justamente a coluna -1: assim "sem vaga" não precisa de caso especial
+    na indexação vetorizada.
+
+    As somas são acumuladas na mesma ordem de evaluate_objectives, logo os
+    objetivos retornados coincidem com os da função original (a menos de
+    arredondamento no último bit, entre o cálculo em bloco e o escalar).
+
+    k_nearest: se informado, ativa o índice espacial dos operadores (as K
+    UPAEs compatíveis mais próximas de cada paciente, ver
+    SpecialtyIndex.set_nearest).
+
+    Avaliação incremental: population_sums guarda as somas parciais de cada
+    cromossomo (TravelCost, WaitCost, NoShowSum e atendidos; os sem vaga são
+    o complemento) e objectives_from_sums aplica normalização e penalizações.
+    delta_sums atualiza as somas de um cromossomo derivado de outro
+    consultando só os genes alterados.
+    """
+
+    # Colunas da matriz de somas parciais (population_sums / delta_sums)
+    SUM_FIELDS = ('TravelCost', 'WaitCost', 'NoShowSum', 'assigned_count')
+
+    def __init__(self, pacientes, upaes, base_no_show_dict=None, k_nearest=None):
+        if base_no_show_dict is None:
+            base_no_show_dict = BASE_NO_SHOW
+
+        # Índices que só dependem das UPAEs (pré-computados se `upaes` já
+        # for um UpaeCatalog, ex.: uma versão do registro do servidor)
+        catalogo = UpaeCatalog.of(upaes)
+        self.pacientes = pacientes
+        self.upaes = catalogo
+        self.base_no_show_dict = base_no_show_dict
+
+        # Mapeamento id da UPAE <-> índice de coluna (último id repetido vence,
+        # como no upae_map original)
+        self.upae_ids = catalogo.upae_ids
+        self.upae_index = catalogo.upae_index
+
+        n_pat = len(pacientes)
+        n_upae = catalogo.n_upaes
+        self.n_patients = n_pat
+        self.n_upaes = n_upae
+
+        # Índice de especialidades compartilhado pelos operadores genéticos
+        self.specialties = SpecialtyIndex(pacientes, catalogo)
+
+        # Probabilidade base por paciente (mesma regra de evaluate_objectives)
+        self.base_ns = [
+            base_no_show_dict.get(p['especialidade'].lower(), 0.3)
+            for p in pacientes
+        ]
+        # Fatores de no-show por paciente, para o cálculo vetorizado dos pares
+        (self.pat_lat, self.pat_lon, self.adjusted_base,
+         self.tfd, self.vuln_sev) = patient_noshow_arrays(pacientes, self.base_ns)
+
+        # Compatibilidade de especialidade paciente x UPAE
+        self.compatible = np.zeros((n_pat, n_upae), dtype=bool)
+        for i, compat in enumerate(self.specialties.patient_compat):
+            self.compatible[i, compat] = True
+
+        # Espera relativa por UPAE (não depende do paciente) + coluna "sem vaga"
+        self.wait_days = catalogo.wait_days
+        self.wait_cost = catalogo.wait_cost
+
+        # Matrizes por par (paciente, UPAE) + coluna "sem vaga"
+        self.dist_km = np.full((n_pat, n_upae + 1), np.nan)
+        self.travel_cost = np.full((n_pat, n_upae + 1), np.nan)
+        self.p_noshow = np.full((n_pat, n_upae + 1), np.nan)
+        self._computed = np.zeros((n_pat, n_upae + 1), dtype=bool)
+        self.dist_km[:, -1] = 0.0
+        self.travel_cost[:, -1] = 0.0
+        self.p_noshow[:, -1] = 0.0
+        self._computed[:, -1] = True
+
+        rows, cols = np.nonzero(self.compatible)
+        self._fill_pairs(rows, cols)
+
+        # Reparo pela UPAE livre mais próxima e índice espacial (K UPAEs
+        # compatíveis mais próximas por paciente): as distâncias de todos os
+        # pares compatíveis já estão calculadas
+        self.specialties.set_fill_costs(self.dist_km)
+        if k_nearest:
+            self.specialties.set_nearest(self.dist_km[:, :-1], k_nearest)
+
+    def _fill_pairs(self, rows, cols):
+        """Calcula distância/no-show para os pares (rows[k], cols[k]) ainda ausentes."""
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        missing = ~self._computed[rows, cols]
+        rows, cols = rows[missing], cols[missing]
+        if rows.size == 0:
+            return
+        catalogo = self.upaes
+        dist = haversine_array(
+            self.pat_lat[rows], self.pat_lon[rows], catalogo.lat[cols], catalogo.lon[cols]
+        )
+        self.dist_km[rows, cols] = dist
+        self.travel_cost[rows, cols] = dist / DIST_REF
+        self.p_noshow[rows, cols] = p_noshow_array(
+            self.adjusted_base[rows], self.tfd[rows], self.vuln_sev[rows],
+            catalogo.transport_score[cols], dist
+        )
+        self._computed[rows, cols] = True
+
+    def encode(self, chromosome):
+        """Converte genes (ids de UPAE) em índices de coluna; -1 = sem vaga."""
+        return [
+            self.upae_index.get(uid, -1) if uid not in (-1, None) else -1
+            for uid in chromosome
+        ]
+
+    def decode(self, genes):
+        """Converte índices de coluna de volta em ids de UPAE."""
+        return [self.upae_ids[j] if j >= 0 else -1 for j in genes]
+
+    def evaluate_population(self, population, high_penalty_unalloc=False):
+        """
+        Avalia a população INTEIRA de uma vez.
+
+        population: matriz int32 (pop_size, n_pacientes) com índices de coluna.
+        Retorna matriz (pop_size, 2) com (adj_trav, adj_wait) por cromossomo,
+        com as mesmas penalizações de evaluate_objectives (W_UNALLOC ou peso
+        de escassez, soft constraint TH_NS/PEN_NS).
+
+        As somas usam np.cumsum, que acumula sequencialmente na mesma ordem
+        do laço Python; os valores batem bit a bit com evaluate_objectives.
+        """
+        return self.objectives_from_sums(self.population_sums(population), high_penalty_unalloc)
+
+    def population_sums(self, population):
+        """
+        Somas parciais de cada cromossomo: matriz (pop_size, 4) com as
+        colunas de SUM_FIELDS (custos ainda não normalizados).
+        """
+        population = np.atleast_2d(np.asarray(population, dtype=np.int32))
+        pop_size = population.shape[0]
+        rows = np.arange(self.n_patients)
+
+        missing = ~self._computed[rows, population]
+        if missing.any():
+            r, c = np.nonzero(missing)
+            self._fill_pairs(c, population[r, c])
+
+        sums = np.zeros((pop_size, len(self.SUM_FIELDS)))
+        if self.n_patients:
+            sums[:, 0] = np.cumsum(self.travel_cost[rows, population], axis=1)[:, -1]
+            sums[:, 1] = np.cumsum(self.wait_cost[population], axis=1)[:, -1]
+            sums[:, 2] = np.cumsum(self.p_noshow[rows, population], axis=1)[:, -1]
+        sums[:, 3] = (population >= 0).sum(axis=1)
+        return sums
+
+    def delta_sums(self, sums, parents, children):
+        """
+        Somas parciais de `children` a partir das somas dos respectivos
+        `parents` (mesmo número de linhas): cada gene alterado soma o custo
+        da nova UPAE e subtrai o da antiga, então as tabelas só são
+        consultadas em O(genes alterados).
+
+        O resultado difere de population_sums(children) apenas por
+        arredondamento (a ordem das somas muda).
+        """
+        parents = np.atleast_2d(np.asarray(parents, dtype=np.int32))
+        children = np.atleast_2d(np.asarray(children, dtype=np.int32))
+        new_sums = np.array(sums, dtype=float, copy=True).reshape(-1, len(self.SUM_FIELDS))
+
+        r, i = np.nonzero(parents != children)
+        if r.size == 0:
+            return new_sums
+        old_j = parents[r, i]
+        new_j = children[r, i]
+        missing = ~self._computed[i, new_j]
+        if missing.any():
+            self._fill_pairs(i[missing], new_j[missing])
+
+        n_rows = new_sums.shape[0]
+        deltas = (
+            self.travel_cost[i, new_j] - self.travel_cost[i, old_j],
+            self.wait_cost[new_j] - self.wait_cost[old_j],
+            self.p_noshow[i, new_j] - self.p_noshow[i, old_j],
+            (new_j >= 0).astype(float) - (old_j >= 0)
+        )
+        for col, delta in enumerate(deltas):
+            new_sums[:, col] += np.bincount(r, weights=delta, minlength=n_rows)
+        # Ninguém atendido: custos exatamente zero (sem resíduo de arredondamento)
+        new_sums[new_sums[:, 3] == 0, :3] = 0.0
+        return new_sums
+
+    def objectives_from_sums(self, sums, high_penalty_unalloc=False):
+        """Objetivos (adj_trav, adj_wait) a partir das somas parciais, como em evaluate_population."""
+        sums = np.atleast_2d(sums)
+        travel_sum, wait_sum, ns_sum = sums[:, 0], sums[:, 1], sums[:, 2]
+        n_assigned = sums[:, 3]
+        n_unalloc = self.n_patients - n_assigned
+
+        # Penalização por pacientes sem vaga (escassez: peso 50x)
+        w_unalloc = 50.0 if high_penalty_unalloc else W_UNALLOC
+        penalty_unalloc = w_unalloc * n_unalloc
+
+        # Soft constraint de no-show
+        ns_limit = TH_NS * n_assigned
+        viol = (n_assigned > 0) & (ns_sum > ns_limit)
+        penalty_ns = np.where(viol, PEN_NS * (ns_sum - ns_limit), 0.0)
+
+        # Normalização por número de atendidos (somas já são 0 se ninguém atendido)
+        denom = np.maximum(n_assigned, 1)
+        adj_trav = travel_sum / denom
+        adj_wait = wait_sum / denom + penalty_unalloc + penalty_ns
+
+        return np.column_stack((adj_trav, adj_wait))
+
+    def evaluate(self, chromosome, high_penalty_unalloc=False):
+        """
+        Equivalente a evaluate_objectives(chromosome, ...) usando as tabelas
+        pré-computadas. Recebe o cromossomo com ids de UPAE.
+        """
+        objs = self.evaluate_population([self.encode(chromosome)], high_penalty_unalloc)
+        return tuple(objs[0].tolist())
+
+    def diagnostics(self, chromosome):
+        """Equivalente a diagnostics_for_solution, recebendo genes em índices de coluna."""
+        genes = np.asarray(chromosome, dtype=np.int32)
+        rows = np.arange(self.n_patients)
+        missing = ~self._computed[rows, genes]
+        if missing.any():
+            self._fill_pairs(rows[missing], genes[missing])
+
+        total_dist = 0.0
+        total_wait = 0.0
+        ExpNoShowCost = 0.0
+        num_unallocated = 0
+        assigned_count = 0
+
+        for i, j in enumerate(genes.tolist()):
+            if j < 0:
+                num_unallocated += 1
+                continue
+            total_dist += float(self.dist_km[i, j])
+            total_wait += self.upaes[j].get('tempo_espera_dias', 0)
+            ExpNoShowCost += float(self.p_noshow[i, j])
+            assigned_count += 1
+
+        if assigned_count > 0:
+            mean_dist = total_dist / assigned_count
+            mean_wait = total_wait / assigned_count
+            mean_noshow = ExpNoShowCost / assigned_count
+        else:
+            mean_dist = 0.0
+            mean_wait = 0.0
+            mean_noshow = 0.0
+
+        return {
+            'distancia_media_km': mean_dist,
+            'espera_media_dias': mean_wait,
+            'prob_noshow_media': mean_noshow,
+            'faltas_esperadas': ExpNoShowCost,
+            'pacientes_atendidos': assigned_count,
+            'pacientes_sem_vaga': num_unallocated,
+            'total_pacientes': len(self.pacientes)
+        }
+
+# ==========================================
+# BACKENDS DE AVALIAÇÃO (SERIAL / PROCESSOS / THREADS)
+# ==========================================
+
+# Instância do problema no processo worker (enviada UMA vez, no initializer)
+_worker_instance = None
+
+def _init_evaluation_worker(instancia):
+    global _worker_instance
+    _worker_instance = instancia
+
+def _call_in_worker(method, chunk, *args):
+    return getattr(_worker_instance, method)(chunk, *args)
+
+class SerialEvaluator:
+    """
+    Avaliador padrão: avalia a população inteira no processo atual.
+
+    Todos os backends expõem a mesma interface (evaluate / evaluate_sums /
+    close) e podem ser usados como context manager. evaluate_sums devolve
+    as somas parciais (ProblemInstance.population_sums), usadas pela
+    avaliação incremental do evolve_nsga2. A avaliação de cada cromossomo é pura
+    e independe do particionamento, então o resultado é idêntico em qualquer
+    backend e com qualquer número de workers.
+    """
+
+    def __init__(self, instancia):
+        self.instancia = instancia
+
+    def evaluate(self, population, high_penalty_unalloc=False):
+        return self.instancia.evaluate_population(population, high_penalty_unalloc)
+
+    def evaluate_sums(self, population):
+        return self.instancia.population_sums(population)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class _PoolEvaluator(SerialEvaluator, ABC):
+    """
+    Divide a população em blocos de linhas e avalia os blocos em paralelo.
+    Cada subclasse cria o executor e define como os blocos são enviados (_submit).
+    """
+
+    def __init__(self, instancia, n_workers=None):
+        super().__init__(instancia)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.executor = None
+
+    @abstractmethod
+    def _submit(self, method, chunks, *args):
+        """Avalia cada bloco com ProblemInstance.<method>, preservando a ordem."""
+
+    def _map(self, method, population, *args):
+        population = np.atleast_2d(np.asarray(population, dtype=np.int32))
+        n_chunks = min(self.n_workers, population.shape[0])
+        if n_chunks <= 1:
+            return getattr(self.instancia, method)(population, *args)
+        chunks = np.array_split(population, n_chunks)
+        # map preserva a ordem dos blocos -> resultado determinístico
+        return np.vstack(list(self._submit(method, chunks, *args)))
+
+    def evaluate(self, population, high_penalty_unalloc=False):
+        return self._map('evaluate_population', population, high_penalty_unalloc)
+
+    def evaluate_sums(self, population):
+        return self._map('population_sums', population)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+class ThreadPoolEvaluator(_PoolEvaluator):
+    """Avaliação em threads: compartilha a instância sem cópia (NumPy libera o GIL)."""
+
+    def __init__(self, instancia, n_workers=None):
+        super().__init__(instancia, n_workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.n_workers)
+
+    def _submit(self, method, chunks, *args):
+        return self.executor.map(
+            getattr(self.instancia, method), chunks, *(repeat(a) for a in args)
+        )
+
+class ProcessPoolEvaluator(_PoolEvaluator):
+    """
+    Avaliação em processos (concurrent.futures).
+
+    A instância do problema é enviada a cada worker uma única vez, pelo
+    initializer; a cada geração só trafegam os blocos de cromossomos (int32)
+    e as matrizes de objetivos.
+    """
+
+    def __init__(self, instancia, n_workers=None):
+        super().__init__(instancia, n_workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_init_evaluation_worker,
+            initargs=(instancia,)
+        )
+
+    def _submit(self, method, chunks, *args):
+        return self.executor.map(
+            _call_in_worker, repeat(method), chunks, *(repeat(a) for a in args)
+        )
+
+EVALUATOR_BACKENDS = {
+    'serial': SerialEvaluator,
+    'threads': ThreadPoolEvaluator,
+    'processos': ProcessPoolEvaluator,
+}
+
+def make_evaluator(backend, instancia, n_workers=None):
+    """Cria o avaliador pelo nome: 'serial', 'threads' ou 'processos'."""
+    if backend not in EVALUATOR_BACKENDS:
+        raise ValueError(
+            f"Backend de avaliação desconhecido: {backend}. "
+            f"Use um de {sorted(EVALUATOR_BACKENDS)}."
+        )
+    if backend == 'serial':
+        return SerialEvaluator(instancia)
+    return EVALUATOR_BACKENDS[backend](instancia, n_workers)
+
 # ==========================================
 # DIAGNÓSTICOS PARA SOLUÇÃO
 # ==========================================
@@ -608,13 +1902,238 @@ def diagnostics_for_solution(chromosome, pacientes, upaes, base_no_show_dict):
         'total_pacientes': len(pacientes)
     }
 
+# ==========================================
+# CRITÉRIOS DE PARADA ANTECIPADA
+# ==========================================
+
+def hypervolume_2d(objectives_list, ref):
+    """
+    Hipervolume (minimização, 2 objetivos) dominado pelos pontos em relação
+    ao ponto de referência `ref`. Pontos que não dominam `ref` não contam.
+    """
+    points = sorted(
+        (f1, f2) for f1, f2 in objectives_list if f1 < ref[0] and f2 < ref[1]
+    )
+    hv = 0.0
+    prev_f2 = ref[1]
+    for f1, f2 in points:
+        if f2 < prev_f2:
+            hv += (ref[0] - f1) * (prev_f2 - f2)
+            prev_f2 = f2
+    return hv
+
+class StoppingCriteria:
+    """
+    Critérios opcionais de parada antecipada para o NSGA-II.
+    Cada critério fica desligado enquanto seu parâmetro for None.
+
+    - hv_window / hv_tol: para se o hipervolume da frente 0 não melhorou mais
+      que hv_tol (relativo) nas últimas hv_window gerações. O ponto de
+      referência é fixado na população inicial (pior valor de cada objetivo
+      com 10% de folga).
+    - mean_window / mean_tol: para se a média da frente 0 (a mesma do
+      history) variou menos que mean_tol (relativo, em cada objetivo) nas
+      últimas mean_window gerações.
+    - time_limit_s: orçamento de tempo de relógio da evolução.
+    - deadline: instante absoluto (time.monotonic()) em que o resultado tem
+      que estar pronto, usado pelo modo anytime da API.
+    - max_evaluations: orçamento de avaliações de objetivos; a geração que
+      estouraria o orçamento não é executada.
+
+    Os limites de tempo são preditivos: a evolução para quando a próxima
+    geração (estimada pela duração média das anteriores) não caberia mais
+    no tempo restante, para não estourar o prazo. O relógio de time_limit_s
+    começa na criação do objeto, antes do preparo da instância, e a
+    população inicial também para de ser gerada no prazo (ver deadline_at).
+    """
+
+    # Motivos de parada por orçamento (resultado truncado)
+    BUDGET_REASONS = ('tempo_esgotado', 'avaliacoes_esgotadas')
+
+    def __init__(self, hv_window=None, hv_tol=1e-4,
+                 mean_window=None, mean_tol=1e-4,
+                 time_limit_s=None, deadline=None, max_evaluations=None):
+        self.hv_window = hv_window
+        self.hv_tol = hv_tol
+        self.mean_window = mean_window
+        self.mean_tol = mean_tol
+        self.time_limit_s = time_limit_s
+        self.deadline = deadline
+        self.max_evaluations = max_evaluations
+        self._t0 = time.monotonic()
+        self.start()
+
+    def start(self, objectives_list=None):
+        """
+        Zera o estado das gerações; chamado no início da evolução com a
+        população inicial. O relógio de time_limit_s não é zerado.
+        """
+        self._t_evolve = time.monotonic()
+        self._generations = 0
+        self._hv_history = []
+        self._ref = None
+        if objectives_list:
+            self._ref = tuple(
+                max(obj[m] for obj in objectives_list) * 1.1 + 1e-9
+                for m in range(2)
+            )
+
+    def elapsed(self):
+        return time.monotonic() - self._t0
+
+    def time_left(self):
+        """Tempo restante (s) até o limite mais próximo; None se não há limite."""
+        limits = []
+        if self.time_limit_s is not None:
+            limits.append(self.time_limit_s - self.elapsed())
+        if self.deadline is not None:
+            limits.append(self.deadline - time.monotonic())
+        return min(limits) if limits else None
+
+    def deadline_at(self):
+        """Instante (time.monotonic()) do limite de tempo mais próximo; None se não há."""
+        left = self.time_left()
+        return time.monotonic() + left if left is not None else None
+
+    def check(self, objectives_list, fronts, history, evaluations, batch_size):
+        """
+        Chamado ao fim de cada geração. Retorna o motivo da parada (str) ou
+        None para continuar.
+        """
+        self._generations += 1
+        left = self.time_left()
+        mean_generation = (time.monotonic() - self._t_evolve) / self._generations
+        if left is not None and left < mean_generation:
+            return 'tempo_esgotado'
+
+        if self.max_evaluations is not None and evaluations + batch_size > self.max_evaluations:
+            return 'avaliacoes_esgotadas'
+
+        if self.hv_window and self._ref is not None:
+            self._hv_history.append(
+                hypervolume_2d([objectives_list[i] for i in fronts[0]], self._ref)
+            )
+            if len(self._hv_history) > self.hv_window:
+                old = self._hv_history[-1 - self.hv_window]
+                gain = self._hv_history[-1] - old
+                if gain <= self.hv_tol * max(abs(old), 1e-12):
+                    return 'hipervolume_estagnado'
+
+        if self.mean_window and len(history) > self.mean_window:
+            old = history[-1 - self.mean_window][1]
+            new = history[-1][1]
+            if all(abs(n - o) <= self.mean_tol * max(abs(o), 1e-12)
+                   for n, o in zip(new, old)):
+                return 'media_front0_estavel'
+
+        return None
+
 # ==========================================
 # NSGA-II - LOOP PRINCIPAL
 # ==========================================
 
+def front_mean(objectives_list, front):
+    """Média de cada objetivo sobre os indivíduos de uma frente."""
+    vals = [objectives_list[i] for i in front]
+    return tuple(
+        sum(v[j] for v in vals) / len(vals)
+        for j in range(len(vals[0]))
+    )
+
+def compromise_index(objectives_list, front):
+    """Solução de compromisso da frente: menor soma dos objetivos."""
+    return min(front, key=lambda i: sum(objectives_list[i]))
+
+def generation_progress(instancia, population, objectives_list, fronts,
+                        gen, generations, evaluations):
+    """
+    Resumo de uma geração para os callbacks de progresso: médias e tamanho
+    da frente 0 e a solução de compromisso corrente (já decodificada).
+    """
+    best = compromise_index(objectives_list, fronts[0])
+    return {
+        'geracao': gen,
+        'geracoes': generations,
+        'media_front0': front_mean(objectives_list, fronts[0]),
+        'tamanho_front0': len(fronts[0]),
+        'avaliacoes': evaluations,
+        'compromisso': {
+            'objetivos': objectives_list[best],
+            'upae_ids': instancia.decode(population[best].tolist())
+        }
+    }
+
+def truncate_by_crowding(front, objectives_list, n):
+    """
+    Os n indivíduos de maior crowding distance da frente, do mais isolado
+    para o menos (empates na ordem da frente). argpartition acha o limiar
+    sem ordenar a frente inteira; só os n escolhidos são ordenados.
+    """
+    if n <= 0:
+        return []
+    front, cd = _fronts_crowding(objectives_list, [front])
+    if n >= len(front):
+        chosen = np.arange(len(front))
+    else:
+        threshold = cd[np.argpartition(-cd, n - 1)[n - 1]]
+        above = np.nonzero(cd > threshold)[0]
+        tied = np.nonzero(cd == threshold)[0][:n - len(above)]
+        chosen = np.sort(np.concatenate((above, tied)))
+    chosen = chosen[np.argsort(-cd[chosen], kind='stable')]
+    return front[chosen].tolist()
+
+def environmental_selection(objectives_list, size, fronts=None):
+    """
+    Seleção elitista do NSGA-II: preenche `size` vagas frente a frente e
+    desempata a última frente que não cabe inteira pelo crowding distance.
+
+    Os selecionados mantêm o rank que tinham no conjunto original (as frentes
+    anteriores entram inteiras), então as frentes da seleção saem direto daqui,
+    sem nova ordenação não-dominada.
+
+    Retorna (índices selecionados, frentes reindexadas em 0..size-1).
+    """
+    if fronts is None:
+        fronts = fast_nondominated_sort(objectives_list, objectives_list)
+
+    selected = []
+    new_fronts = []
+    for front in fronts:
+        if len(selected) == size:
+            break
+        if len(selected) + len(front) <= size:
+            survivors = front
+        else:
+            survivors = truncate_by_crowding(front, objectives_list, size - len(selected))
+        new_fronts.append(list(range(len(selected), len(selected) + len(survivors))))
+        selected.extend(survivors)
+
+    return selected, new_fronts
+
+def pareto_result(instancia, population, objectives_list, fronts, history):
+    """Monta o dicionário de resultado de run_nsga2 a partir da população final."""
+    pareto_solutions = []
+    for idx in (fronts[0] if fronts else []):
+        chrom = population[idx]
+        pareto_solutions.append({
+            'chromosome': instancia.decode(chrom.tolist()),
+            'objectives': objectives_list[idx],
+            'diagnostics': instancia.diagnostics(chrom)
+        })
+
+    return {
+        'pareto_solutions': pareto_solutions,
+        'population': [instancia.decode(ch) for ch in population.tolist()],
+        'objectives': objectives_list,
+        'fronts': fronts,
+        'history': history
+    }
+
 def run_nsga2(pacientes, upaes, base_ns=None,
               pop_size=120, generations=200,
-              crossover_rate=0.9, mutation_rate=0.3):
+              crossover_rate=0.9, mutation_rate=0.3,
+              evaluator='serial', n_workers=None, stop_criteria=None,
+              on_generation=None, k_nearest=None, warm_start=None, seed=None):
     """
     Executa o NSGA-II para otimização multi-objetivo.
     Retorna as soluções da frente de Pareto.
@@ -623,119 +2142,321 @@ def run_nsga2(pacientes, upaes, base_ns=None,
     - Detecção automática de capacidade (force_allocation)
     - Penalização adaptativa para cenários de escassez
     - Normalização de objetivos por número de pacientes atendidos
+
+    evaluator: backend de avaliação ('serial', 'threads' ou 'processos') ou
+               um objeto com evaluate(population, high_penalty_unalloc) e,
+               opcionalmente, evaluate_sums(population) (sem ele as somas
+               parciais são calculadas no processo principal).
+               A reprodução continua no processo principal (um único fluxo
+               de números aleatórios), então o resultado para uma mesma seed
+               não depende do backend nem de n_workers.
+    stop_criteria: StoppingCriteria (ou dict com seus parâmetros) para parar
+               antes de `generations`. O motivo e a geração da parada vêm em
+               result['parada'].
+    on_generation: callback opcional chamado com um dict de progresso
+               (geracao, geracoes, media_front0, tamanho_front0, avaliacoes e
+               compromisso = objetivos e upae_ids da solução de compromisso
+               corrente): uma vez para a população inicial (geracao = -1) e
+               ao fim de cada geração. Uma exceção no callback interrompe a
+               evolução.
+    k_nearest: K do índice espacial; população inicial e mutação
+               preferem as K UPAEs compatíveis mais próximas de cada paciente
+               (None = todas as compatíveis, como antes).
+    warm_start: True (pesos padrão) ou lista de pesos de viagem w em [0, 1]:
+               a população inicial recebe as atribuições ótimas de
+               w * viagem + (1 - w) * espera (ver atribuicao_otima) e é
+               completada com indivíduos aleatórios viáveis. Os solvers
+               exatos não são interrompidos por prazo (ver
+               run_genetic_algorithm).
+    seed: semente do gerador da execução (random.Random próprio, sem estado
+               global compartilhado entre requisições); None sorteia uma.
+               A semente usada volta em result['seed'].
     """
     if base_ns is None:
         base_ns = BASE_NO_SHOW
+    if seed is None:
+        seed = new_seed()
 
-    # 1) Detecta se há capacidade suficiente por especialidade
-    force_allocation = can_fully_allocate(pacientes, upaes)
-    # Se NÃO há capacidade, vamos usar penalidade forte em pacientes sem vaga
-    high_penalty_unalloc = not force_allocation
+    # Critérios de parada antes do preparo: o relógio já conta a partir daqui
+    if isinstance(stop_criteria, dict):
+        stop_criteria = StoppingCriteria(**stop_criteria)
+
+    # Custos de todos os pares (paciente, UPAE) calculados uma única vez
+    instancia = ProblemInstance(pacientes, upaes, base_ns, k_nearest=k_nearest)
+
+    # 1) Detecta se há capacidade suficiente para todos os pacientes
+    force_allocation = can_fully_allocate(pacientes, upaes, instancia.specialties)
 
     print(f"[NSGA-II] force_allocation = {force_allocation}  "
           f"(capacidade suficiente por especialidade? {'SIM' if force_allocation else 'NÃO'})")
 
-    # 2) População inicial (já viável)
-    population = init_feasible_population(pop_size, pacientes, upaes)
-    history = []
+    if isinstance(evaluator, str):
+        avaliador = make_evaluator(evaluator, instancia, n_workers)
+        owns_evaluator = True
+    else:
+        avaliador = evaluator
+        owns_evaluator = False
+
+    initial_population = warm_start_individuals(instancia, warm_start)
+
+    try:
+        state = evolve_nsga2(
+            instancia, avaliador, pop_size, generations,
+            crossover_rate, mutation_rate, force_allocation,
+            initial_population=initial_population,
+            stop_criteria=stop_criteria, on_generation=on_generation,
+            rng=random.Random(seed)
+        )
+    finally:
+        if owns_evaluator:
+            avaliador.close()
+
+    # 7) Pareto final (objetivos e frentes já conhecidos)
+    result = pareto_result(
+        instancia, state['population'], state['objectives'],
+        state['fronts'], state['history']
+    )
+    result['parada'] = state['parada']
+    result['seed'] = seed
+    return result
 
-    for gen in range(generations):
-        # 3) Avalia população
-        objectives_list = [
-            evaluate_objectives(ch, pacientes, upaes, base_ns, high_penalty_unalloc)
-            for ch in population
-        ]
+def new_seed():
+    """Semente nova para uma execução sem seed informada (32 bits)."""
+    return secrets.randbits(32)
 
-        fronts = fast_nondominated_sort(population, objectives_list)
+def warm_start_individuals(instancia, warm_start):
+    """
+    Indivíduos semeados pelo warm start (matriz int32), ou None se
+    warm_start não estiver ativo. warm_start: True (pesos padrão) ou lista
+    de pesos de viagem.
+    """
+    if not warm_start:
+        return None
+    from atribuicao_otima import WARM_START_WEIGHTS, warm_start_population
+    weights = WARM_START_WEIGHTS if warm_start is True else warm_start
+    return np.array(
+        warm_start_population(instancia, weights), dtype=np.int32
+    ).reshape(-1, instancia.n_patients)
+
+def offspring_sums(instancia, avaliador, population, sums, offspring, parents):
+    """
+    Somas parciais dos filhos por avaliação incremental.
 
-        crowding = {}
-        for front in fronts:
-            cd = crowding_distance(front, objectives_list)
-            crowding.update(cd)
+    parents: (pai1, pai2) de cada filho (índices em population). Cada filho
+    parte das somas do pai com menos genes diferentes e só esses genes são
+    consultados (ProblemInstance.delta_sums). Filhos com mais de
+    DELTA_MAX_CHANGED dos genes alterados são reavaliados por inteiro pelo
+    avaliador, o que também descarta o arredondamento acumulado.
 
-        # média dos objetivos da frente 1 (para histórico)
-        front0 = fronts[0]
-        f0_vals = [objectives_list[i] for i in front0]
-        mean_front0 = tuple(
-            sum(v[j] for v in f0_vals) / len(f0_vals)
-            for j in range(len(f0_vals[0]))
+    Retorna (somas, número de filhos avaliados incrementalmente).
+    """
+    parents = np.asarray(parents, dtype=np.intp).reshape(-1, 2)
+    diff1 = (offspring != population[parents[:, 0]]).sum(axis=1)
+    diff2 = (offspring != population[parents[:, 1]]).sum(axis=1)
+    ref = np.where(diff2 < diff1, parents[:, 1], parents[:, 0])
+    incremental = np.minimum(diff1, diff2) <= DELTA_MAX_CHANGED * instancia.n_patients
+
+    result = np.empty((offspring.shape[0], sums.shape[1]))
+    if incremental.any():
+        rows = ref[incremental]
+        result[incremental] = instancia.delta_sums(
+            sums[rows], population[rows], offspring[incremental]
         )
-        history.append((gen, mean_front0))
-
-        # 4) gerar filhos viáveis
-        offspring = []
-        max_attempts = 5 * pop_size
-        attempts = 0
-
-        while len(offspring) < pop_size and attempts < max_attempts:
-            attempts += 1
-            p1 = mo_tournament_selection(population, fronts, crowding, k=2)
-            p2 = mo_tournament_selection(population, fronts, crowding, k=2)
-            c1, c2 = uniform_crossover(p1, p2, crossover_rate)
-            c1 = mutation(c1, pacientes, upaes, mutation_rate)
-            c2 = mutation(c2, pacientes, upaes, mutation_rate)
-
-            # reparo leve, mas com preenchimento em cenário force_allocation
-            c1 = repair_chromosome(c1, pacientes, upaes, force_allocation)
-            c2 = repair_chromosome(c2, pacientes, upaes, force_allocation)
-
-            if is_feasible(c1, pacientes, upaes, force_allocation):
-                offspring.append(c1)
-            if len(offspring) < pop_size and is_feasible(c2, pacientes, upaes, force_allocation):
-                offspring.append(c2)
-
-        # se não conseguimos filhos suficientes, preenche com cópias
-        while len(offspring) < pop_size:
-            offspring.append(random.choice(population).copy())
-
-        # 5) Seleção elitista
-        combined = population + offspring
-        combined_objs = [
-            evaluate_objectives(ch, pacientes, upaes, base_ns, high_penalty_unalloc)
-            for ch in combined
-        ]
-        combined_fronts = fast_nondominated_sort(combined, combined_objs)
-
-        new_pop = []
-        for front in combined_fronts:
-            if len(new_pop) + len(front) <= pop_size:
-                for idx in front:
-                    new_pop.append(combined[idx])
-            else:
-                cd = crowding_distance(front, combined_objs)
-                sorted_front = sorted(front, key=lambda i: cd[i], reverse=True)
-                remaining = pop_size - len(new_pop)
-                for idx in sorted_front[:remaining]:
-                    new_pop.append(combined[idx])
-                break
-
-        population = new_pop
+    if not incremental.all():
+        evaluate_sums = getattr(avaliador, 'evaluate_sums', instancia.population_sums)
+        result[~incremental] = evaluate_sums(offspring[~incremental])
+    return result, int(incremental.sum())
+
+def evolve_nsga2(instancia, avaliador, pop_size, generations,
+                 crossover_rate, mutation_rate, force_allocation,
+                 initial_population=None, stop_criteria=None,
+                 on_generation=None, rng=None):
+    """
+    Laço principal do NSGA-II no espaço de índices (ver run_nsga2).
+
+    initial_population: matriz int32 opcional para continuar uma evolução
+    (ex.: modelo de ilhas); se tiver menos de pop_size linhas é completada
+    com indivíduos aleatórios viáveis, se tiver mais é truncada pela seleção
+    elitista.
+
+    stop_criteria: StoppingCriteria opcional, verificado ao fim de cada geração.
+    on_generation: callback opcional chamado ao fim de cada geração com o
+    dict de progresso (ver run_nsga2).
+
+    rng: random.Random da execução (None = gerador novo, não reprodutível).
+    Dele sai a seed do numpy.random.Generator dos operadores em lote
+    (tournament_batch, capacity_crossover_batch, mutation_batch), que geram
+    os filhos de uma geração sobre a matriz da população. Os operadores
+    preservam a viabilidade, então cada geração produz exatamente pop_size
+    filhos; feasible_rows confere todos de uma vez e um filho inviável
+    passa pelo reparo, cujo resultado é sempre mantido (com
+    force_allocation o reparo aloca todos, ver augment_allocation). Linhas
+    inviáveis de initial_population são reparadas na entrada.
+
+    Os filhos são avaliados incrementalmente a partir das somas parciais
+    dos pais (ver offspring_sums); a população carrega as suas somas junto
+    com os objetivos.
+
+    Retorna o estado final: population (int32), objectives, fronts, history
+    (por geração: (geração, média da frente 0, {'filhos', 'rejeitados',
+    'clones'}), com os filhos reprovados em feasible_rows, que foram
+    reparados, e os filhos idênticos a um dos pais) e parada (motivo, última geração executada, avaliações, quantas delas
+    foram incrementais e tempo).
+    """
+    t0 = time.monotonic()
+    if rng is None:
+        rng = random.Random()
+    # Gerador NumPy dos operadores em lote, derivado do rng da execução
+    gen_np = np.random.default_rng(rng.getrandbits(64))
+    # Se NÃO há capacidade, vamos usar penalidade forte em pacientes sem vaga
+    high_penalty_unalloc = not force_allocation
+    # Operadores trabalham no espaço de índices (genes = coluna da UPAE)
+    indice = instancia.specialties
+    n_patients = instancia.n_patients
+
+    # 2) População inicial (já viável), como matriz int32 (pop_size, n_pacientes);
+    #    com prazo, a geração para no prazo e a população sai menor
+    deadline = stop_criteria.deadline_at() if stop_criteria is not None else None
+    if initial_population is None:
+        population = np.array(
+            init_feasible_population(pop_size, indice, rng, deadline), dtype=np.int32
+        ).reshape(-1, n_patients)
+    else:
+        # População externa (ex.: warm start, ilhas): linhas inviáveis são
+        # reparadas na entrada, para não ficarem na elite
+        population = np.array(initial_population, dtype=np.int32).reshape(-1, n_patients)
+        for r in np.nonzero(~feasible_rows(population, indice, force_allocation))[0].tolist():
+            population[r] = repair_chromosome(population[r].tolist(), indice, force_allocation)
+        missing = pop_size - population.shape[0]
+        if missing > 0 and not (deadline is not None and time.monotonic() >= deadline):
+            population = np.vstack((population, np.array(
+                init_feasible_population(missing, indice, rng, deadline), dtype=np.int32
+            ).reshape(-1, n_patients)))
+    history = []
 
-    # 6) Pareto final
-    final_objs = [
-        evaluate_objectives(ch, pacientes, upaes, base_ns, high_penalty_unalloc)
-        for ch in population
+    # 3) Avalia a população inicial. Daqui em diante as somas parciais, os
+    #    objetivos, as frentes e o crowding andam junto com os cromossomos:
+    #    só os filhos são avaliados
+    evaluate_sums = getattr(avaliador, 'evaluate_sums', instancia.population_sums)
+    sums = evaluate_sums(population)
+    objectives_list = [
+        tuple(o) for o in
+        instancia.objectives_from_sums(sums, high_penalty_unalloc).tolist()
     ]
-    final_fronts = fast_nondominated_sort(population, final_objs)
-    pareto_indices = final_fronts[0]
+    if population.shape[0] > pop_size:
+        selected, fronts = environmental_selection(objectives_list, pop_size)
+        population = population[selected]
+        sums = sums[selected]
+        objectives_list = [objectives_list[i] for i in selected]
+    else:
+        fronts = fast_nondominated_sort(population, objectives_list)
+    crowding = crowding_distances(objectives_list, fronts)
+
+    evaluations = population.shape[0]
+    incremental_evaluations = 0
+    stop_reason = 'geracoes_completas'
+    last_gen = -1
+    if on_generation is not None:
+        on_generation(generation_progress(
+            instancia, population, objectives_list, fronts, -1, generations, evaluations
+        ))
+    if stop_criteria is not None:
+        stop_criteria.start(objectives_list)
+        left = stop_criteria.time_left()
+        if left is not None and left <= 0 and generations > 0:
+            # Prazo já estourado antes da 1ª geração: devolve a população inicial
+            stop_reason = 'tempo_esgotado'
+            generations = 0
 
-    pareto_solutions = []
-    for idx in pareto_indices:
-        chrom = population[idx]
-        objs = final_objs[idx]
-        diag = diagnostics_for_solution(chrom, pacientes, upaes, base_ns)
-        pareto_solutions.append({
-            'chromosome': chrom,
-            'objectives': objs,
-            'diagnostics': diag
-        })
+    for gen in range(generations):
+        # média dos objetivos da frente 1 (para histórico)
+        mean = front_mean(objectives_list, fronts[0])
+
+        # 4) gerar filhos: torneio, crossover e mutação em lote sobre a
+        #    matriz da população, preservando a viabilidade (sem laço de
+        #    tentativas)
+        n_pairs = (pop_size + 1) // 2
+        rank = front_ranks(fronts, population.shape[0])
+        i1 = tournament_batch(rank, crowding, n_pairs, gen_np)
+        i2 = tournament_batch(rank, crowding, n_pairs, gen_np)
+        c1, c2 = capacity_crossover_batch(population[i1], population[i2], crossover_rate,
+                                          indice, gen_np, force_allocation)
+        # Filhos intercalados (c1, c2 de cada par); o último par pode sobrar
+        offspring = np.empty((2 * n_pairs, n_patients), dtype=np.int32)
+        offspring[0::2] = c1
+        offspring[1::2] = c2
+        parents = np.empty((2 * n_pairs, 2), dtype=np.int64)  # (pai1, pai2) de cada filho
+        parents[0::2, 0], parents[0::2, 1] = i1, i2
+        parents[1::2, 0], parents[1::2, 1] = i2, i1
+        offspring = mutation_batch(offspring[:pop_size], indice, mutation_rate, gen_np,
+                                   force_allocation)
+        parents = parents[:pop_size]
+
+        # Rede de segurança (os operadores preservam a viabilidade): filho
+        # inviável é reparado e o reparado fica (nunca vira cópia do pai)
+        rejected = np.nonzero(~feasible_rows(offspring, indice, force_allocation))[0]
+        for r in rejected.tolist():
+            offspring[r] = repair_chromosome(offspring[r].tolist(), indice, force_allocation)
+        # Diagnóstico: filhos idênticos a um dos pais (sem crossover nem
+        # mutação efetivos)
+        clones = ((offspring == population[parents[:, 0]]).all(axis=1)
+                  | (offspring == population[parents[:, 1]]).all(axis=1))
+        history.append((gen, mean, {
+            'filhos': pop_size,
+            'rejeitados': len(rejected),
+            'clones': int(clones.sum())
+        }))
+
+        # 5) Seleção elitista (pais reaproveitam as somas e os objetivos já
+        #    calculados; filhos partem das somas dos pais)
+        child_sums, n_incremental = offspring_sums(
+            instancia, avaliador, population, sums, offspring, parents
+        )
+        incremental_evaluations += n_incremental
+        combined = np.vstack((population, offspring))
+        combined_sums = np.vstack((sums, child_sums))
+        combined_objs = objectives_list + [
+            tuple(o) for o in
+            instancia.objectives_from_sums(child_sums, high_penalty_unalloc).tolist()
+        ]
+        selected, fronts = environmental_selection(combined_objs, pop_size)
+
+        population = combined[selected]
+        sums = combined_sums[selected]
+        objectives_list = [combined_objs[i] for i in selected]
+        crowding = crowding_distances(objectives_list, fronts)
+
+        evaluations += offspring.shape[0]
+        last_gen = gen
+
+        if on_generation is not None:
+            on_generation(generation_progress(
+                instancia, population, objectives_list, fronts, gen, generations, evaluations
+            ))
+
+        # 6) Parada antecipada
+        if stop_criteria is not None and gen < generations - 1:
+            reason = stop_criteria.check(
+                objectives_list, fronts, history, evaluations, pop_size
+            )
+            if reason is not None:
+                stop_reason = reason
+                break
 
     return {
-        'pareto_solutions': pareto_solutions,
         'population': population,
-        'objectives': final_objs,
-        'fronts': final_fronts,
-        'history': history
+        'objectives': objectives_list,
+        'fronts': fronts,
+        'history': history,
+        'parada': {
+            'motivo': stop_reason,
+            'truncado': stop_reason in StoppingCriteria.BUDGET_REASONS,
+            'geracao': last_gen,
+            'geracoes_executadas': last_gen + 1,
+            'avaliacoes': evaluations,
+            'avaliacoes_incrementais': incremental_evaluations,
+            'tempo_s': time.monotonic() - t0
+        }
     }
 
 # ==========================================
@@ -750,19 +2471,98 @@ def run_genetic_algorithm(
     generations=400,
     crossover_rate=0.7,
     mutation_rate=0.3,
-    elitism=0.15
+    elitism=0.15,
+    evaluator='serial',
+    n_workers=None,
+    islands=None,
+    stop_criteria=None,
+    deadline=None,
+    on_generation=None,
+    k_nearest=None,
+    warm_start=None,
+    modo='nsga2',
+    seed=None
 ):
     """
     Wrapper para compatibilidade retroativa com código existente.
     Executa NSGA-II mas retorna apenas a melhor solução de compromisso.
+
+    islands: dict opcional com os parâmetros de modelo_ilhas.run_island_nsga2
+             (n_islands, migration_interval, migration_rate, topologia, seed);
+             se informado, executa o NSGA-II em modelo de ilhas. As ilhas
+             avaliam nos próprios processos (evaluator é ignorado) e só
+             respeitam o deadline: stop_criteria junto com islands é erro.
+    stop_criteria: critérios de parada antecipada (ver StoppingCriteria);
+             o motivo da parada volta em 'parada'.
+    deadline: prazo absoluto (time.monotonic()) do modo anytime: a evolução
+             para antes de estourá-lo e devolve a melhor frente encontrada,
+             com parada['truncado'] = True. A geração da população inicial
+             também para no prazo (e cada ilha o verifica dentro da época);
+             o modo 'exato' e o warm_start não podem ser interrompidos, então
+             deadline (ou time_limit_s) junto com eles é erro.
+    on_generation: callback de progresso por geração (ver run_nsga2); no
+             modelo de ilhas é chamado ao fim de cada época.
+    k_nearest: K do índice espacial de candidatas (ver run_nsga2).
+    warm_start: população inicial semeada por atribuições ótimas (ver
+             run_nsga2); no modelo de ilhas vai para todas as ilhas.
+    modo: 'nsga2' (padrão) ou 'exato' = referência exata por varredura de
+             pesos (atribuicao_otima.solve_weighted_sum_sweep); no modo
+             exato os parâmetros do GA são ignorados.
+    seed: semente da execução (ver run_nsga2; no modelo de ilhas tem
+             precedência sobre islands['seed']). Volta em 'seed'.
     """
-    res = run_nsga2(
-        pacientes, upaes, base_no_show_dict,
-        pop_size=pop_size,
-        generations=generations,
-        crossover_rate=crossover_rate,
-        mutation_rate=mutation_rate
-    )
+    if modo not in ('nsga2', 'exato'):
+        raise ValueError(f"Modo de otimização desconhecido: {modo}")
+    if islands and stop_criteria is not None:
+        raise ValueError("O modelo de ilhas não aceita stop_criteria; use deadline.")
+    if modo == 'exato' or warm_start:
+        time_limit_s = (stop_criteria.get('time_limit_s') if isinstance(stop_criteria, dict)
+                        else getattr(stop_criteria, 'time_limit_s', None))
+        if deadline is not None or time_limit_s is not None:
+            raise ValueError("O modo exato e o warm_start não respeitam prazo; "
+                             "não informe deadline nem time_limit_s.")
+
+    if deadline is not None and not islands:
+        if stop_criteria is None:
+            stop_criteria = StoppingCriteria(deadline=deadline)
+        elif isinstance(stop_criteria, dict):
+            stop_criteria = StoppingCriteria(**{**stop_criteria, 'deadline': deadline})
+        else:
+            stop_criteria.deadline = deadline
+
+    if modo == 'exato':
+        from atribuicao_otima import solve_weighted_sum_sweep
+        res = solve_weighted_sum_sweep(pacientes, upaes, base_no_show_dict)
+    elif islands:
+        from modelo_ilhas import run_island_nsga2
+        res = run_island_nsga2(
+            pacientes, upaes, base_no_show_dict,
+            pop_size=pop_size,
+            generations=generations,
+            crossover_rate=crossover_rate,
+            mutation_rate=mutation_rate,
+            n_workers=n_workers,
+            deadline=deadline,
+            on_generation=on_generation,
+            k_nearest=k_nearest,
+            warm_start=warm_start,
+            **{**islands, **({'seed': seed} if seed is not None else {})}
+        )
+    else:
+        res = run_nsga2(
+            pacientes, upaes, base_no_show_dict,
+            pop_size=pop_size,
+            generations=generations,
+            crossover_rate=crossover_rate,
+            mutation_rate=mutation_rate,
+            evaluator=evaluator,
+            n_workers=n_workers,
+            stop_criteria=stop_criteria,
+            on_generation=on_generation,
+            k_nearest=k_nearest,
+            warm_start=warm_start,
+            seed=seed
+        )
 
     pareto_solutions = res['pareto_solutions']
 
@@ -773,6 +2573,8 @@ def run_genetic_algorithm(
             'best_fitness': 0.0,
             'best_diag': diagnostics_for_solution([-1] * len(pacientes), pacientes, upaes, base_no_show_dict or BASE_NO_SHOW),
             'history': res['history'],
+            'parada': res['parada'],
+            'seed': res.get('seed'),
             'pareto_solutions': []
         }
 
@@ -788,30 +2590,110 @@ def run_genetic_algorithm(
         'best_fitness': fitness,
         'best_diag': sol_comp['diagnostics'],
         'history': res['history'],
+        'parada': res['parada'],
+        'seed': res.get('seed'),
         'pareto_solutions': pareto_solutions  # NOVO: inclui todas as soluções de Pareto
     }
 
+# ==========================================
+# SOLVER EXATO PARA UM ÚNICO PACIENTE
+# ==========================================
+
+def solve_single_patient_exact(paciente, upaes, base_ns=None):
+    """
+    Resolve EXATAMENTE o problema de um único paciente.
+
+    Com um paciente o espaço de busca é só "cada UPAE compatível, ou -1":
+    enumera as opções, avalia cada uma uma única vez e extrai a frente de
+    Pareto verdadeira. Retorna o mesmo formato de run_nsga2, de modo que
+    quem consome pareto_solutions não percebe a diferença.
+    """
+    if base_ns is None:
+        base_ns = BASE_NO_SHOW
+
+    t0 = time.monotonic()
+    pacientes = [paciente]
+    instancia = ProblemInstance(pacientes, upaes, base_ns)
+    force_allocation = can_fully_allocate(pacientes, upaes, instancia.specialties)
+    high_penalty_unalloc = not force_allocation
+
+    # Candidatos: UPAEs compatíveis (sem ids repetidos) e, se a alocação não
+    # for obrigatória, a opção "sem vaga"
+    candidates = instancia.specialties.compatible_list(0).copy()
+    if not force_allocation:
+        candidates.append(-1)
+
+    population = np.array(candidates, dtype=np.int32).reshape(len(candidates), 1)
+    objectives_list = [
+        tuple(o) for o in
+        instancia.evaluate_population(population, high_penalty_unalloc).tolist()
+    ]
+    fronts = fast_nondominated_sort(population, objectives_list)
+
+    pareto_solutions = []
+    for idx in (fronts[0] if fronts else []):
+        chrom = population[idx]
+        pareto_solutions.append({
+            'chromosome': instancia.decode(chrom.tolist()),
+            'objectives': objectives_list[idx],
+            'diagnostics': instancia.diagnostics(chrom)
+        })
+
+    return {
+        'pareto_solutions': pareto_solutions,
+        'population': [instancia.decode(ch) for ch in population.tolist()],
+        'objectives': objectives_list,
+        'fronts': fronts,
+        'history': [],
+        'parada': {
+            'motivo': 'solucao_exata',
+            'truncado': False,
+            'geracao': -1,
+            'geracoes_executadas': 0,
+            'avaliacoes': len(candidates),
+            'tempo_s': time.monotonic() - t0
+        }
+    }
+
 # ==========================================
 # INTERFACE SIMPLIFICADA PARA API (SINGLE PATIENT)
 # ==========================================
 
-def otimizar_alocacao_paciente(paciente_data, upaes_disponiveis):
+def otimizar_alocacao_paciente(paciente_data, upaes_disponiveis, modo='exato', deadline=None, seed=None):
     """
-    Wrapper para rodar o NSGA-II focado na alocação de um único paciente (entrando via API).
+    Wrapper para a alocação de um único paciente (entrando via API).
     Retorna a melhor opção E múltiplas alternativas do front de Pareto.
+
+    modo:
+      - 'exato' (padrão): enumera as UPAEs compatíveis e extrai a frente de
+        Pareto verdadeira (solve_single_patient_exact)
+      - 'nsga2': executa o NSGA-II completo, como nas versões anteriores
+    deadline: prazo absoluto (time.monotonic()) do modo anytime; só afeta o
+      modo 'nsga2' (o exato é sempre completo).
+    seed: semente do modo 'nsga2' (None sorteia uma); o modo exato é
+      determinístico e devolve seed None.
+
+    A resposta inclui 'parada' (motivo, gerações executadas e truncado) e 'seed'.
     """
-    # Cria lista com único paciente
-    pacientes = [paciente_data]
-
-    # Executa NSGA-II com parâmetros otimizados para velocidade
-    result = run_nsga2(
-        pacientes,
-        upaes_disponiveis,
-        pop_size=50,
-        generations=100,
-        crossover_rate=0.9,
-        mutation_rate=0.3
-    )
+    if modo == 'exato':
+        result = solve_single_patient_exact(paciente_data, upaes_disponiveis)
+    elif modo == 'nsga2':
+        # Cria lista com único paciente
+        pacientes = [paciente_data]
+
+        # Executa NSGA-II com parâmetros otimizados para velocidade
+        result = run_nsga2(
+            pacientes,
+            upaes_disponiveis,
+            pop_size=50,
+            generations=100,
+            crossover_rate=0.9,
+            mutation_rate=0.3,
+            stop_criteria=StoppingCriteria(deadline=deadline) if deadline is not None else None,
+            seed=seed
+        )
+    else:
+        raise ValueError(f"Modo de otimização desconhecido: {modo}")
 
     pareto_solutions = result['pareto_solutions']
 
@@ -932,5 +2814,7 @@ def otimizar_alocacao_paciente(paciente_data, upaes_disponiveis):
         'melhor_opcao': melhor_opcao,
         'alternativas': alternativas,
         'diagnosticos': sol_comp['diagnostics'],
-        'num_solucoes_pareto': len(pareto_solutions)
+        'num_solucoes_pareto': len(pareto_solutions),
+        'parada': result['parada'],
+        'seed': result.get('seed')
     }
@@ -0,0 +1,119 @@
+"""
+Registro de UPAEs do Servidor
+Catálogo de UPAEs carregado de um arquivo JSON ou SQLite na inicialização,
+versionado pelo conteúdo. As requisições podem referenciar uma versão em
+vez de enviar a lista inteira, e os índices derivados (UpaeCatalog) são
+calculados uma única vez por versão.
+
+Formatos aceitos:
+  - JSON: lista de UPAEs, ou {"versao": "rotulo opcional", "upaes": [...]}
+  - SQLite (.db/.sqlite/.sqlite3): tabela upaes(id TEXT, dados TEXT), com o
+    objeto UPAE completo em JSON na coluna dados, na ordem do rowid
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from otimizador_genetico import UpaeCatalog
+
+# Campos obrigatórios de cada UPAE do registro
+UPAE_REQUIRED_FIELDS = ('id', 'especialidades', 'lat', 'lon')
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+def read_upaes_file(path):
+    """Lê as UPAEs de um arquivo JSON ou SQLite. Retorna (upaes, rótulo ou None)."""
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute("SELECT dados FROM upaes ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+        return [json.loads(r[0]) for r in rows], None
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data['upaes'], data.get('versao')
+    return data, None
+
+def validate_upaes(upaes):
+    if not isinstance(upaes, list) or not upaes:
+        raise ValueError("O registro de UPAEs deve ser uma lista não vazia.")
+    for k, u in enumerate(upaes):
+        missing = [c for c in UPAE_REQUIRED_FIELDS if c not in u]
+        if missing:
+            raise ValueError(f"UPAE na posição {k} sem os campos obrigatórios: {missing}")
+
+def content_version(upaes):
+    """Versão = prefixo do SHA-256 do conteúdo canônico das UPAEs."""
+    texto = json.dumps(upaes, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+class UpaeRegistry:
+    """
+    Registro versionado de UPAEs.
+
+    Cada carga com conteúdo novo vira uma versão (UpaeCatalog com os
+    índices já calculados); recarregar um arquivo inalterado não cria
+    versão nova. As últimas max_versions versões ficam disponíveis, para
+    clientes que ainda referenciam uma versão anterior.
+    """
+
+    def __init__(self, path=None, max_versions=5):
+        self.path = path
+        self.max_versions = max_versions
+        self._versions = OrderedDict()   # versao -> (UpaeCatalog, metadados)
+        self._current = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """(Re)carrega o arquivo e retorna os metadados da versão atual."""
+        if not self.path:
+            raise ValueError("Nenhum arquivo de registro de UPAEs configurado.")
+        upaes, rotulo = read_upaes_file(self.path)
+        validate_upaes(upaes)
+        versao = content_version(upaes)
+
+        with self._lock:
+            if versao not in self._versions:
+                # Se a construção falhar, a versão atual continua valendo
+                catalogo = UpaeCatalog(upaes, versao=versao)
+                self._versions[versao] = (catalogo, {
+                    'versao': versao,
+                    'rotulo': rotulo,
+                    'origem': os.path.abspath(self.path),
+                    'carregado_em': time.time(),
+                    'n_upaes': len(catalogo)
+                })
+            self._versions.move_to_end(versao)
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+            self._current = versao
+            return dict(self._versions[versao][1])
+
+    reload = load
+
+    def get(self, versao=None):
+        """
+        Catálogo de uma versão (None ou 'atual' = versão atual).
+        Levanta KeyError se a versão não existir (ou já tiver sido descartada).
+        """
+        with self._lock:
+            if versao in (None, 'atual'):
+                versao = self._current
+            if versao is None or versao not in self._versions:
+                raise KeyError(versao)
+            return self._versions[versao][0]
+
+    def info(self):
+        with self._lock:
+            return {
+                'versao_atual': self._current,
+                'versoes': [dict(meta) for _, meta in reversed(self._versions.values())]
+            }
@@ -0,0 +1,12 @@
+"""
+Configuração dos testes: os módulos do algoritmo são importados pelo nome
+(layout plano, como o api_server faz), a partir do diretório pai.
+
+Uso (em algoritmo/):
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,107 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from atribuicao_otima import optimal_assignment
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import (
+    ProblemInstance,
+    SpecialtyIndex,
+    augment_allocation,
+    can_fully_allocate,
+    init_feasible_population,
+    is_feasible,
+    repair_chromosome,
+    run_nsga2,
+)
+
+def paciente(i, especialidade):
+    return {'id': f'p{i}', 'especialidade': especialidade, 'lat': -8.0, 'lon': -35.0}
+
+def upae(j, especialidades, **extra):
+    return {'id': f'u{j}', 'nome': f'UPAE {j}', 'especialidades': especialidades,
+            'lat': -8.0 - 0.01 * j, 'lon': -35.0, 'tempo_espera_dias': 5, **extra}
+
+# Uma vaga compartilhada (padrão) por UPAE, disputada pelas duas especialidades
+UPAES_COMPARTILHADAS = [upae(j, ['Cardiologia', 'Neurologia']) for j in range(4)]
+
+def test_vaga_compartilhada_conta_uma_vez():
+    # Por especialidade sobram vagas (4 >= 3), mas 6 pacientes não cabem em 4 vagas
+    pacientes = [paciente(i, 'Cardiologia') for i in range(3)] + \
+                [paciente(i + 3, 'Neurologia') for i in range(3)]
+    assert not can_fully_allocate(pacientes, UPAES_COMPARTILHADAS)
+    assert can_fully_allocate(pacientes[:2] + pacientes[3:5], UPAES_COMPARTILHADAS)
+
+def test_caminho_aumentante_realoca_paciente():
+    # O cardiologista ocupa a única UPAE da neurologia; trocá-lo de UPAE libera a vaga
+    pacientes = [paciente(0, 'Cardiologia'), paciente(1, 'Neurologia')]
+    upaes = [upae(0, ['Cardiologia', 'Neurologia']), upae(1, ['Cardiologia'])]
+    indice = SpecialtyIndex(pacientes, upaes)
+    assert augment_allocation([0, -1], indice) == [1, 0]
+    assert repair_chromosome([0, -1], indice, force_allocation=True) == [1, 0]
+    assert can_fully_allocate(pacientes, upaes)
+
+@pytest.mark.parametrize('vagas', [None, 2, {'Cardiologia': 1, 'Neurologia': 1}])
+def test_populacao_inicial_atende_o_maximo(vagas):
+    pacientes, upaes = gerar_instancia(120, 70, seed=3)
+    if vagas is not None:
+        upaes = [{**u, 'vagas': vagas} for u in upaes]
+    instancia = ProblemInstance(pacientes, upaes)
+    maximo = int((np.asarray(optimal_assignment(instancia, 0.5)) >= 0).sum())
+    for chrom in init_feasible_population(10, instancia.specialties):
+        assert is_feasible(chrom, instancia.specialties)
+        assert sum(j != -1 for j in chrom) == maximo
+
+def test_nsga2_atende_todos_quando_ha_alocacao_completa():
+    pacientes, upaes = gerar_instancia(300, 300, seed=0)
+    assert can_fully_allocate(pacientes, upaes)
+    res = run_nsga2(pacientes, upaes, pop_size=60, generations=40, seed=1)
+    for individuo in res['population']:
+        assert -1 not in individuo
+
+def existe_alocacao_completa(indice, n_pacientes, n_upaes):
+    """Força bruta: algum cromossomo sem -1 respeita compatibilidade e capacidades?"""
+    return any(is_feasible(list(c), indice, force_allocation=True)
+               for c in itertools.product(range(n_upaes), repeat=n_pacientes))
+
+def instancia_pequena(seed):
+    """Poucas especialidades e UPAEs: vagas compartilhadas disputadas com frequência."""
+    rng = random.Random(seed)
+    especialidades = ['Cardiologia', 'Neurologia', 'Ortopedia']
+    pacientes = [paciente(i, rng.choice(especialidades)) for i in range(rng.randint(1, 6))]
+    upaes = []
+    for j in range(rng.randint(1, 4)):
+        extra = rng.choice([{}, {'vagas': rng.randint(0, 2)},
+                            {'vagas': {e: rng.randint(0, 2) for e in especialidades}}])
+        upaes.append(upae(j, rng.sample(especialidades, rng.randint(1, 3)), **extra))
+    return pacientes, upaes
+
+@pytest.mark.parametrize('seed', range(150))
+def test_can_fully_allocate_igual_a_forca_bruta(seed):
+    pacientes, upaes = instancia_pequena(seed)
+    instancia = ProblemInstance(pacientes, upaes)
+    esperado = existe_alocacao_completa(instancia.specialties, len(pacientes), len(upaes))
+    assert can_fully_allocate(pacientes, upaes) == esperado
+    assert can_fully_allocate(pacientes, upaes, instancia.specialties) == esperado
+
+def test_can_fully_allocate_sem_pacientes_ou_sem_upaes():
+    assert can_fully_allocate([], [upae(0, ['Cardiologia'])])
+    assert can_fully_allocate([], [])
+    assert not can_fully_allocate([paciente(0, 'Cardiologia')], [])
+    assert not can_fully_allocate([paciente(0, 'Cardiologia')], [upae(0, ['Cardiologia'], vagas=0)])
+
+@pytest.mark.parametrize('k_nearest', [None, 2])
+def test_avaliacao_da_populacao_aceita_listas_e_linha_unica(k_nearest):
+    pacientes, upaes = gerar_instancia(20, 10, seed=1)
+    instancia = ProblemInstance(pacientes, upaes, k_nearest=k_nearest)
+    pop = np.array(init_feasible_population(8, instancia.specialties, random.Random(0)),
+                   dtype=np.int32)
+    # Com o índice espacial, pares fora das K vizinhas são calculados sob demanda
+    pop[:, 0] = np.arange(8) % instancia.n_upaes
+    esperado = ProblemInstance(pacientes, upaes).evaluate_population(pop)
+    assert (instancia.evaluate_population(pop) == esperado).all()
+    assert (instancia.evaluate_population(pop.tolist()) == esperado).all()
+    assert (instancia.evaluate_population(pop.astype(np.int64)) == esperado).all()
+    assert (instancia.evaluate_population(pop[3]) == esperado[3:4]).all()
@@ -0,0 +1,162 @@
+import json
+import time
+
+import pytest
+
+import api_server
+
+PACIENTES = [
+    {'id': f'p{i}', 'especialidade': 'Cardiologia', 'lat': -8.05 + 0.01 * i, 'lon': -34.9}
+    for i in range(3)
+]
+UPAES = [
+    {'id': f'u{j}', 'nome': f'UPAE {j}', 'especialidades': ['Cardiologia'],
+     'lat': -8.0 - 0.02 * j, 'lon': -34.95, 'tempo_espera_dias': 10 + j,
+     'transport_score': 0.5}
+    for j in range(4)
+]
+
+@pytest.fixture
+def client():
+    api_server.app.config['TESTING'] = True
+    with api_server.app.test_client() as c:
+        yield c
+
+def lote(client, **extra):
+    corpo = {'pacientes': PACIENTES, 'upaes': UPAES, 'seed': 1, **extra}
+    return client.post('/api/otimizar-lote', json=corpo)
+
+@pytest.mark.parametrize('parada', [
+    {'janela': 3},
+    {'hv_window': 'dez'},
+    {'hv_window': 0},
+    {'time_limit_s': 0},
+    {'max_evaluations': 2.5},
+    {'deadline': 1.0},
+    [1, 2],
+])
+def test_parada_invalida_retorna_400(client, parada):
+    resposta = lote(client, parada=parada)
+    assert resposta.status_code == 400
+    assert 'parada' in resposta.get_json()['erro']
+
+def test_parada_valida_e_aplicada(client):
+    resposta = lote(client, parada={'max_evaluations': 600, 'hv_window': None})
+    assert resposta.status_code == 200
+    parada = resposta.get_json()['estatisticas']['parada']
+    assert parada['motivo'] == 'avaliacoes_esgotadas'
+
+@pytest.mark.parametrize('ilhas', [
+    {'n_ilhas': 4},
+    {'n_islands': 0},
+    {'n_islands': '4'},
+    {'migration_rate': 1.5},
+    {'migration_interval': 2.5},
+    {'topologia': 'estrela'},
+    'quatro',
+])
+def test_ilhas_invalidas_retornam_400(client, ilhas):
+    resposta = lote(client, ilhas=ilhas)
+    assert resposta.status_code == 400
+    assert 'ilhas' in resposta.get_json()['erro']
+
+def test_ilhas_com_parada_retorna_400(client):
+    resposta = lote(client, ilhas={'n_islands': 2}, parada={'max_evaluations': 600})
+    assert resposta.status_code == 400
+
+def test_ilhas_com_avaliador_paralelo_retorna_400(client):
+    resposta = lote(client, ilhas={'n_islands': 2}, avaliador='threads')
+    assert resposta.status_code == 400
+
+@pytest.mark.parametrize('extra', [
+    {'modo': 'exato', 'time_budget_ms': 500},
+    {'modo': 'exato', 'parada': {'time_limit_s': 1}},
+    {'warm_start': True, 'time_budget_ms': 500},
+])
+def test_prazo_em_modo_nao_interrompivel_retorna_400(client, extra):
+    resposta = lote(client, **extra)
+    assert resposta.status_code == 400
+    assert 'prazo' in resposta.get_json()['erro']
+
+@pytest.mark.parametrize('rota', ['/api/otimizar-lote', '/api/otimizar-lote/stream'])
+@pytest.mark.parametrize('n_workers', ['x', 0, -2, 1.5, True])
+def test_n_workers_invalido_retorna_400(client, rota, n_workers):
+    corpo = {'pacientes': PACIENTES, 'upaes': UPAES, 'seed': 1,
+             'avaliador': 'threads', 'n_workers': n_workers}
+    resposta = client.post(rota, json=corpo)
+    assert resposta.status_code == 400
+    assert 'n_workers' in resposta.get_json()['erro']
+
+def test_n_workers_nao_muda_o_resultado(client):
+    serial = lote(client).get_json()
+    api_server.cache_resultados.clear()
+    threads = lote(client, avaliador='threads', n_workers=2).get_json()
+    assert threads['sucesso']
+    assert threads['alocacoes'] == serial['alocacoes']
+
+@pytest.mark.parametrize('extra,cacheado', [
+    ({'seed': None}, False),
+    ({'seed': 5}, True),
+    ({'seed': None, 'modo': 'exato'}, True),
+    ({'seed': None, 'ilhas': {'n_islands': 2, 'seed': 5}}, True),
+])
+def test_lote_sem_seed_nao_usa_cache(client, extra, cacheado):
+    api_server.cache_resultados.clear()
+    lote(client, **extra)
+    segunda = lote(client, **extra).get_json()['estatisticas']
+    assert (segunda['cache'] == 'acerto') == cacheado
+
+@pytest.mark.parametrize('seed,cacheado', [(None, False), (5, True)])
+def test_paciente_nsga2_sem_seed_nao_usa_cache(client, seed, cacheado):
+    api_server.cache_resultados.clear()
+    corpo = {'paciente': PACIENTES[0], 'upaes': UPAES, 'modo': 'nsga2', 'seed': seed}
+    client.post('/api/otimizar', json=corpo)
+    resposta = client.post('/api/otimizar', json=corpo)
+    assert resposta.headers['X-Cache'] == ('HIT' if cacheado else 'MISS')
+
+def eventos_sse(texto):
+    eventos = []
+    for bloco in texto.strip().split('\n\n'):
+        linhas = dict(linha.split(': ', 1) for linha in bloco.split('\n'))
+        eventos.append((linhas['event'], json.loads(linhas['data'])))
+    return eventos
+
+def test_stream_envia_progresso_e_o_mesmo_resultado_do_lote(client):
+    api_server.cache_resultados.clear()
+    corpo = {'pacientes': PACIENTES, 'upaes': UPAES, 'seed': 4}
+    resposta = client.post('/api/otimizar-lote/stream', json=corpo)
+    assert resposta.mimetype == 'text/event-stream'
+    eventos = eventos_sse(resposta.get_data(as_text=True))
+
+    nomes = [nome for nome, _ in eventos]
+    assert nomes[-1] == 'resultado' and 'erro' not in nomes
+    geracoes = [dados['geracao'] for nome, dados in eventos if nome == 'geracao']
+    assert geracoes == sorted(geracoes) and geracoes[0] == -1
+    # Compromisso só quando a solução muda; o primeiro vem da população inicial
+    compromissos = [dados for nome, dados in eventos if nome == 'compromisso']
+    assert compromissos[0]['geracao'] == -1
+    assert all(a['objetivos'] != b['objetivos'] for a, b in zip(compromissos, compromissos[1:]))
+
+    api_server.cache_resultados.clear()
+    sincrono = client.post('/api/otimizar-lote', json=corpo).get_json()
+    assert eventos[-1][1]['alocacoes'] == sincrono['alocacoes']
+
+def test_job_assincrono_conclui_com_o_resultado_do_lote(client):
+    api_server.cache_resultados.clear()
+    corpo = {'pacientes': PACIENTES, 'upaes': UPAES, 'seed': 4}
+    resposta = client.post('/api/otimizar-lote', json={**corpo, 'assincrono': True})
+    assert resposta.status_code == 202
+    url = resposta.get_json()['url']
+    for _ in range(200):
+        job = client.get(url).get_json()
+        if job['status'] in ('concluido', 'erro'):
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'concluido'
+    assert job['progresso']['geracao'] == job['resultado']['estatisticas']['parada']['geracao']
+    api_server.cache_resultados.clear()
+    assert job['resultado']['alocacoes'] == \
+        client.post('/api/otimizar-lote', json=corpo).get_json()['alocacoes']
+
+def test_job_inexistente_retorna_404(client):
+    assert client.get('/api/jobs/nao-existe').status_code == 404
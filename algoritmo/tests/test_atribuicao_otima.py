@@ -0,0 +1,169 @@
+import contextlib
+import io
+import itertools
+
+import numpy as np
+import pytest
+
+import atribuicao_otima
+from atribuicao_otima import (
+    optimal_assignment,
+    solve_weighted_sum_sweep,
+    solve_capacitated_assignment,
+    warm_start_population,
+)
+from benchmark_exato import ESPECIALIDADES, gerar_instancia
+from otimizador_genetico import ProblemInstance, can_fully_allocate, feasible_rows, run_nsga2
+
+def forca_bruta(cost, capacity):
+    """(máximo de linhas atribuídas, menor custo com esse número) por enumeração."""
+    n_rows, n_cols = cost.shape
+    melhor = (-1, np.inf)
+    for cols in itertools.product(range(-1, n_cols), repeat=n_rows):
+        usadas = [c for c in cols if c >= 0]
+        if any(usadas.count(c) > capacity[c] for c in set(usadas)):
+            continue
+        custo = sum(cost[r, c] for r, c in enumerate(cols) if c >= 0)
+        if np.isfinite(custo) and (len(usadas), -custo) > (melhor[0], -melhor[1]):
+            melhor = (len(usadas), custo)
+    return melhor
+
+def valor(cost, cols):
+    return (int((cols >= 0).sum()),
+            sum(cost[r, c] for r, c in enumerate(cols.tolist()) if c >= 0))
+
+def caso(seed):
+    rng = np.random.default_rng(seed)
+    n_rows, n_cols = rng.integers(1, 6), rng.integers(1, 4)
+    # Custos inteiros pequenos: muitos empates
+    cost = rng.integers(0, 5, size=(n_rows, n_cols)).astype(float)
+    cost[rng.random((n_rows, n_cols)) < 0.3] = np.inf
+    capacity = rng.integers(0, 3, size=n_cols)
+    return cost, capacity
+
+@pytest.fixture(params=['scipy', 'caminhos'])
+def solver(request, monkeypatch):
+    if request.param == 'scipy':
+        pytest.importorskip('scipy')
+    else:
+        monkeypatch.setattr(atribuicao_otima, 'linear_sum_assignment', None)
+    return solve_capacitated_assignment
+
+@pytest.mark.parametrize('seed', range(60))
+def test_solver_igual_a_forca_bruta(solver, seed):
+    cost, capacity = caso(seed)
+    cols = solver(cost, capacity)
+    usadas = cols[cols >= 0]
+    assert (np.bincount(usadas, minlength=len(capacity)) <= capacity).all()
+    assert np.isfinite(cost[np.flatnonzero(cols >= 0), usadas]).all()
+    n, custo = valor(cost, cols)
+    esperado = forca_bruta(cost, capacity)
+    assert n == esperado[0]
+    assert custo == pytest.approx(esperado[1])
+
+def test_caminhos_igual_a_scipy_em_matriz_maior(monkeypatch):
+    pytest.importorskip('scipy')
+    rng = np.random.default_rng(0)
+    cost = rng.random((40, 12))
+    cost[rng.random(cost.shape) < 0.2] = np.inf
+    capacity = rng.integers(1, 5, size=12)
+    scipy_cols = solve_capacitated_assignment(cost, capacity)
+    monkeypatch.setattr(atribuicao_otima, 'linear_sum_assignment', None)
+    caminhos_cols = solve_capacitated_assignment(cost, capacity)
+    assert valor(cost, caminhos_cols)[0] == valor(cost, scipy_cols)[0]
+    assert valor(cost, caminhos_cols)[1] == pytest.approx(valor(cost, scipy_cols)[1])
+
+def test_sem_colunas_ou_sem_linhas(solver):
+    assert solver(np.zeros((0, 3)), [1, 1, 1]).tolist() == []
+    assert solver(np.zeros((3, 0)), []).tolist() == [-1, -1, -1]
+    assert solver(np.full((2, 2), np.inf), [1, 1]).tolist() == [-1, -1]
+
+# Instâncias pequenas para enumerar todos os cromossomos: vagas padrão (1
+# compartilhada), por especialidade e com menos vagas que pacientes
+VAGAS = [None, {'Cardiologia': 2, 'Ortopedia': 1, 'Neurologia': 1}, 0]
+
+def pequena(vagas, seed):
+    pacientes, upaes = gerar_instancia(5, 4, seed=seed)
+    if vagas is not None:
+        upaes = [{**u, 'vagas': vagas} for u in upaes]
+    upaes[0] = {**upaes[0], 'vagas': 1}
+    return pacientes, upaes
+
+def todos_viaveis(instancia):
+    n, m = instancia.n_patients, len(instancia.upaes)
+    pop = np.array(list(itertools.product(range(-1, m), repeat=n)), dtype=np.int32)
+    return pop[feasible_rows(pop, instancia.specialties)]
+
+def custo_ponderado(instancia, pop, w):
+    linhas = np.arange(instancia.n_patients)
+    alocado = pop >= 0
+    genes = np.where(alocado, pop, 0)
+    custo = w * instancia.travel_cost[linhas, genes] + (1 - w) * instancia.wait_cost[genes]
+    return np.where(alocado, custo, 0.0).sum(axis=1)
+
+@pytest.mark.parametrize('vagas', VAGAS)
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('w', [0.0, 0.3, 1.0])
+def test_atribuicao_otima_atende_o_maximo_com_menor_custo(vagas, seed, w):
+    pacientes, upaes = pequena(vagas, seed)
+    instancia = ProblemInstance(pacientes, upaes)
+    viaveis = todos_viaveis(instancia)
+    atendidos = (viaveis >= 0).sum(axis=1)
+    maximos = viaveis[atendidos == atendidos.max()]
+
+    genes = optimal_assignment(instancia, w)
+    assert feasible_rows(genes[None, :], instancia.specialties).all()
+    # Atendimento parcial: o máximo possível de pacientes
+    assert (genes >= 0).sum() == atendidos.max()
+    assert (atendidos.max() == instancia.n_patients) == \
+        can_fully_allocate(pacientes, upaes, instancia.specialties)
+    assert custo_ponderado(instancia, genes[None, :], w)[0] == \
+        pytest.approx(custo_ponderado(instancia, maximos, w).min())
+
+@pytest.mark.parametrize('vagas', VAGAS)
+def test_warm_start_semeia_individuos_viaveis_e_distintos(vagas):
+    pacientes, upaes = pequena(vagas, 0)
+    instancia = ProblemInstance(pacientes, upaes)
+    force = can_fully_allocate(pacientes, upaes, instancia.specialties)
+    pop = np.array(warm_start_population(instancia), dtype=np.int32)
+    assert len({tuple(r) for r in pop.tolist()}) == len(pop)
+    assert feasible_rows(pop, instancia.specialties, force).all()
+
+@pytest.mark.parametrize('seed', range(3))
+def test_warm_start_mantem_os_extremos_na_frente(seed):
+    pacientes, upaes = gerar_instancia(12, 6, seed=seed)
+    instancia = ProblemInstance(pacientes, upaes)
+    force = can_fully_allocate(pacientes, upaes, instancia.specialties)
+    semeados = instancia.evaluate_population(
+        np.array(warm_start_population(instancia, [1.0, 0.0]), dtype=np.int32), not force)
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = run_nsga2(pacientes, upaes, pop_size=20, generations=5,
+                        warm_start=True, seed=seed)
+    frente = np.array([s['objectives'] for s in res['pareto_solutions']])
+    # O elitismo não perde os ótimos de cada objetivo semeados no início
+    assert frente[:, 0].min() <= semeados[:, 0].min() + 1e-9
+    assert frente[:, 1].min() <= semeados[:, 1].min() + 1e-9
+
+@pytest.mark.parametrize('vagas', [2, {esp: 1 for esp in ESPECIALIDADES}])
+@pytest.mark.parametrize('seed', range(3))
+def test_varredura_nao_e_dominada_por_nenhum_cromossomo(vagas, seed):
+    # Todas as UPAEs atendem todas as especialidades: todos os pacientes
+    # podem ser atendidos e a soma ponderada é linear nos objetivos
+    pacientes, upaes = gerar_instancia(5, 4, seed=seed)
+    upaes = [{**u, 'especialidades': list(ESPECIALIDADES), 'vagas': vagas} for u in upaes]
+    assert can_fully_allocate(pacientes, upaes)
+    instancia = ProblemInstance(pacientes, upaes)
+    viaveis = todos_viaveis(instancia)
+    completos = viaveis[(viaveis >= 0).all(axis=1)]
+    todos = instancia.evaluate_population(completos)
+
+    res = solve_weighted_sum_sweep(pacientes, upaes, n_weights=7)
+    assert res['parada']['motivo'] == 'soma_ponderada_exata'
+    assert len(res['pesos']) == len(res['population'])
+    for sol in res['pareto_solutions']:
+        o = np.array(sol['objectives'])
+        dominam = (todos <= o + 1e-9).all(axis=1) & (todos < o - 1e-9).any(axis=1)
+        assert not dominam.any()
+    # Os extremos da varredura são os ótimos de cada objetivo
+    frente = np.array([s['objectives'] for s in res['pareto_solutions']])
+    assert frente.min(axis=0) == pytest.approx(todos.min(axis=0))
@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmark_exato import ESPECIALIDADES, gerar_instancia
+from otimizador_genetico import (
+    DELTA_MAX_CHANGED,
+    TH_NS,
+    ProblemInstance,
+    SerialEvaluator,
+    can_fully_allocate,
+    evaluate_objectives,
+    evolve_nsga2,
+    init_feasible_population,
+    offspring_sums,
+)
+
+def cromossomos(instancia, n, seed):
+    """Viáveis (população inicial) e inviáveis (genes sorteados, com -1 e UPAEs repetidas)."""
+    rng = random.Random(seed)
+    viaveis = init_feasible_population(n, instancia.specialties, rng)
+    inviaveis = [[rng.randrange(-1, instancia.n_upaes) for _ in range(instancia.n_patients)]
+                 for _ in range(n)]
+    inviaveis.append([-1] * instancia.n_patients)
+    return np.array(viaveis + inviaveis, dtype=np.int32)
+
+# Base de no-show alta faz a soft constraint de no-show valer em parte dos cromossomos
+@pytest.mark.parametrize('base_ns', [None, {esp.lower(): 0.95 for esp in ESPECIALIDADES}])
+@pytest.mark.parametrize('high_penalty_unalloc', [False, True])
+def test_vetorizado_incremental_e_escalar_iguais(base_ns, high_penalty_unalloc):
+    pacientes, upaes = gerar_instancia(25, 12, seed=4)
+    instancia = ProblemInstance(pacientes, upaes, base_ns)
+    pop = cromossomos(instancia, 10, seed=5)
+
+    escalar = np.array([
+        evaluate_objectives(instancia.decode(c), pacientes, upaes,
+                            instancia.base_no_show_dict, high_penalty_unalloc)
+        for c in pop.tolist()
+    ])
+    vetorizado = instancia.evaluate_population(pop, high_penalty_unalloc)
+    assert np.allclose(vetorizado, escalar, rtol=1e-12, atol=1e-12)
+    for c, esperado in zip(pop.tolist(), escalar):
+        assert instancia.evaluate(instancia.decode(c), high_penalty_unalloc) == \
+            pytest.approx(tuple(esperado), rel=1e-12, abs=1e-12)
+
+    # Incremental: cada filho parte das somas de outro cromossomo da lista
+    pais = np.roll(pop, 1, axis=0)
+    somas = instancia.delta_sums(instancia.population_sums(pais), pais, pop)
+    assert np.allclose(somas, instancia.population_sums(pop), rtol=1e-9, atol=1e-12)
+    incremental = instancia.objectives_from_sums(somas, high_penalty_unalloc)
+    assert np.allclose(incremental, escalar, rtol=1e-9, atol=1e-12)
+
+    if base_ns is not None:
+        # A soft constraint de no-show foi exercitada
+        sums = instancia.population_sums(pop)
+        assert (sums[:, 2] > TH_NS * sums[:, 3]).any()
+
+def test_somas_dos_filhos_iguais_a_avaliacao_completa():
+    pacientes, upaes = gerar_instancia(40, 15, seed=2)
+    instancia = ProblemInstance(pacientes, upaes)
+    pop = cromossomos(instancia, 10, seed=3)
+    sums = instancia.population_sums(pop)
+    gen = np.random.default_rng(0)
+    parents = gen.integers(0, len(pop), size=(30, 2))
+    # Filhos com poucas e com muitas mudanças em relação ao pai mais próximo
+    filhos = pop[parents[:, 0]].copy()
+    for k, n_mudancas in enumerate(gen.integers(0, instancia.n_patients, size=30)):
+        genes = gen.choice(instancia.n_patients, n_mudancas, replace=False)
+        filhos[k, genes] = gen.integers(-1, instancia.n_upaes, size=n_mudancas)
+
+    resultado, n_incrementais = offspring_sums(
+        instancia, SerialEvaluator(instancia), pop, sums, filhos, parents)
+    assert np.allclose(resultado, instancia.population_sums(filhos), rtol=1e-12, atol=1e-12)
+    mudancas = np.minimum((filhos != pop[parents[:, 0]]).sum(axis=1),
+                          (filhos != pop[parents[:, 1]]).sum(axis=1))
+    assert n_incrementais == int((mudancas <= DELTA_MAX_CHANGED * instancia.n_patients).sum())
+    assert 0 < n_incrementais < len(filhos)
+
+class AvaliadorSemSomas:
+    """Avaliador externo sem evaluate_sums: as somas vêm da instância."""
+
+    def __init__(self, instancia):
+        self.instancia = instancia
+
+    def evaluate(self, population, high_penalty_unalloc=False):
+        return self.instancia.evaluate_population(population, high_penalty_unalloc)
+
+@pytest.mark.parametrize('avaliador', [SerialEvaluator, AvaliadorSemSomas])
+def test_objetivos_da_evolucao_iguais_a_reavaliacao(avaliador):
+    pacientes, upaes = gerar_instancia(30, 12, seed=6)
+    instancia = ProblemInstance(pacientes, upaes)
+    force = can_fully_allocate(pacientes, upaes, instancia.specialties)
+    estado = evolve_nsga2(instancia, avaliador(instancia), 20, 15, 0.9, 0.3, force,
+                          rng=random.Random(2))
+    reavaliados = instancia.evaluate_population(estado['population'], not force)
+    assert np.allclose(estado['objectives'], reavaliados, rtol=1e-9, atol=1e-9)
+    assert estado['parada']['avaliacoes_incrementais'] > 0
@@ -0,0 +1,24 @@
+from cache_resultados import ResultCache, instance_key
+
+PACIENTE = {'id': 'p0', 'nome': 'Ana', 'especialidade': 'Cardiologia', 'lat': -8.05, 'lon': -34.9}
+UPAE = {'id': 'u0', 'nome': 'UPAE 0', 'especialidades': ['Cardiologia'], 'lat': -8.0, 'lon': -35.0}
+
+def chave(paciente=PACIENTE, upae=UPAE, params=None):
+    return instance_key('lote', [paciente], [upae], {'cardiologia': 0.2}, params or {'modo': 'nsga2'})
+
+def test_chave_ignora_ruido_e_campos_irrelevantes():
+    ruido = {**PACIENTE, 'nome': 'Outra', 'lat': -8.05000001}
+    assert chave(ruido) == chave()
+
+def test_chave_muda_com_parametros_e_upaes():
+    assert chave(params={'modo': 'exato'}) != chave()
+    assert chave(upae={**UPAE, 'vagas': 2}) != chave()
+    assert instance_key('paciente', [PACIENTE], [UPAE], {}, {}) != \
+        instance_key('lote', [PACIENTE], [UPAE], {}, {})
+
+def test_resultado_expira_pelo_ttl():
+    cache = ResultCache(ttl_s=0)
+    cache.put('k', 1)
+    assert cache.get('k') is None
+    valor, acerto = ResultCache().get_or_compute('k', lambda: 2)
+    assert (valor, acerto) == (2, False)
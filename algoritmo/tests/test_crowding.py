@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+
+from otimizador_genetico import (
+    crowding_distance,
+    crowding_distances,
+    environmental_selection,
+    fast_nondominated_sort,
+    truncate_by_crowding,
+)
+
+def crowding_referencia(front, objectives_list):
+    """Cálculo frente a frente, com sorted estável por objetivo."""
+    distance = {i: 0.0 for i in front}
+    if not front:
+        return distance
+    for m in range(len(objectives_list[0])):
+        front_sorted = sorted(front, key=lambda i: objectives_list[i][m])
+        f_min = objectives_list[front_sorted[0]][m]
+        f_max = objectives_list[front_sorted[-1]][m]
+        if f_max == f_min:
+            continue
+        distance[front_sorted[0]] = float('inf')
+        distance[front_sorted[-1]] = float('inf')
+        for k in range(1, len(front_sorted) - 1):
+            distance[front_sorted[k]] += (
+                objectives_list[front_sorted[k + 1]][m]
+                - objectives_list[front_sorted[k - 1]][m]
+            ) / (f_max - f_min)
+    return distance
+
+def selecao_referencia(objectives_list, size):
+    fronts = fast_nondominated_sort(objectives_list, objectives_list)
+    selected = []
+    for front in fronts:
+        if len(selected) + len(front) <= size:
+            selected.extend(front)
+        else:
+            cd = crowding_referencia(front, objectives_list)
+            selected.extend(sorted(front, key=lambda i: cd[i], reverse=True)[:size - len(selected)])
+            break
+    return selected
+
+def pontos(n, n_obj, valores, seed):
+    """Objetivos com poucos valores distintos: empates, repetidos e frentes constantes."""
+    rng = random.Random(seed)
+    return [tuple(rng.choice(valores) for _ in range(n_obj)) for _ in range(n)]
+
+CASOS = [(n_obj, valores, seed)
+         for n_obj in (2, 3)
+         for valores in ((0, 1, 2), tuple(range(8)), (0.1, 0.25, 0.7, 1.3))
+         for seed in range(10)]
+
+@pytest.mark.parametrize('n_obj,valores,seed', CASOS)
+def test_crowding_de_todas_as_frentes_igual_a_referencia(n_obj, valores, seed):
+    objs = pontos(random.Random(seed).randint(1, 50), n_obj, valores, seed)
+    fronts = fast_nondominated_sort(objs, objs)
+    cd = crowding_distances(objs, fronts)
+    for front in fronts:
+        esperado = crowding_referencia(front, objs)
+        assert [cd[i] for i in front] == [esperado[i] for i in front]
+        assert crowding_distance(front, objs) == esperado
+
+def test_frente_fora_de_ordem_desempata_pela_posicao():
+    objs = [(1, 3), (1, 3), (0, 4), (2, 2), (1, 3)]
+    front = [4, 0, 3, 1, 2]
+    assert crowding_distance(front, objs) == crowding_referencia(front, objs)
+
+def test_fora_das_frentes_fica_zero():
+    objs = [(0, 2), (1, 1), (2, 0), (3, 3)]
+    cd = crowding_distances(objs, [[0, 1, 2]])
+    assert cd[3] == 0.0 and np.isinf(cd[[0, 2]]).all()
+    assert crowding_distances(objs, []).tolist() == [0.0] * 4
+
+@pytest.mark.parametrize('n_obj,valores,seed', CASOS)
+def test_truncagem_igual_a_ordenacao_completa(n_obj, valores, seed):
+    objs = pontos(40, n_obj, valores, seed)
+    front = fast_nondominated_sort(objs, objs)[0]
+    cd = crowding_referencia(front, objs)
+    ordenada = sorted(front, key=lambda i: cd[i], reverse=True)
+    for n in range(len(front) + 2):
+        assert truncate_by_crowding(front, objs, n) == ordenada[:n]
+
+@pytest.mark.parametrize('n_obj,valores,seed', CASOS)
+def test_selecao_ambiental_igual_a_referencia(n_obj, valores, seed):
+    objs = pontos(60, n_obj, valores, seed)
+    for size in (1, 10, 30, 59, 60):
+        selected, new_fronts = environmental_selection(objs, size)
+        assert selected == selecao_referencia(objs, size)
+        # Frentes reindexadas: o rank de cada selecionado no conjunto original
+        sub = [objs[i] for i in selected]
+        assert [len(f) for f in new_fronts] == \
+            [len(f) for f in fast_nondominated_sort(sub, sub)][:len(new_fronts)]
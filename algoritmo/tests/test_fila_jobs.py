@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from fila_jobs import FilaCheiaError, JobQueue, MemoryJobStore, SQLiteJobStore
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memoria':
+        s = MemoryJobStore(ttl_s=0.05)
+    else:
+        s = SQLiteJobStore(str(tmp_path / 'jobs.db'), ttl_s=0.05)
+    yield s
+    s.close()
+
+def test_job_expirado_e_descartado_ao_criar_outro(store):
+    # Job terminado que ninguém consulta
+    store.create('antigo')
+    store.update('antigo', status='concluido', expira_em=time.time() - 1)
+    store.create('novo')
+    assert store.purge_expired() == 0
+    assert store.get('novo') is not None
+
+def test_job_nao_expirado_continua_disponivel(store):
+    store.create('a')
+    store.update('a', status='concluido', expira_em=time.time() + 60)
+    store.create('b')
+    assert store.get('a')['status'] == 'concluido'
+
+def test_fila_executa_e_registra_resultado():
+    fila = JobQueue(MemoryJobStore(ttl_s=60), max_workers=1)
+    job_id = fila.submit(lambda x, on_generation=None: {'dobro': 2 * x}, 21)
+    fila.shutdown(wait=True)
+    job = fila.get(job_id)
+    assert job['status'] == 'concluido'
+    assert job['resultado'] == {'dobro': 42}
+
+def test_fila_registra_erro_e_ultimo_progresso(store):
+    def falha(on_generation=None):
+        for g in range(5):
+            on_generation({'geracao': g})
+        raise ValueError('sem vagas')
+
+    fila = JobQueue(store, max_workers=1, progress_interval_s=60)
+    job_id = fila.submit(falha)
+    fila._executor.shutdown(wait=True)
+    job = fila.get(job_id)
+    assert job['status'] == 'erro' and job['erro'] == 'sem vagas'
+    # O progresso final é gravado mesmo dentro do intervalo entre gravações
+    assert job['progresso'] == {'geracao': 4}
+    assert job['expira_em'] >= job['concluido_em']
+
+def test_fila_cheia_recusa_novos_jobs():
+    liberar = threading.Event()
+    fila = JobQueue(MemoryJobStore(ttl_s=60), max_workers=1, max_pending=2)
+    ids = [fila.submit(lambda on_generation=None: liberar.wait(5)) for _ in range(2)]
+    with pytest.raises(FilaCheiaError):
+        fila.submit(lambda on_generation=None: None)
+    liberar.set()
+    fila.shutdown(wait=True)
+    assert [fila.get(i)['status'] for i in ids] == ['concluido', 'concluido']
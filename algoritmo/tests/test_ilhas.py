@@ -0,0 +1,17 @@
+from benchmark_exato import gerar_instancia
+from modelo_ilhas import run_island_nsga2
+
+def test_parametros_das_ilhas_no_resultado(capsys):
+    pacientes, upaes = gerar_instancia(10, 5, seed=2)
+    res = run_island_nsga2(pacientes, upaes, n_islands=2, pop_size=12, generations=4,
+                           migration_interval=2, migration_rate=0.25, seed=3)
+    assert res['ilhas'] == {
+        'n_ilhas': 2,
+        'individuos_por_ilha': 12,
+        'topologia': 'anel',
+        'intervalo_migracao': 2,
+        'migrantes_por_ilha': 3,
+        'historicos': res['ilhas']['historicos'],
+    }
+    assert len(res['ilhas']['historicos']) == 2
+    assert '[ILHAS]' not in capsys.readouterr().out
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import (
+    BASE_NO_SHOW,
+    compute_p_noshow,
+    compute_p_noshow_matrix,
+    haversine,
+    haversine_matrix,
+)
+
+def test_haversine_escalar_igual_ao_vetorizado():
+    pacientes, upaes = gerar_instancia(20, 15, seed=2)
+    matriz = haversine_matrix([p['lat'] for p in pacientes], [p['lon'] for p in pacientes],
+                              [u['lat'] for u in upaes], [u['lon'] for u in upaes])
+    escalar = [[haversine(p['lat'], p['lon'], u['lat'], u['lon']) for u in upaes]
+               for p in pacientes]
+    assert np.allclose(matriz, escalar, rtol=1e-12, atol=0)
+    assert haversine(-8.05, -34.9, -8.05, -34.9) == 0.0
+
+def test_noshow_escalar_igual_ao_vetorizado():
+    # Instância com todas as severidades, vulnerabilidades e pacientes TFD
+    pacientes, upaes = gerar_instancia(40, 15, seed=3)
+    base = [BASE_NO_SHOW.get(p['especialidade'].lower(), 0.3) for p in pacientes]
+    p_mat, dist_mat = compute_p_noshow_matrix(pacientes, upaes, base)
+    for i, (p, b) in enumerate(zip(pacientes, base)):
+        for j, u in enumerate(upaes):
+            p_ns, dist = compute_p_noshow(p, u, b)
+            assert isinstance(p_ns, float)
+            assert p_ns == pytest.approx(p_mat[i, j], rel=1e-12)
+            assert dist == pytest.approx(dist_mat[i, j], rel=1e-12)
@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+import pytest
+
+import api_server
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import (
+    ProblemInstance,
+    SerialEvaluator,
+    can_fully_allocate,
+    capacity_crossover_batch,
+    evolve_nsga2,
+    feasible_rows,
+    init_feasible_population,
+    mutation_batch,
+)
+
+# Vagas padrão (1 compartilhada), N compartilhadas e por especialidade; com
+# mais ou menos pacientes que vagas (force_allocation True e False)
+VAGAS = [None, 2, {'Cardiologia': 2, 'Ortopedia': 1, 'Neurologia': 1}]
+
+def instancia(n_pacientes, n_upaes, vagas, k_nearest=None):
+    pacientes, upaes = gerar_instancia(n_pacientes, n_upaes, seed=7)
+    if vagas is not None:
+        upaes = [{**u, 'vagas': vagas} for u in upaes]
+    return (ProblemInstance(pacientes, upaes, k_nearest=k_nearest),
+            can_fully_allocate(pacientes, upaes))
+
+@pytest.fixture(params=[(vagas, n, k) for vagas in VAGAS for n in (40, 120) for k in (None, 3)])
+def populacao(request):
+    vagas, n_pacientes, k_nearest = request.param
+    inst, force = instancia(n_pacientes, 60, vagas, k_nearest)
+    pop = np.array(init_feasible_population(30, inst.specialties, random.Random(1)),
+                   dtype=np.int32).reshape(30, n_pacientes)
+    assert feasible_rows(pop, inst.specialties, force).all()
+    return inst, force, pop
+
+def test_mutation_batch_preserva_viabilidade(populacao):
+    inst, force, pop = populacao
+    gen = np.random.default_rng(0)
+    for _ in range(20):
+        pop = mutation_batch(pop, inst.specialties, 1.0, gen, force)
+        assert feasible_rows(pop, inst.specialties, force).all()
+
+def test_capacity_crossover_batch_preserva_viabilidade(populacao):
+    inst, force, pop = populacao
+    gen = np.random.default_rng(0)
+    for _ in range(20):
+        c1, c2 = capacity_crossover_batch(pop, pop[gen.permutation(len(pop))], 1.0,
+                                          inst.specialties, gen, force)
+        pop = np.vstack((c1, c2))[:len(pop)]
+        assert feasible_rows(pop, inst.specialties, force).all()
+
+@pytest.mark.parametrize('upaes', [
+    [],
+    [{'id': 'u0', 'nome': 'UPAE 0', 'especialidades': ['Cardiologia'],
+      'lat': -8.0, 'lon': -35.0, 'vagas': 0}],
+])
+def test_mutation_batch_sem_grupos_de_vagas(upaes):
+    pacientes, _ = gerar_instancia(5, 1, seed=0)
+    inst = ProblemInstance(pacientes, upaes)
+    filhos = np.full((4, 5), -1, dtype=np.int32)
+    filhos = mutation_batch(filhos, inst.specialties, 1.0, np.random.default_rng(0))
+    assert (filhos == -1).all()
+
+@pytest.mark.parametrize('modo', ['nsga2', 'exato'])
+@pytest.mark.parametrize('upaes', [
+    [],
+    [{'id': 'u0', 'nome': 'UPAE 0', 'especialidades': ['Cardiologia'],
+      'lat': -8.0, 'lon': -35.0, 'vagas': 0}],
+])
+def test_lote_sem_vagas_nao_aloca_ninguem(upaes, modo):
+    api_server.app.config['TESTING'] = True
+    pacientes = [{'id': f'p{i}', 'especialidade': 'Cardiologia', 'lat': -8.05, 'lon': -34.9}
+                 for i in range(3)]
+    with api_server.app.test_client() as client:
+        resposta = client.post('/api/otimizar-lote', json={
+            'pacientes': pacientes, 'upaes': upaes, 'modo': modo, 'seed': 1
+        })
+    assert resposta.status_code == 200
+    assert [a['status'] for a in resposta.get_json()['alocacoes']] == ['nao_alocado'] * 3
+
+def test_rede_de_seguranca_nao_clona_os_pais():
+    # Vaga compartilhada e população inicial inviável (todos na UPAE 0), que
+    # é reparada na entrada; os filhos nunca podem ser todos cópias dos pais
+    pacientes, upaes = gerar_instancia(300, 300, seed=0)
+    inst = ProblemInstance(pacientes, upaes)
+    force = can_fully_allocate(pacientes, upaes)
+    inicial = np.zeros((40, inst.n_patients), dtype=np.int32)
+    estado = evolve_nsga2(inst, SerialEvaluator(inst), 40, 10, 0.9, 0.3, force,
+                          initial_population=inicial, rng=random.Random(1))
+    for _, _, stats in estado['history']:
+        assert stats['clones'] < stats['filhos']
+    assert feasible_rows(estado['population'], inst.specialties, force).all()
+
+def test_avaliador_em_blocos_exige_submit():
+    from otimizador_genetico import _PoolEvaluator
+    with pytest.raises(TypeError):
+        _PoolEvaluator(None)
@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+from otimizador_genetico import (
+    _nondominated_sort_2d,
+    _nondominated_sort_deb,
+    fast_nondominated_sort,
+)
+
+def pontos(n, valores, seed):
+    """Objetivos com poucos valores distintos: muitos empates e pontos repetidos."""
+    rng = random.Random(seed)
+    return [(rng.choice(valores), rng.choice(valores)) for _ in range(n)]
+
+@pytest.mark.parametrize('seed', range(30))
+@pytest.mark.parametrize('valores', [(0, 1, 2), tuple(range(6)), (0.5, 1.5, float('inf'))])
+def test_varredura_2d_igual_a_deb(seed, valores):
+    objs = pontos(random.Random(seed).randint(1, 60), valores, seed)
+    assert _nondominated_sort_2d(objs) == _nondominated_sort_deb(objs, objs)
+
+def test_pontos_repetidos_ficam_na_mesma_frente():
+    objs = [(1, 1), (1, 1), (0, 2), (2, 0), (1, 2), (1, 2), (2, 2)]
+    assert _nondominated_sort_2d(objs) == [[0, 1, 2, 3], [4, 5], [6]]
+
+def test_casos_limite():
+    assert fast_nondominated_sort([], []) == []
+    assert fast_nondominated_sort([0], [(3.0, 4.0)]) == [[0]]
+    # Mais de dois objetivos: algoritmo de Deb
+    objs = [(1, 1, 1), (0, 2, 2), (2, 2, 2)]
+    assert fast_nondominated_sort(objs, objs) == [[0, 1], [2]]
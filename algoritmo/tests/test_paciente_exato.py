@@ -0,0 +1,38 @@
+import contextlib
+import io
+import timeit
+
+import pytest
+
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import otimizar_alocacao_paciente, run_nsga2, solve_single_patient_exact
+
+# Orçamento do caminho exato de um paciente (melhor de várias repetições)
+LATENCIA_MAXIMA_S = 1e-3
+
+def frente(resultado):
+    # A frente do NSGA-II pode repetir o mesmo indivíduo
+    return sorted({tuple(round(o, 9) for o in s['objectives'])
+                   for s in resultado['pareto_solutions']})
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('vagas', [None, 0])
+def test_exato_igual_a_frente_do_nsga2(seed, vagas):
+    pacientes, upaes = gerar_instancia(1, 8, seed=seed)
+    if vagas is not None:
+        # Sem nenhuma vaga: as duas abordagens só têm a opção "sem vaga"
+        upaes = [{**u, 'vagas': vagas} for u in upaes]
+    exato = solve_single_patient_exact(pacientes[0], upaes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ga = run_nsga2(pacientes, upaes, pop_size=30, generations=30, seed=seed)
+    assert frente(exato) == frente(ga)
+    assert exato['parada']['motivo'] == 'solucao_exata'
+
+@pytest.mark.parametrize('n_upaes', [10, 30])
+def test_caminho_exato_dentro_do_orcamento(n_upaes):
+    pacientes, upaes = gerar_instancia(1, n_upaes, seed=0)
+    resposta = otimizar_alocacao_paciente(pacientes[0], upaes)
+    assert resposta['sucesso']
+    tempos = timeit.repeat(lambda: otimizar_alocacao_paciente(pacientes[0], upaes),
+                           number=50, repeat=5)
+    assert min(tempos) / 50 < LATENCIA_MAXIMA_S
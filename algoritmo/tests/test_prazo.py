@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import run_genetic_algorithm
+
+@pytest.fixture(scope='module')
+def instancia():
+    return gerar_instancia(300, 450, seed=0)
+
+def test_prazo_curto_interrompe_ainda_na_populacao_inicial(instancia):
+    pacientes, upaes = instancia
+    t0 = time.monotonic()
+    res = run_genetic_algorithm(pacientes, upaes, pop_size=400, generations=1000,
+                                deadline=t0 + 0.05, seed=1)
+    assert time.monotonic() - t0 < 2.0
+    assert res['parada']['truncado']
+    assert res['parada']['motivo'] == 'tempo_esgotado'
+
+def test_prazo_com_ilhas_e_verificado_dentro_da_epoca(instancia):
+    pacientes, upaes = instancia
+    t0 = time.monotonic()
+    res = run_genetic_algorithm(pacientes, upaes, pop_size=60, generations=10000,
+                                deadline=t0 + 1.0, seed=1,
+                                islands={'n_islands': 2, 'migration_interval': 5000})
+    assert time.monotonic() - t0 < 5.0
+    assert res['parada']['truncado']
+    assert res['parada']['geracoes_executadas'] < 5000
+
+@pytest.mark.parametrize('extra', [
+    {'modo': 'exato'},
+    {'warm_start': True},
+])
+def test_prazo_em_modo_nao_interrompivel_e_recusado(instancia, extra):
+    pacientes, upaes = instancia
+    with pytest.raises(ValueError):
+        run_genetic_algorithm(pacientes, upaes, deadline=time.monotonic() + 1, **extra)
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+
+import pytest
+
+import api_server
+from registro_upaes import UpaeRegistry, content_version
+
+def upaes(n, espera=10):
+    return [
+        {'id': f'u{j}', 'nome': f'UPAE {j}', 'especialidades': ['Cardiologia'],
+         'lat': -8.0 - 0.02 * j, 'lon': -34.95, 'tempo_espera_dias': espera + j}
+        for j in range(n)
+    ]
+
+def gravar(path, conteudo):
+    path.write_text(json.dumps(conteudo), encoding='utf-8')
+
+@pytest.fixture
+def arquivo(tmp_path):
+    path = tmp_path / 'upaes.json'
+    gravar(path, upaes(3))
+    return path
+
+def test_versao_pelo_conteudo(arquivo):
+    registro = UpaeRegistry(str(arquivo))
+    info = registro.load()
+    assert info['versao'] == content_version(upaes(3))
+    assert info['n_upaes'] == 3
+    assert list(registro.get()) == upaes(3)
+    assert registro.get('atual') is registro.get(info['versao'])
+
+def test_recarregar_sem_mudanca_nao_cria_versao(arquivo):
+    registro = UpaeRegistry(str(arquivo))
+    primeira = registro.load()
+    catalogo = registro.get()
+    assert registro.reload()['versao'] == primeira['versao']
+    assert len(registro.info()['versoes']) == 1
+    # Os índices da versão não são recalculados
+    assert registro.get() is catalogo
+
+def test_conteudo_novo_vira_versao_nova(arquivo):
+    registro = UpaeRegistry(str(arquivo))
+    antiga = registro.load()['versao']
+    gravar(arquivo, {'versao': 'marco', 'upaes': upaes(4)})
+    nova = registro.reload()
+    assert nova['versao'] != antiga and nova['rotulo'] == 'marco'
+    info = registro.info()
+    assert info['versao_atual'] == nova['versao']
+    assert [v['versao'] for v in info['versoes']] == [nova['versao'], antiga]
+    # A versão anterior continua disponível para quem ainda a referencia
+    assert len(registro.get(antiga)) == 3
+
+def test_max_versions_descarta_as_mais_antigas(arquivo):
+    registro = UpaeRegistry(str(arquivo), max_versions=2)
+    versoes = []
+    for espera in (10, 20, 30):
+        gravar(arquivo, upaes(3, espera))
+        versoes.append(registro.reload()['versao'])
+    assert [v['versao'] for v in registro.info()['versoes']] == versoes[:0:-1]
+    with pytest.raises(KeyError):
+        registro.get(versoes[0])
+
+def test_recarregar_versao_antiga_a_torna_atual(arquivo):
+    registro = UpaeRegistry(str(arquivo), max_versions=2)
+    a = registro.load()['versao']
+    gravar(arquivo, upaes(3, 20))
+    registro.reload()
+    gravar(arquivo, upaes(3))
+    assert registro.reload()['versao'] == a
+    gravar(arquivo, upaes(3, 30))
+    registro.reload()
+    # "a" foi usada por último antes da nova versão: é a que sobra
+    assert len(registro.get(a)) == 3
+
+def test_arquivo_invalido_mantem_versao_atual(arquivo):
+    registro = UpaeRegistry(str(arquivo))
+    atual = registro.load()['versao']
+    gravar(arquivo, [{'id': 'x'}])
+    with pytest.raises(ValueError):
+        registro.reload()
+    assert registro.info()['versao_atual'] == atual
+
+def test_sqlite(tmp_path):
+    path = tmp_path / 'upaes.db'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE upaes(id TEXT, dados TEXT)')
+    conn.executemany('INSERT INTO upaes VALUES (?, ?)',
+                     [(u['id'], json.dumps(u)) for u in upaes(3)])
+    conn.commit()
+    conn.close()
+    registro = UpaeRegistry(str(path))
+    assert registro.load()['versao'] == content_version(upaes(3))
+
+@pytest.fixture
+def client(arquivo, monkeypatch):
+    registro = UpaeRegistry(str(arquivo))
+    registro.load()
+    monkeypatch.setattr(api_server, 'registro_upaes', registro)
+    api_server.app.config['TESTING'] = True
+    with api_server.app.test_client() as c:
+        yield c
+
+def test_api_recarregar(client, arquivo):
+    antiga = client.get('/api/upaes').get_json()['versao_atual']
+    gravar(arquivo, upaes(4))
+    corpo = client.post('/api/upaes/recarregar').get_json()
+    assert corpo['sucesso']
+    assert corpo['versao'] == corpo['versao_atual'] == content_version(upaes(4))
+    assert [v['versao'] for v in corpo['versoes']] == [corpo['versao'], antiga]
+
+def test_api_recarregar_falha_mantem_versao(client, arquivo):
+    atual = client.get('/api/upaes').get_json()['versao_atual']
+    arquivo.write_text('{', encoding='utf-8')
+    resposta = client.post('/api/upaes/recarregar')
+    assert resposta.status_code == 500
+    assert client.get('/api/upaes').get_json()['versao_atual'] == atual
+
+def test_api_recarregar_sem_arquivo(monkeypatch):
+    monkeypatch.setattr(api_server, 'registro_upaes', UpaeRegistry())
+    with api_server.app.test_client() as c:
+        assert c.post('/api/upaes/recarregar').status_code == 400
+
+@pytest.mark.parametrize('versao', ['atual', content_version(upaes(3))])
+def test_api_upaes_da_versao(client, versao):
+    corpo = client.get(f'/api/upaes?versao={versao}').get_json()
+    assert corpo['upaes'] == upaes(3)
+
+def test_api_versao_inexistente_retorna_404(client):
+    resposta = client.get('/api/upaes?versao=nao-existe')
+    assert resposta.status_code == 404
+    assert not resposta.get_json()['sucesso']
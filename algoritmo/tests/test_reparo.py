@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmark_exato import gerar_instancia
+from otimizador_genetico import (
+    ProblemInstance,
+    can_fully_allocate,
+    feasible_rows,
+    init_feasible_population,
+    is_feasible,
+    repair_chromosome,
+)
+
+# Vagas padrão (1 compartilhada), N compartilhadas e por especialidade
+VAGAS = [None, 2, {'Cardiologia': 2, 'Endocrinologia': 1, 'Ortopedia': 1,
+                   'Dermatologia': 2, 'Neurologia': 1}]
+
+def instancia(n_pacientes, n_upaes, vagas, seed=7):
+    pacientes, upaes = gerar_instancia(n_pacientes, n_upaes, seed=seed)
+    if vagas is not None:
+        upaes = [{**u, 'vagas': vagas} for u in upaes]
+    inst = ProblemInstance(pacientes, upaes)
+    return inst, can_fully_allocate(pacientes, upaes, inst.specialties)
+
+@pytest.mark.parametrize('vagas', VAGAS)
+@pytest.mark.parametrize('n_pacientes', [10, 40])
+@pytest.mark.parametrize('force', [False, True])
+def test_feasible_rows_igual_a_is_feasible(vagas, n_pacientes, force):
+    inst, completo = instancia(n_pacientes, 40, vagas)
+    gen = np.random.default_rng(n_pacientes)
+    # Genes aleatórios (incompatíveis, sobrecarga e -1) e linhas viáveis
+    aleatorios = gen.integers(-1, 40, size=(200, n_pacientes))
+    viaveis = init_feasible_population(50, inst.specialties, random.Random(0))
+    pop = np.vstack((aleatorios, np.array(viaveis).reshape(50, n_pacientes))).astype(np.int32)
+    esperado = [is_feasible(row, inst.specialties, force) for row in pop.tolist()]
+    assert feasible_rows(pop, inst.specialties, force).tolist() == esperado
+    assert not all(esperado)
+    assert any(esperado) == (completo or not force)
+
+@pytest.fixture(params=[True, False], ids=['proxima', 'primeira_livre'])
+def com_distancias(request):
+    return request.param
+
+@pytest.mark.parametrize('vagas', VAGAS)
+@pytest.mark.parametrize('n_pacientes', [10, 40, 80])
+def test_reparo_aloca_todos_quando_possivel(vagas, n_pacientes, com_distancias):
+    inst, force = instancia(n_pacientes, 30, vagas)
+    if not com_distancias:
+        inst.specialties.set_fill_costs(None)
+    gen = np.random.default_rng(1)
+    for row in gen.integers(-1, 30, size=(30, n_pacientes)).tolist():
+        reparado = repair_chromosome(list(row), inst.specialties, force)
+        assert is_feasible(reparado, inst.specialties, force)
+
+@pytest.mark.parametrize('vagas', VAGAS)
+@pytest.mark.parametrize('seed', range(5))
+def test_reparo_preenche_com_a_upae_livre_mais_proxima(vagas, seed):
+    inst, force = instancia(30, 60, vagas, seed=seed)
+    assert force
+    indice = inst.specialties
+    cromossomo = init_feasible_population(1, indice, random.Random(seed))[0]
+    i = random.Random(seed).randrange(inst.n_patients)
+    cromossomo[i] = -1
+
+    # Vagas livres de cada grupo sem o paciente i
+    livres = list(indice.pool_capacity)
+    for k, j in enumerate(cromossomo):
+        if j != -1:
+            livres[indice.pool_of[j][indice.patient_spec[k]]] -= 1
+    spec = indice.patient_spec[i]
+    candidatas = [j for j in indice.compatible_by_spec[spec].tolist()
+                  if livres[indice.pool_of[j][spec]] > 0]
+    esperado = min(candidatas, key=lambda j: inst.dist_km[i, j])
+
+    reparado = repair_chromosome(list(cromossomo), indice, True)
+    assert reparado[i] == esperado
+    assert [g for k, g in enumerate(reparado) if k != i] == \
+        [g for k, g in enumerate(cromossomo) if k != i]
@@ -4,8 +4,10 @@ from collections import defaultdict
 from turtle import st
 import matplotlib.pyplot as plt
 
+# Ordenação não-dominada: a mesma do otimizador principal (varredura
+# O(N log N) para dois objetivos, Deb para os demais)
+from otimizador_genetico import dominates, fast_nondominated_sort
 
-random.seed(42)
 
 
 
@@ -19,7 +21,7 @@ def haversine(lat1, lon1, lat2, lon2):
 def clamp(x, a=0.0, b=0.95):
     return max(a, min(b, x))
 
-def generate_pe_data(n_patients=60, n_slots=65):
+def generate_pe_data(n_patients=60, n_slots=65, rng=random):
     CITIES = {
         'Recife':   {'coords': (-8.05428, -34.8813), 'demand_weight': 0.3},
         'Jaboatao': {'coords': (-8.1765, -35.0326),  'demand_weight': 0.4},
@@ -35,35 +37,35 @@ def generate_pe_data(n_patients=60, n_slots=65):
 
     # Pacientes
     for i in range(n_patients):
-        city = random.choices(city_names, weights=city_weights, k=1)[0]
+        city = rng.choices(city_names, weights=city_weights, k=1)[0]
         base_lat, base_lon = CITIES[city]['coords']
-        lat = base_lat + random.uniform(-0.03, 0.03)
-        lon = base_lon + random.uniform(-0.03, 0.03)
+        lat = base_lat + rng.uniform(-0.03, 0.03)
+        lon = base_lon + rng.uniform(-0.03, 0.03)
         patients.append({
             'id': i,
             'city_origin': city,
             'lat': lat,
             'lon': lon,
-            'specialty': random.choice(SPECIALTIES)
+            'specialty': rng.choice(SPECIALTIES)
         })
 
     # Vagas
     for s in range(n_slots):
-        city = random.choice(city_names)
+        city = rng.choice(city_names)
         base_lat, base_lon = CITIES[city]['coords']
-        lat = base_lat + random.uniform(-0.02, 0.02)
-        lon = base_lon + random.uniform(-0.02, 0.02)
+        lat = base_lat + rng.uniform(-0.02, 0.02)
+        lon = base_lon + rng.uniform(-0.02, 0.02)
         if city in ['Recife', 'Jaboatao']:
-            transport_score = random.uniform(0.7, 1.0)
+            transport_score = rng.uniform(0.7, 1.0)
         else:
-            transport_score = random.uniform(0.2, 0.6)
+            transport_score = rng.uniform(0.2, 0.6)
         slots.append({
             'slot_id': s,
             'city_unit': city,
             'lat': lat,
             'lon': lon,
-            'specialty': random.choice(SPECIALTIES),
-            'date': start_date + timedelta(days=random.randint(0, 30)),
+            'specialty': rng.choice(SPECIALTIES),
+            'date': start_date + timedelta(days=rng.randint(0, 30)),
             'transport_score': transport_score
         })
 
@@ -151,7 +153,7 @@ def is_feasible(chromosome, patients, slots, force_allocation=False):
     return True
 
 
-def init_feasible_population(pop_size, patients, slots):
+def init_feasible_population(pop_size, patients, slots, rng=random):
     """
     Gera população inicial VIÁVEL:
     - Sem conflito de vaga
@@ -172,7 +174,7 @@ def init_feasible_population(pop_size, patients, slots):
             for spec in slots_by_spec
         }
         idxs = list(range(n_patients))
-        random.shuffle(idxs)
+        rng.shuffle(idxs)
 
         for i in idxs:
             pat = patients[i]
@@ -181,7 +183,7 @@ def init_feasible_population(pop_size, patients, slots):
             if not free:
                 chrom[i] = -1
             else:
-                sid = random.choice(free)
+                sid = rng.choice(free)
                 chrom[i] = sid
                 free.remove(sid)
 
@@ -196,14 +198,14 @@ def init_feasible_population(pop_size, patients, slots):
 
 
 
-def uniform_crossover(parent1, parent2, crossover_rate=0.9):
-    if random.random() > crossover_rate:
+def uniform_crossover(parent1, parent2, crossover_rate=0.9, rng=random):
+    if rng.random() > crossover_rate:
         return parent1.copy(), parent2.copy()
     n = len(parent1)
     child1 = [None]*n
     child2 = [None]*n
     for i in range(n):
-        if random.random() < 0.5:
+        if rng.random() < 0.5:
             child1[i] = parent1[i]
             child2[i] = parent2[i]
         else:
@@ -211,31 +213,31 @@ def uniform_crossover(parent1, parent2, crossover_rate=0.9):
             child2[i] = parent1[i]
     return child1, child2
 
-def mutation(chromosome, patients, slots, mutation_rate=0.3):
-    if random.random() >= mutation_rate:
+def mutation(chromosome, patients, slots, mutation_rate=0.3, rng=random):
+    if rng.random() >= mutation_rate:
         return chromosome
     n = len(chromosome)
-    op = random.random()
+    op = rng.random()
     if op < 0.4:
         # swap
-        i, j = random.sample(range(n), 2)
+        i, j = rng.sample(range(n), 2)
         chromosome[i], chromosome[j] = chromosome[j], chromosome[i]
     elif op < 0.8:
         # reatribui um paciente para outro slot compatível ou sem vaga
-        i = random.randrange(n)
+        i = rng.randrange(n)
         spec = patients[i]['specialty']
         compat_slots = [s['slot_id'] for s in slots if s['specialty'] == spec]
         if compat_slots:
-            chromosome[i] = random.choice(compat_slots + [-1])
+            chromosome[i] = rng.choice(compat_slots + [-1])
         else:
             chromosome[i] = -1
     else:
         # shuffle em bloco
         if n >= 3:
-            start = random.randint(0, n-3)
-            end = min(n, start + random.randint(2, 5))
+            start = rng.randint(0, n-3)
+            end = min(n, start + rng.randint(2, 5))
             subset = chromosome[start:end]
-            random.shuffle(subset)
+            rng.shuffle(subset)
             chromosome[start:end] = subset
     return chromosome
 
@@ -285,47 +287,6 @@ def repair_chromosome(chromosome, patients, slots, force_allocation=False):
 
 
 
-def dominates(obj_a, obj_b):
-    """
-    Minimização: obj_a domina obj_b se:
-    - não é pior em nenhum objetivo
-    - é melhor em pelo menos um
-    """
-    not_worse = all(a <= b for a, b in zip(obj_a, obj_b))
-    strictly_better = any(a < b for a, b in zip(obj_a, obj_b))
-    return not_worse and strictly_better
-
-def fast_nondominated_sort(population, objectives_list):
-    S = [[] for _ in population]
-    n = [0 for _ in population]
-    fronts = [[]]
-
-    for p in range(len(population)):
-        for q in range(len(population)):
-            if p == q:
-                continue
-            if dominates(objectives_list[p], objectives_list[q]):
-                S[p].append(q)
-            elif dominates(objectives_list[q], objectives_list[p]):
-                n[p] += 1
-        if n[p] == 0:
-            fronts[0].append(p)
-
-    i = 0
-    while fronts[i]:
-        next_front = []
-        for p in fronts[i]:
-            for q in S[p]:
-                n[q] -= 1
-                if n[q] == 0:
-                    next_front.append(q)
-        i += 1
-        fronts.append(next_front)
-
-    if not fronts[-1]:
-        fronts.pop()
-    return fronts
-
 def crowding_distance(front, objectives_list):
     distance = {i: 0.0 for i in front}
     if len(front) == 0:
@@ -348,14 +309,14 @@ def crowding_distance(front, objectives_list):
 
     return distance
 
-def mo_tournament_selection(population, fronts, crowding, k=2):
+def mo_tournament_selection(population, fronts, crowding, k=2, rng=random):
     # mapa idx -> rank (nível da frente)
     rank = {}
     for r, front in enumerate(fronts):
         for idx in front:
             rank[idx] = r
 
-    candidates = random.sample(range(len(population)), k)
+    candidates = rng.sample(range(len(population)), k)
     best = candidates[0]
     for idx in candidates[1:]:
         if rank[idx] < rank[best]:
@@ -495,7 +456,10 @@ def diagnostics_for_solution(chromosome, patients, slots, base_no_show_by_specia
 
 def run_nsga2(patients, slots, base_ns,
               pop_size=120, generations=200,
-              crossover_rate=0.9, mutation_rate=0.3):
+              crossover_rate=0.9, mutation_rate=0.3, seed=None):
+    # Gerador próprio da execução: mesma seed => mesma fronteira, sem
+    # depender (nem mexer) no random global
+    rng = random.Random(seed)
 
     # 1) Detecta se dá pra atender todo mundo por especialidade
     force_allocation = can_fully_allocate(patients, slots)
@@ -506,7 +470,7 @@ def run_nsga2(patients, slots, base_ns,
           f"(capacidade suficiente por especialidade? {'SIM' if force_allocation else 'NÃO'})")
 
     # 2) População inicial (já viável)
-    population = init_feasible_population(pop_size, patients, slots)
+    population = init_feasible_population(pop_size, patients, slots, rng)
     history = []
 
     for gen in range(generations):
@@ -539,11 +503,11 @@ def run_nsga2(patients, slots, base_ns,
 
         while len(offspring) < pop_size and attempts < max_attempts:
             attempts += 1
-            p1 = mo_tournament_selection(population, fronts, crowding, k=2)
-            p2 = mo_tournament_selection(population, fronts, crowding, k=2)
-            c1, c2 = uniform_crossover(p1, p2, crossover_rate)
-            c1 = mutation(c1, patients, slots, mutation_rate)
-            c2 = mutation(c2, patients, slots, mutation_rate)
+            p1 = mo_tournament_selection(population, fronts, crowding, k=2, rng=rng)
+            p2 = mo_tournament_selection(population, fronts, crowding, k=2, rng=rng)
+            c1, c2 = uniform_crossover(p1, p2, crossover_rate, rng)
+            c1 = mutation(c1, patients, slots, mutation_rate, rng)
+            c2 = mutation(c2, patients, slots, mutation_rate, rng)
 
             # reparo leve, mas com preenchimento em cenário force_allocation
             c1 = repair_chromosome(c1, patients, slots, force_allocation)
@@ -556,7 +520,7 @@ def run_nsga2(patients, slots, base_ns,
 
         # se não conseguimos filhos suficientes, preenche com cópias
         while len(offspring) < pop_size:
-            offspring.append(random.choice(population).copy())
+            offspring.append(rng.choice(population).copy())
 
         # 5) Seleção elitista
         combined = population + offspring
@@ -624,14 +588,18 @@ def imprimir_solucao(nome, sol):
 
 
 if __name__ == "__main__":
-    patients, slots, base_ns = generate_pe_data(n_patients=60, n_slots=80)
+    # Seed só na execução do script: importar o módulo não mexe no random global
+    rng = random.Random(42)
+
+    patients, slots, base_ns = generate_pe_data(n_patients=60, n_slots=80, rng=rng)
 
     res = run_nsga2(
         patients, slots, base_ns,
         pop_size=120,
         generations=200,
         crossover_rate=0.9,
-        mutation_rate=0.3
+        mutation_rate=0.3,
+        seed=42
     )
 
     pareto_solutions = res['pareto_solutions']